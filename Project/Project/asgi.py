@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'Project.settings')
+# the student views have async versions (app.async_views) worth using here
+os.environ.setdefault('ASYNC_STUDENT_VIEWS', '1')
 
 application = get_asgi_application()
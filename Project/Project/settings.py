@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -41,6 +42,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'app.middleware.ServerTimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -48,10 +50,69 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'app.middleware.QueryInspectorMiddleware',
 ]
 
 ROOT_URLCONF = 'Project.urls'
 
+# Per-request SQL inspection (app.middleware.QueryInspectorMiddleware).
+# Budgets are the max queries per URL name from app/urls.py; a query shape
+# repeated N_PLUS_ONE_THRESHOLD times in one request is flagged as N+1.
+# RAISE turns violations into exceptions (tests) instead of log warnings.
+QUERY_INSPECTOR = {
+    'ENABLED': False,
+    'RAISE': False,
+    'N_PLUS_ONE_THRESHOLD': 10,
+    'DEFAULT_BUDGET': 20,
+    'BUDGETS': {
+        'student_dashboard': 3,
+        'dashboard_data': 5,
+        'attendance_history': 5,
+        'monthly_summary': 6,
+        'attendance_heatmap': 4,
+        'attendance_heatmap_data': 4,
+        'admin_dashboard': 4,
+        'student_list': 4,
+        'attendance_mark': 20,
+        'attendance_report': 10,
+        'attendance_export': 4,
+        'all_cohorts_report': 5,
+        'rebuild_rollups_task': 3,
+        'task_status': 3,
+        'task_status_data': 3,
+        'task_download': 3,
+    },
+}
+
+# Sampled per-request timing (app.middleware.ServerTimingMiddleware): adds a
+# Server-Timing header and logs one JSON line to "app.timing" for a
+# SAMPLE_RATE fraction of requests. 0 disables it entirely.
+SERVER_TIMING = {
+    'SAMPLE_RATE': 0.0,
+    'HEADER': True,
+    'LOG': True,
+}
+
+# Admin student list pagination (?per_page= is clamped to the maximum)
+STUDENT_LIST_PAGE_SIZE = 50
+STUDENT_LIST_MAX_PAGE_SIZE = 500
+
+# Student attendance history pagination
+ATTENDANCE_HISTORY_PAGE_SIZE = 50
+ATTENDANCE_HISTORY_MAX_PAGE_SIZE = 366
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'app.timing': {'handlers': ['console'], 'level': 'INFO', 'propagate': False},
+        'app.queries': {'handlers': ['console'], 'level': 'WARNING', 'propagate': False},
+    },
+}
+
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
@@ -82,6 +143,91 @@ DATABASES = {
 }
 
 
+# Cache
+# Shared by every process on the host by default (files under CACHE_DIR):
+# the student views are cached for hours, and a write made by another
+# process (run_worker, import_attendance, generate_dataset) must reach the
+# web processes through the version tokens it bumps. Across several hosts
+# set REDIS_URL (e.g. redis://localhost:6379/0); that needs the redis
+# package installed. CACHE_LOCMEM=1 keeps a per-process cache for single-
+# process development, with the timeouts below capped at a few minutes,
+# since other processes' writes never invalidate it.
+REDIS_URL = os.environ.get('REDIS_URL')
+CACHE_LOCMEM = os.environ.get('CACHE_LOCMEM') == '1'
+
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+elif CACHE_LOCMEM:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'attendance',
+            'OPTIONS': {'MAX_ENTRIES': 10000},
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.environ.get('CACHE_DIR') or BASE_DIR / 'cache',
+            'OPTIONS': {'MAX_ENTRIES': 10000},
+        }
+    }
+
+# Lifetime of cached per-student view data (app.caching). Entries are
+# invalidated as soon as the student's attendance changes, so this only
+# bounds how long unused entries occupy the cache.
+STUDENT_VIEW_CACHE_TIMEOUT = 60 * 60 * 24
+# Closed (fully past) months of monthly_summary are pre-rendered once and
+# only dropped by corrections to that month, so they can live much longer
+CLOSED_MONTH_CACHE_TIMEOUT = 60 * 60 * 24 * 30
+if CACHE_LOCMEM:
+    # like app.choices.TIMEOUT: bounds how stale another process can leave them
+    STUDENT_VIEW_CACHE_TIMEOUT = CLOSED_MONTH_CACHE_TIMEOUT = 5 * 60
+
+# Serve the read-heavy student views (dashboard, history, monthly summary)
+# from app.async_views. Project/asgi.py turns this on; under WSGI the sync
+# views in app.views stay in place, since async views there would only add
+# a thread hop per request.
+ASYNC_STUDENT_VIEWS = os.environ.get('ASYNC_STUDENT_VIEWS') == '1'
+
+
+# Academic calendar for term reports (app.term_report): the academic year
+# starts on the 1st of this month and is split into this many equal terms
+# (two equal semesters regardless)
+ACADEMIC_YEAR_START_MONTH = 9
+TERMS_PER_YEAR = 3
+
+
+# Email (low-attendance alerts, app.alerts). Printed to the console by
+# default; set EMAIL_FILE_PATH to write one file per batch into that
+# directory instead, or EMAIL_BACKEND for a real mail server.
+EMAIL_FILE_PATH = os.environ.get('EMAIL_FILE_PATH')
+EMAIL_BACKEND = os.environ.get('EMAIL_BACKEND') or (
+    'django.core.mail.backends.filebased.EmailBackend' if EMAIL_FILE_PATH
+    else 'django.core.mail.backends.console.EmailBackend'
+)
+DEFAULT_FROM_EMAIL = os.environ.get('DEFAULT_FROM_EMAIL', 'attendance@localhost')
+
+
+# Background tasks (app.tasks, run by `manage.py run_worker`)
+TASK_MAX_ATTEMPTS = 3
+# Seconds before the first retry; doubled for every further attempt
+TASK_RETRY_DELAY = 30
+# A running task whose heartbeat is older than this many seconds is
+# assumed lost with its worker and requeued
+TASK_STALE_AFTER = 600
+# Files produced by tasks (background exports)
+TASK_RESULTS_DIR = BASE_DIR / 'task_results'
+# Marking a cohort larger than this is queued instead of saved in the request
+MARK_ATTENDANCE_INLINE_LIMIT = 200
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
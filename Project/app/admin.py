@@ -1,10 +1,33 @@
 from django.contrib import admin
 
-from .models import Attendance, CustomUser, Student 
+from .models import Attendance, AttendanceAlert, AlertRun, CustomUser, Student, Program, Batch, Task
 # Register your models here.
 
-admin.site.register(Attendance)
+class AttendanceAdmin(admin.ModelAdmin):
+    # Attendance.__str__ reads student.full_name; join it instead of one query per row
+    list_select_related = ("student",)
+
+
+class AttendanceAlertAdmin(admin.ModelAdmin):
+    list_display = ("student", "level", "previous_level", "percentage", "created_at", "notified_at")
+    list_filter = ("level",)
+    list_select_related = ("student",)
+
+
+class TaskAdmin(admin.ModelAdmin):
+    # the task status page shows only the traceback's last line; the full one is here
+    list_display = ("id", "kind", "status", "attempts", "worker", "created_at", "finished_at")
+    list_filter = ("kind", "status")
+    readonly_fields = ("error",)
+
+
+admin.site.register(Attendance, AttendanceAdmin)
+admin.site.register(AttendanceAlert, AttendanceAlertAdmin)
+admin.site.register(AlertRun)
+admin.site.register(Task, TaskAdmin)
 admin.site.register(CustomUser)
 admin.site.register(Student)
 
 
+admin.site.register(Program)
+admin.site.register(Batch)
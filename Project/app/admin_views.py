@@ -1,10 +1,29 @@
 from django.contrib.auth.decorators import user_passes_test, login_required
 from django.shortcuts import render, redirect, get_object_or_404
-from .models import Student, Attendance
-from .forms import StudentForm, AttendanceMarkForm, DailyReportForm, MonthlyReportForm
+from django.contrib import messages
+from .models import Student, Attendance, AttendanceRollup, CohortDailyRollup, Task
+from .forms import (StudentForm, AttendanceMarkForm, DailyReportForm, MonthlyReportForm, RangeReportForm,
+                    CohortReportForm, TermReportForm, RosterImportForm)
+from . import exports
+from .cohort_report import LOWEST_LIMIT, cohort_day_totals, cohort_report, day_student_counts, student_month_counts
+from .marking import save_attendance_marks
+from .roster import import_roster
+from .tasks import LABELS as TASK_LABELS, enqueue, result_path
+from .term_report import ROLLING_DAYS, term_report
+from .pagination import keyset_page, page_size
 import calendar
 from datetime import date as dt_date
-from django.db.models import Count, Q
+from django.conf import settings
+from django.db.models import Q
+from django.db.models.functions import Upper
+from django.core.exceptions import ValidationError
+from django.http import FileResponse, Http404, HttpResponseBadRequest, JsonResponse
+from django.views.decorators.http import require_POST
+import io
+from django.utils import timezone
+
+# Upper bound for prefix ranges: "abc" <= value < "abc" + PREFIX_END
+PREFIX_END = "\uffff"
 
 #  Admin check: only allow superuser
 def is_admin(user):
@@ -19,12 +38,41 @@ def admin_dashboard(request):
     })
 
 
-#  View student list
+#  View student list (keyset pagination on student_id, no OFFSET)
 @user_passes_test(is_admin)
 def student_list(request):
-    students = Student.objects.all().order_by("student_id")
+    students = Student.objects.select_related("program", "batch")
+
+    program = request.GET.get("program", "").strip()
+    batch = request.GET.get("batch", "").strip()
+    year = request.GET.get("year", "").strip()
+    q = request.GET.get("q", "").strip()
+
+    if program:
+        students = students.filter(program__name=program)
+    if batch:
+        students = students.filter(batch__name=batch)
+    if year.isdigit():
+        students = students.filter(year=int(year))
+    if q:
+        # case-insensitive prefix match as a range, so plain B-tree indexes
+        # serve it on every backend (the UPPER(student_id) and UPPER(full_name) ones)
+        prefix = q.upper()
+        students = students.annotate(id_upper=Upper("student_id"), name_upper=Upper("full_name")).filter(
+            Q(id_upper__gte=prefix, id_upper__lt=prefix + PREFIX_END)
+            | Q(name_upper__gte=prefix, name_upper__lt=prefix + PREFIX_END)
+        )
+
+    page = keyset_page(
+        students, "student_id",
+        size=page_size(request, settings.STUDENT_LIST_PAGE_SIZE, settings.STUDENT_LIST_MAX_PAGE_SIZE),
+        after=request.GET.get("after") or None,
+        before=request.GET.get("before") or None,
+    )
     return render(request, "admin/student_list.html", {
-        "students": students
+        "students": page["items"],
+        "page": page,
+        "filters": {"program": program, "batch": batch, "year": year, "q": q},
     })
 
 @login_required
@@ -53,6 +101,34 @@ def student_add(request):
 #         "form": form
 #     })
 
+@login_required
+#  Import many students from a CSV roster
+@user_passes_test(is_admin)
+def student_import(request):
+    result = None
+    if request.method == "POST":
+        form = RosterImportForm(request.POST, request.FILES)
+        if form.is_valid():
+            lines = io.TextIOWrapper(form.cleaned_data["file"].file, encoding="utf-8-sig", newline="")
+            try:
+                # no process pool inside a request worker; the file's own
+                # passwords are hashed here (rows without one share one hash)
+                result = import_roster(
+                    lines,
+                    default_password=form.cleaned_data["default_password"],
+                    dry_run=form.cleaned_data["dry_run"],
+                    workers=0,
+                )
+            except (ValidationError, UnicodeDecodeError) as e:
+                form.add_error("file", e.messages if isinstance(e, ValidationError) else "File is not UTF-8 CSV.")
+            else:
+                result["dry_run"] = form.cleaned_data["dry_run"]
+    else:
+        form = RosterImportForm()
+
+    return render(request, "admin/student_import.html", {"form": form, "result": result})
+
+
 @login_required
 #  Edit student
 @user_passes_test(is_admin)
@@ -110,23 +186,34 @@ def mark_attendance(request):
 
     students = Student.objects.filter(program=program, batch=batch).order_by("full_name")
 
-    # existing attendance for selected date
-    existing = Attendance.objects.filter(student__in=students, date=att_date)
-    existing_map = {a.student_id: a for a in existing}
-
     if request.method == "POST":
         present_ids = set(map(int, request.POST.getlist("present")))
 
-        for s in students:
-            a = existing_map.get(s.id)
-            if a is None:
-                a = Attendance(student=s, date=att_date)
-            a.is_present = (s.id in present_ids)
-            a.marked_by = request.user
-            a.save()
+        if students.count() > settings.MARK_ATTENDANCE_INLINE_LIMIT:
+            # a large cohort is saved by the worker; the status page polls its progress
+            task = enqueue("mark_attendance", {
+                "date": att_date.isoformat(), "program": program.pk, "batch": batch.pk,
+                "present": sorted(present_ids), "user": request.user.pk,
+            }, user=request.user)
+            messages.info(request, f"Saving attendance for {program} {batch} in the background.")
+            return redirect("task_status", task.pk)
+
+        # one transaction, bulk insert/update, unchanged rows skipped
+        result = save_attendance_marks(
+            students, att_date, present_ids, request.user, program=program, batch=batch
+        )
+        messages.success(
+            request,
+            f"Attendance saved: {result['created']} created, "
+            f"{result['updated']} updated, {result['unchanged']} unchanged.",
+        )
 
         return redirect("attendance_mark")  
 
+    # existing attendance for selected date
+    existing = Attendance.objects.filter(student__in=students, date=att_date).order_by()
+    existing_map = {a.student_id: a for a in existing}
+
     rows = []
     for s in students:
         a = existing_map.get(s.id)
@@ -145,13 +232,16 @@ def mark_attendance(request):
 @login_required
 @user_passes_test(is_admin)
 def attendance_report(request):
-    report_type = request.GET.get("type", "daily")  # "daily" or "monthly"
+    report_type = request.GET.get("type", "daily")  # "daily", "monthly", "term" or "range"
 
     daily_form = DailyReportForm(request.GET or None)
     monthly_form = MonthlyReportForm(request.GET or None)
+    range_form = RangeReportForm(request.GET if report_type == "range" else None)
+    term_form = TermReportForm(request.GET if report_type == "term" else None)
 
     daily_ctx = {"rows": None, "summary": None}
     monthly_ctx = {"table": None, "meta": None}
+    term_ctx = {"term": None}
 
     # DAILY
     if report_type == "daily" and daily_form.is_valid():
@@ -162,17 +252,12 @@ def attendance_report(request):
         students = Student.objects.filter(program=program, batch=batch).order_by("full_name")
         qs = Attendance.objects.filter(student__in=students, date=att_date).select_related("student")
         att_map = {a.student_id: a for a in qs}
+        rows = [{"student": s, "is_present": s.id in att_map and att_map[s.id].is_present} for s in students]
 
-        present_count = 0
-        rows = []
-        for s in students:
-            a = att_map.get(s.id)
-            is_present = a.is_present if a else False
-            if is_present:
-                present_count += 1
-            rows.append({"student": s, "is_present": is_present})
-
-        total = students.count()
+        # the day's counts are materialized per cohort; unmarked students count as absent
+        rollup = CohortDailyRollup.objects.filter(program=program, batch=batch, date=att_date).first()
+        present_count = rollup.present if rollup else 0
+        total = len(rows)
         daily_ctx["rows"] = rows
         daily_ctx["summary"] = {
             "date": att_date,
@@ -196,15 +281,10 @@ def attendance_report(request):
         end = dt_date(year, month, last_day)
 
         students = Student.objects.filter(program=program, batch=batch).order_by("full_name")
-        qs = Attendance.objects.filter(student__in=students, date__range=(start, end))
-
+        # per-student monthly counters are materialized in AttendanceRollup
         agg = (
-            qs.values("student_id")
-            .annotate(
-                present=Count("id", filter=Q(is_present=True)),
-                absent=Count("id", filter=Q(is_present=False)),
-                total=Count("id"),
-            )
+            AttendanceRollup.objects.filter(student__in=students, year=year, month=month)
+            .values("student_id", "present", "absent", "total")
         )
         agg_map = {a["student_id"]: a for a in agg}
 
@@ -219,6 +299,15 @@ def attendance_report(request):
         monthly_ctx["table"] = table
         monthly_ctx["meta"] = {"program": program, "batch": batch, "year":year, "month": month,  "start": start, "end": end}
 
+    # TERM / SEMESTER / ACADEMIC YEAR / CUSTOM RANGE
+    if report_type == "term" and term_form.is_valid():
+        data = term_form.cleaned_data
+        students = Student.objects.filter(program=data["program"], batch=data["batch"]).order_by("full_name")
+        term = term_report(students, data["start"], data["end"], threshold=data["threshold"], window=ROLLING_DAYS)
+        term.update({"program": data["program"], "batch": data["batch"],
+                     "period": dict(term_form.fields["period"].choices)[data["period"]]})
+        term_ctx["term"] = term
+
     return render(
         request,
         "admin/report.html",
@@ -226,7 +315,120 @@ def attendance_report(request):
             "report_type": report_type,
             "daily_form": daily_form,
             "monthly_form": monthly_form,
+            "range_form": range_form,
+            "term_form": term_form,
             **daily_ctx,
             **monthly_ctx,
+            **term_ctx,
         },
-    )
\ No newline at end of file
+    )
+
+#  Attendance across every program and batch at once, with drill-down
+@login_required
+@user_passes_test(is_admin)
+def all_cohorts_report(request):
+    today = timezone.localdate()
+    form = CohortReportForm(request.GET or {"type": "daily", "date": today, "month": today.month, "year": today.year})
+    report = None
+
+    if form.is_valid():
+        data = form.cleaned_data
+        program, batch = data["program"], data["batch"]
+        drilled = bool(program or batch)
+        sort = data["sort"] or "lowest"
+        # a drill-down lists the whole cohort; the overview only its weakest students
+        limit = None if drilled else LOWEST_LIMIT
+        if data["type"] == "daily":
+            # cohort totals from CohortDailyRollup; only the listed students'
+            # marks are read (students without a mark count as absent)
+            report = cohort_report(
+                day_student_counts(data["date"], program, batch, sort=sort, limit=limit),
+                unmarked_absent=True, sort=sort, limit=limit,
+                cohorts=cohort_day_totals(data["date"], program, batch),
+            )
+        else:
+            # per-student monthly counters are materialized in AttendanceRollup
+            report = cohort_report(
+                student_month_counts(data["year"], data["month"], program, batch), sort=sort, limit=limit,
+            )
+        report.update({"drilled": drilled, "program": program, "batch": batch})
+
+    return render(request, "admin/cohort_report.html", {
+        "form": form,
+        "report": report,
+        "lowest_limit": LOWEST_LIMIT,
+    })
+
+#  Export a report as CSV (optionally gzipped), streamed straight from the DB
+@login_required
+@user_passes_test(is_admin)
+def attendance_export(request):
+    try:
+        filename, header, rows = exports.export_source(request.GET)
+    except ValidationError as e:
+        return HttpResponseBadRequest(" ".join(e.messages))
+
+    if request.GET.get("background") == "1":
+        # large exports are written to a file by the worker and downloaded from the status page
+        params = request.GET.dict()
+        del params["background"]
+        task = enqueue("export", params, user=request.user)
+        return redirect("task_status", task.pk)
+
+    return exports.stream_csv(filename, header, rows, compress=request.GET.get("gzip") == "1")
+
+
+#  Recompute the rollup tables in the background
+@login_required
+@user_passes_test(is_admin)
+@require_POST
+def rebuild_rollups_task(request):
+    task = enqueue("rebuild_rollups", user=request.user)
+    return redirect("task_status", task.pk)
+
+
+def _task_json(task):
+    return {
+        "id": task.pk,
+        "kind": task.kind,
+        "status": task.status,
+        "status_display": task.get_status_display(),
+        "finished": task.finished,
+        "done": task.done,
+        "total": task.total,
+        "percent": task.percent,
+        "attempts": task.attempts,
+        "max_attempts": task.max_attempts,
+        "result": task.result,
+        # the traceback's last line; the full one is in the Django admin
+        "error": task.error.strip().splitlines()[-1] if task.error else "",
+    }
+
+
+#  Background task progress: the page polls task_status_data until the task finishes
+@login_required
+@user_passes_test(is_admin)
+def task_status(request, pk):
+    task = get_object_or_404(Task, pk=pk)
+    return render(request, "admin/task_status.html", {
+        "task": task,
+        "label": TASK_LABELS.get(task.kind, task.kind),
+        "task_json": _task_json(task),
+    })
+
+
+@login_required
+@user_passes_test(is_admin)
+def task_status_data(request, pk):
+    task = get_object_or_404(Task, pk=pk)
+    return JsonResponse(_task_json(task))
+
+
+@login_required
+@user_passes_test(is_admin)
+def task_download(request, pk):
+    task = get_object_or_404(Task, pk=pk, kind="export", status=Task.SUCCEEDED)
+    try:
+        return FileResponse(open(result_path(task), "rb"), as_attachment=True, filename=task.result["filename"])
+    except FileNotFoundError:
+        raise Http404("The export file is no longer available.")
@@ -0,0 +1,132 @@
+"""
+Low-attendance alerts.
+
+scan() looks only at the students whose attendance changed since the
+previous scan, using Attendance.updated_at as a watermark, so its cost
+follows the day's changes rather than the total history. For each of them
+it reads the overall percentage from the monthly rollups and compares its
+status level (stats.alert_level) with the level of the student's latest
+alert; every crossing, down or back up, is stored as an AttendanceAlert.
+
+notify_pending() then emails the students of alerts to a low level that
+have not been sent yet, through the configured email backend (console or
+file by default, see EMAIL_BACKEND), so alerts that failed to send go out
+with the next run.
+
+Deleted attendance rows leave no updated_at behind; a student whose only
+change is a deletion is picked up at their next marked day.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.db.models import Sum
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from .models import AlertRun, Attendance, AttendanceAlert, AttendanceRollup
+from .stats import BELOW_AVERAGE_PERCENT, CRITICAL_PERCENT, OK, alert_level, percent
+
+# Students handled per query (keeps IN lists under SQLite's parameter limit)
+CHUNK_SIZE = 500
+# A scan covers rows stamped up to this long ago: updated_at is set before
+# the writing transaction commits, so rows stamped just before the scan may
+# not be visible yet and would fall behind the new watermark
+WATERMARK_LAG = timedelta(minutes=1)
+
+
+def _chunks(items, size=CHUNK_SIZE):
+    for first in range(0, len(items), size):
+        yield items[first:first + size]
+
+
+def changed_students(since, until):
+    """pks of students with attendance stamped in (since, until]; every student with attendance if since is None"""
+    rows = Attendance.objects.filter(updated_at__lte=until)
+    if since is not None:
+        rows = rows.filter(updated_at__gt=since)
+    return list(rows.order_by("student_id").values_list("student_id", flat=True).distinct())
+
+
+def _crossings(student_ids):
+    """Unsaved AttendanceAlert for each student whose level differs from their latest alert's"""
+    totals = (
+        AttendanceRollup.objects.filter(student_id__in=student_ids)
+        .order_by()
+        .values_list("student_id")
+        .annotate(present=Sum("present"), total=Sum("total"))
+    )
+    # ordered by created_at, so the dict keeps each student's latest level
+    previous = dict(
+        AttendanceAlert.objects.filter(student_id__in=student_ids)
+        .order_by("student_id", "created_at")
+        .values_list("student_id", "level")
+    )
+    alerts = []
+    for student_id, present, total in totals:
+        if not total:
+            continue
+        percentage = percent(present, total)
+        level = alert_level(percentage)
+        was = previous.get(student_id, OK)
+        if level != was:
+            alerts.append(AttendanceAlert(
+                student_id=student_id, level=level, previous_level=was,
+                percentage=percentage, present=present, total=total,
+            ))
+    return alerts
+
+
+def scan(now=None, lag=WATERMARK_LAG, full=False):
+    """
+    Record the threshold crossings since the last scan (every student with
+    attendance on the first scan, or with full) and advance the watermark.
+    Returns the AlertRun.
+    """
+    until = (now or timezone.now()) - lag
+    last = None if full else AlertRun.objects.order_by("-watermark").first()
+    since = last.watermark if last else None
+    if since is not None and since >= until:
+        # nothing new can be visible yet; keep the old watermark
+        return AlertRun(watermark=since)
+
+    student_ids = changed_students(since, until)
+    with transaction.atomic():
+        created = 0
+        for chunk in _chunks(student_ids):
+            alerts = _crossings(chunk)
+            AttendanceAlert.objects.bulk_create(alerts)
+            created += len(alerts)
+        return AlertRun.objects.create(watermark=until, students=len(student_ids), alerts=created)
+
+
+def _message(alert, student):
+    body = render_to_string("emails/attendance_alert.txt", {
+        "alert": alert,
+        "student": student,
+        "critical_percent": CRITICAL_PERCENT,
+        "below_average_percent": BELOW_AVERAGE_PERCENT,
+    })
+    subject = f"Attendance alert: {alert.get_level_display()} ({alert.percentage}%)"
+    return EmailMessage(subject, body, settings.DEFAULT_FROM_EMAIL, [student.email])
+
+
+def notify_pending(now=None):
+    """
+    Email every unsent low-level alert over one backend connection and mark
+    it sent. Recovery alerts are recorded only. Returns the number sent.
+    """
+    pending = list(
+        AttendanceAlert.objects.filter(notified_at__isnull=True).exclude(level=OK)
+        .select_related("student").order_by("created_at")
+    )
+    if not pending:
+        return 0
+    messages = [_message(alert, alert.student) for alert in pending]
+    with get_connection() as connection:
+        sent = connection.send_messages(messages) or 0
+    # a backend that sends fewer reports it; the rest stay pending
+    sent_ids = [alert.pk for alert in pending[:sent]]
+    AttendanceAlert.objects.filter(pk__in=sent_ids).update(notified_at=now or timezone.now())
+    return sent
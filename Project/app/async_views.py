@@ -0,0 +1,192 @@
+"""
+Async versions of the read-heavy student views, for ASGI deployments.
+
+They render the same templates and share the filtering, caching and
+context code with app.views; only the I/O differs: the async ORM (aget,
+aaggregate, async iteration) and the async cache API, with a view's
+independent queries awaited together through asyncio.gather. app.urls
+routes to them when settings.ASYNC_STUDENT_VIEWS is set, which
+Project/asgi.py does by default.
+"""
+import asyncio
+
+from django.conf import settings
+from django.contrib.auth.decorators import login_required
+from django.db.models import Count, Max
+from django.http import Http404, JsonResponse, StreamingHttpResponse
+from django.shortcuts import render
+from django.template.loader import render_to_string
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+
+from . import views
+from .caching import acached_for_student, acached_month
+from .models import Student
+from .pagination import akeyset_page, page_size
+from .stats import astudent_attendance_stats
+
+NO_STUDENT_RECORD = {
+    "no_student_record": True,
+    "message": "No student record found. Please contact admin.",
+}
+
+
+async def _user(request):
+    """
+    The logged-in user, loaded with the async API. It is also set as
+    request.user, so the templates' context processors never trigger the
+    synchronous lazy lookup from async code.
+    """
+    request.user = await request.auser()
+    return request.user
+
+
+async def _alist(queryset):
+    return [row async for row in queryset]
+
+
+@login_required
+async def student_dashboard(request):
+    """Student dashboard; the analytics are loaded from dashboard_data"""
+    user = await _user(request)
+    try:
+        student = await Student.objects.select_related("program", "batch").aget(user=user)
+    except Student.DoesNotExist:
+        return render(request, "student_dashboard.html", NO_STUDENT_RECORD)
+
+    return render(request, "student_dashboard.html", {'student': student})
+
+
+@login_required
+async def dashboard_data(request):
+    """The dashboard statistics and trend as JSON, with the same ETag handling as views.dashboard_data"""
+    user = await _user(request)
+    try:
+        student = await Student.objects.filter(user=user).annotate(
+            last_change=Max('attendance__updated_at'), record_count=Count('attendance'),
+        ).aget()
+    except Student.DoesNotExist:
+        raise Http404("No Student matches the given query.")
+    today = timezone.localdate()
+    etag = views._dashboard_etag(student, today)
+
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        stats = await acached_for_student(
+            student.pk, "dashboard", (today,), lambda: astudent_attendance_stats(student, today)
+        )
+        response = JsonResponse(views._dashboard_json(stats))
+    response['ETag'] = etag
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def _stream_history(request, context, records, chunk_size=500):
+    """views._stream_history() fed by async iteration"""
+    head, tail = views._history_frame(request, context)
+
+    async def rows():
+        yield head
+        chunk = []
+        async for record in records.aiterator(chunk_size=chunk_size):
+            chunk.append(record)
+            if len(chunk) == chunk_size:
+                yield render_to_string("attendance_history_rows.html", {'records': chunk})
+                chunk = []
+        if chunk:
+            yield render_to_string("attendance_history_rows.html", {'records': chunk})
+        yield tail
+
+    return StreamingHttpResponse(rows(), content_type='text/html; charset=utf-8')
+
+
+@login_required
+async def attendance_history(request):
+    """View personal attendance history with filtering options"""
+    user = await _user(request)
+    try:
+        student = await Student.objects.aget(user=user)
+    except Student.DoesNotExist:
+        return render(request, "attendence_history.html", NO_STUDENT_RECORD)
+
+    month, year, status, attendance_records, rollups = views._history_filters(request, student)
+
+    async def compute_summary():
+        counts = await rollups.aaggregate(**views.HISTORY_SUMMARY_AGGREGATES)
+        return views._history_summary(counts, status)
+
+    summary = acached_for_student(student.pk, "history_summary", (month, year, status), compute_summary)
+    years, months = views._filter_choices()
+    context = {
+        'student': student,
+        'years': years,
+        'months': months,
+        'selected_month': month,
+        'selected_year': year,
+        'selected_status': status,
+    }
+
+    if request.GET.get('full'):
+        context['summary'] = summary = await summary
+        context['has_records'] = summary['total'] > 0
+        return _stream_history(request, context, attendance_records.order_by('-date'))
+
+    size = page_size(request, settings.ATTENDANCE_HISTORY_PAGE_SIZE, settings.ATTENDANCE_HISTORY_MAX_PAGE_SIZE)
+    after, before = views._date_param(request, 'after'), views._date_param(request, 'before')
+    page = acached_for_student(
+        student.pk, "history_page", (month, year, status, size, after, before),
+        lambda: akeyset_page(attendance_records, 'date', size=size, after=after, before=before, descending=True),
+    )
+    # the summary and the page do not depend on each other
+    context['summary'], page = await asyncio.gather(summary, page)
+    context.update({
+        'attendance_records': page['items'],
+        'has_records': bool(page['items']),
+        'page': page,
+    })
+
+    return render(request, "attendence_history.html", context)
+
+
+async def _month_context(student, year, month):
+    """views._month_context() with the records and the rollup fetched together"""
+    records, rollup = views._month_queries(student, year, month)
+    monthly_records, rollup = await asyncio.gather(_alist(records), rollup.afirst())
+    return views._month_result(year, month, monthly_records, rollup)
+
+
+@login_required
+async def monthly_summary(request):
+    """View monthly attendance summary"""
+    user = await _user(request)
+    try:
+        student = await Student.objects.aget(user=user)
+    except Student.DoesNotExist:
+        return render(request, "monthly_summary.html", NO_STUDENT_RECORD)
+
+    today = timezone.localdate()
+    selected_month = views._int_param(request, 'month', 1, 12) or today.month
+    selected_year = views._int_param(request, 'year', 1900, 9999) or today.year
+
+    if (selected_year, selected_month) < (today.year, today.month):
+        # closed months are cached as rendered HTML, as in views.monthly_summary
+        async def render_closed_month():
+            return views._render_month(await _month_context(student, selected_year, selected_month))
+
+        month_html = await acached_month(student.pk, selected_year, selected_month, render_closed_month)
+    else:
+        month_context = await acached_for_student(
+            student.pk, "monthly_summary", (selected_year, selected_month),
+            lambda: _month_context(student, selected_year, selected_month),
+        )
+        month_html = views._render_month(month_context)
+
+    years, months = views._filter_choices()
+    return render(request, "monthly_summary.html", {
+        'student': student,
+        'selected_month': selected_month,
+        'selected_year': selected_year,
+        'month_html': month_html,
+        'years': years,
+        'months': months,
+    })
@@ -0,0 +1,170 @@
+import csv
+import time
+from datetime import date
+from itertools import islice
+
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .datagen import _attendance_inserter
+from .models import Student, Attendance
+from .rollups import add_counts
+
+BATCH_SIZE = 5000
+# Tries at a batch whose new rows collide with rows inserted meanwhile
+BATCH_ATTEMPTS = 3
+# Errors kept for the report; later ones are only counted, so memory stays bounded
+MAX_ERRORS = 1000
+
+PRESENT_VALUES = {"1", "true", "yes", "y", "p", "present"}
+ABSENT_VALUES = {"0", "false", "no", "n", "a", "absent"}
+
+
+def parse_present(value):
+    value = value.strip().lower()
+    if value in PRESENT_VALUES:
+        return True
+    if value in ABSENT_VALUES:
+        return False
+    raise ValueError(f"unrecognised present value {value!r}")
+
+
+def parse_day(value):
+    # device dumps may carry a timestamp; only the date part matters
+    return date.fromisoformat(value.strip()[:10])
+
+
+def _records(lines):
+    """(line number, row) for each CSV row, skipping a header row if there is one"""
+    reader = csv.reader(lines)
+    for row in reader:
+        if reader.line_num == 1 and row and row[0].strip().lower() == "student_id":
+            continue
+        if row:
+            yield reader.line_num, row
+
+
+def _save_batch(marks):
+    """
+    Upsert one batch of {(student pk, date): is_present} in a transaction.
+    Rows that already hold the same value are not written, so importing the
+    same file twice changes nothing the second time.
+
+    Rows missing from the batch's snapshot cannot be locked, so another
+    writer may insert one before this batch does. The plain INSERT then
+    fails, and the batch is rolled back and redone from a fresh snapshot;
+    an upsert would overwrite that row and count it in the rollups twice.
+    """
+    for attempt in range(1, BATCH_ATTEMPTS + 1):
+        try:
+            return _write_batch(marks)
+        except IntegrityError:
+            if attempt == BATCH_ATTEMPTS:
+                raise
+
+
+def _write_batch(marks):
+    student_ids = {pk for pk, _ in marks}
+    days = {day for _, day in marks}
+
+    with transaction.atomic():
+        existing = {
+            (a.student_id, a.date): a
+            for a in Attendance.objects.filter(student_id__in=student_ids, date__in=days)
+            .order_by()
+            .only("id", "student_id", "date", "is_present")
+            .select_for_update()
+        }
+        # stamped inside the transaction, right before the writes, so the
+        # rows commit close to their updated_at (alerts.scan() reads past
+        # a watermark that trails the clock by WATERMARK_LAG only)
+        now = timezone.now()
+        new_rows, changed_rows = [], []
+        for (pk, day), is_present in marks.items():
+            a = existing.get((pk, day))
+            if a is None:
+                new_rows.append((pk, day, is_present))
+            elif a.is_present != is_present:
+                a.is_present = is_present
+                a.updated_at = now  # bulk_update does not apply auto_now
+                changed_rows.append(a)
+
+        if new_rows:
+            # raw executemany rather than bulk_create: building a model
+            # instance per row was most of the import time
+            insert = _attendance_inserter()
+            for first in range(0, len(new_rows), 1000):
+                insert(new_rows[first:first + 1000])
+        if changed_rows:
+            Attendance.objects.bulk_update(changed_rows, ["is_present", "updated_at"], batch_size=1000)
+
+        # bulk writes skip the rollup signals; count just these rows in
+        # rather than rebuilding the ranges they span
+        add_counts(
+            [(pk, day, int(present), int(not present)) for pk, day, present in new_rows]
+            + [(a.student_id, a.date, 1 if a.is_present else -1, -1 if a.is_present else 1) for a in changed_rows]
+        )
+
+    return len(new_rows), len(changed_rows)
+
+
+def import_attendance(lines, batch_size=BATCH_SIZE, skip=0, checkpoint=None, progress=None):
+    """
+    Import (student_id, date, present) rows from CSV text lines, e.g. a
+    classroom reader dump. An optional header row is ignored.
+
+    The file is streamed batch_size rows at a time; student_id is mapped
+    to a pk through one dict loaded up front, and each batch is upserted
+    in its own transaction (see _save_batch), so memory is bounded by the
+    batch and the roster, not the file. Importing is idempotent.
+
+    skip:       rows already imported by an earlier run, as reported to
+                checkpoint; they are read past without being processed
+    checkpoint: called with the number of rows done after every committed
+                batch, so an interrupted import can resume from there
+
+    Bad rows (unknown student, bad date or present value) are skipped and
+    reported. Returns {"rows", "created", "updated", "unchanged",
+    "error_count", "errors", "elapsed"}; errors holds the first MAX_ERRORS
+    as {"line", "row", "error"}.
+    """
+    started = time.perf_counter()
+    pks = dict(Student.objects.values_list("student_id", "pk"))
+    stats = {"rows": skip, "created": 0, "updated": 0, "unchanged": 0,
+             "error_count": 0, "errors": [], "elapsed": 0.0}
+
+    def error(line, row, message):
+        stats["error_count"] += 1
+        if len(stats["errors"]) < MAX_ERRORS:
+            stats["errors"].append({"line": line, "row": row, "error": message})
+
+    records = islice(_records(lines), skip, None)
+    while batch := list(islice(records, batch_size)):
+        marks = {}
+        for line, row in batch:
+            if len(row) < 3:
+                error(line, row, "expected student_id, date, present")
+                continue
+            pk = pks.get(row[0].strip())
+            if pk is None:
+                error(line, row, f"unknown student_id {row[0].strip()!r}")
+                continue
+            try:
+                marks[pk, parse_day(row[1])] = parse_present(row[2])
+            except ValueError as e:
+                error(line, row, str(e))
+
+        created, updated = _save_batch(marks) if marks else (0, 0)
+        stats["rows"] += len(batch)
+        stats["created"] += created
+        stats["updated"] += updated
+        stats["unchanged"] += len(marks) - created - updated
+        stats["elapsed"] = time.perf_counter() - started
+
+        if checkpoint:
+            checkpoint(stats["rows"])
+        if progress:
+            progress(dict(stats))
+
+    stats["elapsed"] = time.perf_counter() - started
+    return stats
@@ -0,0 +1,94 @@
+import importlib
+import math
+import time
+from contextlib import contextmanager
+
+from django.db import connection
+from django.test import override_settings
+from django.urls import clear_url_caches
+
+
+@contextmanager
+def benchmark_database(keepdb=False):
+    """
+    Run the enclosed block against a throwaway test database (migrated from
+    scratch), so benchmarks never touch the real data.
+    """
+    old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, keepdb=keepdb)
+    try:
+        yield
+    finally:
+        if not keepdb:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+def _reload_urls():
+    from app import urls as app_urls
+    from Project import urls as project_urls
+
+    importlib.reload(app_urls)
+    importlib.reload(project_urls)
+    clear_url_caches()
+
+
+@contextmanager
+def student_views(use_async):
+    """
+    Route the student views to app.async_views (or app.views) for the
+    enclosed block, whatever ASYNC_STUDENT_VIEWS the process started with.
+    """
+    try:
+        with override_settings(ASYNC_STUDENT_VIEWS=use_async):
+            _reload_urls()
+            yield
+    finally:
+        _reload_urls()
+
+
+def analyze():
+    """Refresh planner statistics after a bulk load"""
+    with connection.cursor() as cursor:
+        cursor.execute("ANALYZE")
+
+
+class QueryTimer:
+    """
+    connection.execute_wrapper() hook that counts queries and their time.
+
+        timer = QueryTimer()
+        with connection.execute_wrapper(timer):
+            ...
+        timer.count, timer.duration
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.duration += time.perf_counter() - start
+
+
+def percentile(samples, p):
+    """Nearest-rank percentile of a list of numbers"""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = max(1, math.ceil(p / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def summarize(samples):
+    """p50/p90/p99/max/mean of a list of timings, rounded for stable JSON diffs"""
+    return {
+        "p50": round(percentile(samples, 50), 3),
+        "p90": round(percentile(samples, 90), 3),
+        "p99": round(percentile(samples, 99), 3),
+        "max": round(max(samples), 3) if samples else 0.0,
+        "mean": round(sum(samples) / len(samples), 3) if samples else 0.0,
+    }
@@ -0,0 +1,145 @@
+import hashlib
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+# Bumped to drop every student's cached views at once
+GENERATION_KEY = "student_view:generation"
+
+
+def _version_key(student_id):
+    return f"student_view:version:{student_id}"
+
+
+def _token():
+    return uuid.uuid4().hex
+
+
+def _month_key(student_id, year, month):
+    return f"student_view:month:{student_id}:{year}:{month}"
+
+
+def _versions(*keys):
+    """The current token for each of keys, read in one cache call"""
+    found = cache.get_many(keys)
+    missing = {key: _token() for key in keys if key not in found}
+    if missing:
+        cache.set_many(missing, None)
+        found.update(missing)
+    return [found[key] for key in keys]
+
+
+async def _aversions(*keys):
+    found = await cache.aget_many(keys)
+    missing = {key: _token() for key in keys if key not in found}
+    if missing:
+        await cache.aset_many(missing, None)
+        found.update(missing)
+    return [found[key] for key in keys]
+
+
+def _student_key(generation, student_id, version, view, params):
+    digest = hashlib.md5(repr(params).encode()).hexdigest()
+    return f"student_view:{generation}:{student_id}:{version}:{view}:{digest}"
+
+
+def _closed_month_key(generation, student_id, year, month, version):
+    return f"student_view:{generation}:{student_id}:month:{year}-{month}:{version}"
+
+
+def cached_for_student(student_id, view, params, compute):
+    """
+    compute() for one student's view and filter combination, cached.
+
+    params is anything with a stable repr (a tuple of the filter values);
+    it is hashed into the key. The key also carries the student's version
+    token, which invalidate_students() replaces whenever that student's
+    attendance changes, so stale entries are never read again and simply
+    expire after STUDENT_VIEW_CACHE_TIMEOUT.
+    """
+    generation, version = _versions(GENERATION_KEY, _version_key(student_id))
+    key = _student_key(generation, student_id, version, view, params)
+    data = cache.get(key)
+    if data is None:
+        data = compute()
+        cache.set(key, data, settings.STUDENT_VIEW_CACHE_TIMEOUT)
+    return data
+
+
+async def acached_for_student(student_id, view, params, compute):
+    """cached_for_student() for async views: compute is a coroutine function"""
+    generation, version = await _aversions(GENERATION_KEY, _version_key(student_id))
+    key = _student_key(generation, student_id, version, view, params)
+    data = await cache.aget(key)
+    if data is None:
+        data = await compute()
+        await cache.aset(key, data, settings.STUDENT_VIEW_CACHE_TIMEOUT)
+    return data
+
+
+def cached_month(student_id, year, month, compute):
+    """
+    compute() for one closed (fully past) month of one student, cached.
+
+    Unlike cached_for_student() the entry is tied to a token for that
+    month alone, so marking today's attendance leaves the closed months
+    cached; only invalidate_months() for that month (a correction) or
+    invalidate_all() drops it.
+    """
+    generation, version = _versions(GENERATION_KEY, _month_key(student_id, year, month))
+    key = _closed_month_key(generation, student_id, year, month, version)
+    data = cache.get(key)
+    if data is None:
+        data = compute()
+        cache.set(key, data, settings.CLOSED_MONTH_CACHE_TIMEOUT)
+    return data
+
+
+async def acached_month(student_id, year, month, compute):
+    """cached_month() for async views: compute is a coroutine function"""
+    generation, version = await _aversions(GENERATION_KEY, _month_key(student_id, year, month))
+    key = _closed_month_key(generation, student_id, year, month, version)
+    data = await cache.aget(key)
+    if data is None:
+        data = await compute()
+        await cache.aset(key, data, settings.CLOSED_MONTH_CACHE_TIMEOUT)
+    return data
+
+
+def _replace(keys):
+    cache.set_many({key: _token() for key in keys}, None)
+
+
+def _invalidate(keys):
+    """
+    Like choices.invalidate(), the tokens are replaced now and again on
+    commit, so data another request read before the commit cannot be
+    stored as current.
+    """
+    keys = set(keys)
+    if not keys:
+        return
+    _replace(keys)
+    transaction.on_commit(lambda: _replace(keys))
+
+
+def invalidate_students(student_ids):
+    """Drop the cached views of these students (closed months excepted)"""
+    _invalidate(_version_key(pk) for pk in student_ids)
+
+
+def invalidate_months(student_months):
+    """Drop cached closed months, given as (student_id, year, month)"""
+    _invalidate(_month_key(*key) for key in student_months)
+
+
+def _replace_generation():
+    cache.set(GENERATION_KEY, _token(), None)
+
+
+def invalidate_all():
+    """Drop every student's cached views (after unscoped bulk changes)"""
+    _replace_generation()
+    transaction.on_commit(_replace_generation)
@@ -0,0 +1,20 @@
+import calendar
+
+# Weeks start on Sunday, matching the calendar table header
+WEEK = calendar.Calendar(firstweekday=calendar.SUNDAY)
+WEEKDAYS = [calendar.day_abbr[day] for day in WEEK.iterweekdays()]
+
+
+def month_grid(year, month, attendance_map):
+    """
+    The month as weeks of seven cells, ready for the template to walk:
+    None for padding days outside the month, otherwise
+    {"day": n, "is_present": True/False, or None when nothing was marked}.
+
+    attendance_map is {day of month: is_present}; each day is looked up
+    once here instead of the template scanning the map for every cell.
+    """
+    return [
+        [{"day": day, "is_present": attendance_map.get(day)} if day else None for day in week]
+        for week in WEEK.monthdayscalendar(year, month)
+    ]
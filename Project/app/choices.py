@@ -0,0 +1,63 @@
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import Program, Batch
+
+VERSION_KEY = "cohort_choices:version"
+# Safety net for per-process caches (locmem), where another process's
+# invalidation is not seen; shared caches are invalidated immediately
+TIMEOUT = 10 * 60
+
+
+def _load():
+    return list(Program.objects.values_list("pk", "name")), list(Batch.objects.values_list("pk", "name"))
+
+
+def cohort_choices():
+    """
+    (program choices, batch choices) for the cohort select boxes, as
+    (pk, name) pairs from the Program and Batch lookup tables.
+
+    Cached under a key that includes a version number; invalidate() bumps
+    the version instead of deleting the key, so a list computed from data
+    read before a change can never be stored as the current one.
+    """
+    version = cache.get_or_set(VERSION_KEY, 1, None)
+    key = f"cohort_choices:{version}"
+    choices = cache.get(key)
+    if choices is None:
+        choices = _load()
+        cache.set(key, choices, TIMEOUT)
+    return choices
+
+
+def _bump():
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:  # no version stored yet, so nothing is cached
+        pass
+
+
+def invalidate():
+    """
+    Drop the cached choices. The version is bumped now, so this process
+    sees the change inside its own transaction, and again on commit, so a
+    list another process cached from uncommitted-looking data is dropped too.
+    """
+    _bump()
+    transaction.on_commit(_bump)
+
+
+def lookup_ids(model, names):
+    """
+    {name: pk} for Program or Batch rows with the given names, creating
+    the missing ones. Two queries plus one insert whatever the count.
+    """
+    names = set(names)
+    ids = dict(model.objects.filter(name__in=names).values_list("name", "pk"))
+    missing = names - set(ids)
+    if missing:
+        model.objects.bulk_create([model(name=name) for name in missing], ignore_conflicts=True)
+        ids = dict(model.objects.filter(name__in=names).values_list("name", "pk"))
+        invalidate()  # bulk_create skips the lookup signals
+    return ids
@@ -0,0 +1,186 @@
+import heapq
+
+from django.db.models import Count, FilteredRelation, Q
+from django.db.models.functions import Coalesce
+
+from .choices import cohort_choices
+from .models import CohortDailyRollup, Student
+from .stats import percent
+
+# Students listed under the cohort table when no cohort is drilled into
+LOWEST_LIMIT = 50
+SORTS = ("lowest", "name")
+
+
+def _students(program, batch):
+    students = Student.objects.order_by()
+    if program:
+        students = students.filter(program=program)
+    if batch:
+        students = students.filter(batch=batch)
+    return students
+
+
+def student_counts(start, end, program=None, batch=None):
+    """
+    (pk, student_id, full_name, program_id, batch_id, marked, present) for
+    every student, optionally in one program/batch, counting their marks
+    in [start, end].
+
+    One GROUP BY over Student LEFT JOIN Attendance, with the date range in
+    the join condition (FilteredRelation), so the (student, date,
+    is_present) index serves it and students without marks still appear.
+    """
+    return (
+        _students(program, batch)
+        .annotate(period=FilteredRelation("attendance", condition=Q(attendance__date__range=(start, end))))
+        .values_list("pk", "student_id", "full_name", "program_id", "batch_id")
+        .annotate(marked=Count("period"), present=Count("period", filter=Q(period__is_present=True)))
+    )
+
+
+def student_month_counts(year, month, program=None, batch=None):
+    """
+    The same rows as student_counts() for one whole month, read from the
+    materialized AttendanceRollup instead: one joined row per student, no
+    aggregation over the month's attendance.
+    """
+    return (
+        _students(program, batch)
+        .annotate(rollup=FilteredRelation("rollups", condition=Q(rollups__year=year, rollups__month=month)))
+        .values_list(
+            "pk", "student_id", "full_name", "program_id", "batch_id",
+            Coalesce("rollup__total", 0), Coalesce("rollup__present", 0),
+        )
+    )
+
+
+def day_student_counts(day, program=None, batch=None, sort="lowest", limit=LOWEST_LIMIT):
+    """
+    student_counts() for one day, already in the report's student order and
+    cut to `limit` by the database. On a single day a student is either
+    present (100%) or not (0%), so lowest-first is present, then name.
+    """
+    rows = student_counts(day, day, program, batch)
+    rows = rows.order_by("present", "full_name") if sort == "lowest" else rows.order_by("full_name")
+    return rows if limit is None else rows[:limit]
+
+
+def cohort_day_totals(day, program=None, batch=None):
+    """
+    Per-cohort totals for one day in the daily report's convention (an
+    unmarked student counts as one absent day), for cohort_report(cohorts=).
+
+    Read from the student count per cohort and the CohortDailyRollup rows
+    of the day, so no student's attendance is visited.
+    """
+    rollups = CohortDailyRollup.objects.filter(date=day)
+    if program:
+        rollups = rollups.filter(program=program)
+    if batch:
+        rollups = rollups.filter(batch=batch)
+    marks = {(r[0], r[1]): r[2:] for r in rollups.values_list("program_id", "batch_id", "present", "total")}
+
+    totals = {}
+    cohorts = _students(program, batch).values_list("program_id", "batch_id").annotate(students=Count("pk"))
+    for program_id, batch_id, students in cohorts:
+        present, marked = marks.get((program_id, batch_id), (0, 0))
+        totals[program_id, batch_id] = {
+            "students": students, "unmarked": students - marked, "days": students, "present": present,
+        }
+    return totals
+
+
+def _student_row(row, names, unmarked_absent):
+    pk, student_id, full_name, program_id, batch_id, marked, present = row
+    total = max(marked, 1) if unmarked_absent else marked
+    return {
+        "pk": pk,
+        "student_id": student_id,
+        "full_name": full_name,
+        "program": names[0].get(program_id, ""),
+        "batch": names[1].get(batch_id, ""),
+        "marked": marked,
+        "present": present,
+        "absent": total - present,
+        "percent": percent(present, total),
+    }
+
+
+def _cohort(names, program_id, batch_id):
+    return {
+        "program_id": program_id, "batch_id": batch_id,
+        "program": names[0].get(program_id, ""), "batch": names[1].get(batch_id, ""),
+        "students": 0, "unmarked": 0, "days": 0, "present": 0,
+    }
+
+
+def cohort_report(rows, unmarked_absent=False, sort="lowest", limit=LOWEST_LIMIT, cohorts=None):
+    """
+    Attendance per cohort (program, batch) and per student from the rows
+    of student_counts() or student_month_counts(), i.e. from one query,
+    across all cohorts or drilled into one program and/or batch.
+
+    cohorts, when given, holds the per-cohort totals already (see
+    cohort_day_totals()); rows then only feed the student list and may be
+    pre-ordered and limited (day_student_counts()).
+
+    unmarked_absent counts a student with no mark in the period as one
+    absent day (the daily report's convention); otherwise only marked days
+    count (the monthly report's).
+
+    Returns {"cohorts", "students", "totals"}. cohorts is every cohort in
+    scope; students is the `limit` lowest-attendance students (all of them
+    when limit is None). Both are sorted by `sort`: "lowest" attendance
+    first, or by "name".
+    """
+    programs, batches = cohort_choices()
+    names = (dict(programs), dict(batches))
+
+    counted = cohorts is not None
+    if counted:
+        cohorts = {key: {**_cohort(names, *key), **totals} for key, totals in cohorts.items()}
+    else:
+        cohorts = {}
+    lowest = []
+    for row in rows.iterator(chunk_size=5000):
+        _, _, full_name, program_id, batch_id, marked, present = row
+        days = max(marked, 1) if unmarked_absent else marked
+        lowest.append((percent(present, days), full_name, row))
+        if counted:
+            continue
+        cohort = cohorts.get((program_id, batch_id))
+        if cohort is None:
+            cohort = cohorts[program_id, batch_id] = _cohort(names, program_id, batch_id)
+        cohort["students"] += 1
+        cohort["unmarked"] += not marked
+        cohort["days"] += days
+        cohort["present"] += present
+
+    for cohort in cohorts.values():
+        cohort["absent"] = cohort["days"] - cohort["present"]
+        cohort["percent"] = percent(cohort["present"], cohort["days"])
+
+    if sort == "name":
+        cohort_key, student_key = (lambda c: (c["program"], c["batch"])), (lambda s: s[1])
+    else:
+        cohort_key, student_key = (lambda c: (c["percent"], c["program"], c["batch"])), (lambda s: s[:2])
+    cohort_list = sorted(cohorts.values(), key=cohort_key)
+    if limit is None:
+        picked = sorted(lowest, key=student_key)
+    else:
+        picked = heapq.nsmallest(limit, lowest, key=student_key)
+
+    days = sum(c["days"] for c in cohort_list)
+    present = sum(c["present"] for c in cohort_list)
+    return {
+        "cohorts": cohort_list,
+        "students": [_student_row(row, names, unmarked_absent) for _, _, row in picked],
+        "totals": {
+            "students": sum(c["students"] for c in cohort_list),
+            "days": days,
+            "present": present,
+            "absent": days - present,
+            "percent": percent(present, days),
+        },
+    }
@@ -0,0 +1,174 @@
+import random
+import time
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import connection, transaction
+from django.utils import timezone
+
+from . import choices
+from .models import Program, Batch, Student, Attendance
+
+User = get_user_model()
+
+PROGRAM_NAMES = [
+    "Computer Science", "Mathematics", "Physics", "Business", "Biology",
+    "Chemistry", "Economics", "Engineering", "History", "Psychology",
+]
+
+
+def program_names(n):
+    names = PROGRAM_NAMES[:n]
+    for i in range(len(names), n):
+        names.append(f"Program {i + 1}")
+    return names
+
+
+def school_days(n, end=None):
+    """The last n weekdays up to and including end, oldest first"""
+    day = end or timezone.localdate()
+    days = []
+    while len(days) < n:
+        if day.weekday() < 5:
+            days.append(day)
+        day -= timedelta(days=1)
+    return days[::-1]
+
+
+def absence_rates(rng, n, mean, spread):
+    """
+    Per-student absence probabilities.
+
+    spread == 0 gives everyone the same rate; otherwise rates are drawn from
+    a beta distribution with the given mean, where a larger spread means a
+    longer tail of chronically absent students. A mean of 0 has no spread
+    (and no beta distribution): nobody is ever absent.
+    """
+    if spread <= 0 or mean <= 0:
+        return [mean] * n
+    concentration = 1 / spread
+    alpha, beta = mean * concentration, (1 - mean) * concentration
+    return [rng.betavariate(alpha, beta) for _ in range(n)]
+
+
+def _pk_map(model, field, values, objs):
+    """pks for just-inserted rows, querying back when the backend cannot return them"""
+    if all(o.pk is not None for o in objs):
+        return {getattr(o, field): o.pk for o in objs}
+    return dict(model.objects.filter(**{f"{field}__in": values}).values_list(field, "pk"))
+
+
+def _attendance_inserter():
+    """
+    Batched INSERT for attendance rows given as (student_id, date, is_present).
+
+    bulk_create spends most of its time building and preparing one model
+    instance per row (~13k rows/s here), so the generated rows skip the
+    model layer and go straight to a parameterised executemany. Dates and
+    the updated_at timestamp are adapted once instead of per row.
+    """
+    opts = Attendance._meta
+    qn = connection.ops.quote_name
+    columns = [opts.get_field(name).column for name in ("student", "date", "is_present", "updated_at")]
+    sql = "INSERT INTO {} ({}) VALUES (%s, %s, %s, %s)".format(
+        qn(opts.db_table), ", ".join(qn(c) for c in columns)
+    )
+    updated_at = connection.ops.adapt_datetimefield_value(timezone.now())
+
+    def insert(rows):
+        with connection.cursor() as cursor:
+            cursor.executemany(sql, [(pk, day, present, updated_at) for pk, day, present in rows])
+
+    return insert
+
+
+def generate_dataset(
+    programs=3, batches=2, students=300, days=60,
+    absence_rate=0.15, spread=0.0, seed=42,
+    prefix="GEN", password="student123", with_users=True,
+    student_chunk=1000, chunk_size=10000, progress=None,
+):
+    """
+    Stream a synthetic roster and its attendance history into the database.
+
+    Students are created student_chunk at a time with bulk_create (with
+    their login users, if with_users), and their attendance is inserted in
+    batches of chunk_size rows, so memory stays bounded however large the
+    dataset. The password is hashed once and the hash reused for every user.
+    Output is deterministic for a given seed.
+
+    progress(stats) is called after every attendance chunk with a dict of
+    running totals. Returns the final totals.
+    """
+    rng = random.Random(seed)
+    batch_names = [str(timezone.localdate().year - b) for b in range(batches)]
+    program_ids = choices.lookup_ids(Program, program_names(programs))
+    batch_ids = choices.lookup_ids(Batch, batch_names)
+    cohorts = [
+        (program_ids[program], batch_ids[batch], int(batch))
+        for program in program_names(programs)
+        for batch in batch_names
+    ]
+    calendar_days = [connection.ops.adapt_datefield_value(day) for day in school_days(days)]
+    insert_attendance = _attendance_inserter()
+    rates = absence_rates(rng, students, absence_rate, spread)
+    password_hash = make_password(password) if with_users else None
+
+    stats = {"students": 0, "users": 0, "attendance": 0, "elapsed": 0.0, "rows_per_sec": 0.0}
+    started = time.perf_counter()
+
+    def report():
+        stats["elapsed"] = time.perf_counter() - started
+        rows = stats["students"] + stats["users"] + stats["attendance"]
+        stats["rows_per_sec"] = rows / stats["elapsed"] if stats["elapsed"] else 0.0
+        if progress:
+            progress(dict(stats))
+
+    for first in range(0, students, student_chunk):
+        numbers = range(first, min(first + student_chunk, students))
+        ids = [f"{prefix}{i:07d}" for i in numbers]
+
+        with transaction.atomic():
+            user_pks = {}
+            if with_users:
+                users = [
+                    User(username=sid.lower(), email=f"{sid.lower()}@example.com", password=password_hash)
+                    for sid in ids
+                ]
+                User.objects.bulk_create(users, batch_size=chunk_size)
+                user_pks = _pk_map(User, "username", [u.username for u in users], users)
+                stats["users"] += len(users)
+
+            roster = []
+            for i, sid in zip(numbers, ids):
+                program_id, batch_id, year = cohorts[i % len(cohorts)]
+                roster.append(Student(
+                    user_id=user_pks.get(sid.lower()),
+                    student_id=sid,
+                    full_name=f"Student {sid}",
+                    email=f"{sid.lower()}@example.com",
+                    program_id=program_id,
+                    batch_id=batch_id,
+                    year=year,
+                ))
+            Student.objects.bulk_create(roster, batch_size=chunk_size)
+            student_pks = _pk_map(Student, "student_id", ids, roster)
+            stats["students"] += len(roster)
+
+            rows = []
+            for i, sid in zip(numbers, ids):
+                pk, rate = student_pks[sid], rates[i]
+                for day in calendar_days:
+                    rows.append((pk, day, rng.random() >= rate))
+                    if len(rows) >= chunk_size:
+                        insert_attendance(rows)
+                        stats["attendance"] += len(rows)
+                        rows = []
+                        report()
+            if rows:
+                insert_attendance(rows)
+                stats["attendance"] += len(rows)
+        report()
+
+    return stats
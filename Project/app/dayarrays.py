@@ -0,0 +1,82 @@
+"""
+Attendance as per-day byte arrays.
+
+A student's attendance over a date range is held as two bytearrays with
+one byte per calendar day (index 0 is the first day of the range):
+marked (1 where the day has a mark) and present (1 where it is a present
+mark). The metrics below work on whole arrays with bytes/bytearray
+methods and itertools running sums, which run in C, instead of looping
+over the days or over model instances in Python.
+"""
+from itertools import accumulate
+from operator import add, sub
+
+from .stats import percent
+
+# Day status codes, one byte per day
+UNMARKED, ABSENT, PRESENT = 0, 1, 2
+
+_SPLIT_ON = {PRESENT: bytes([ABSENT]), ABSENT: bytes([PRESENT])}
+
+
+def student_arrays(rows, start, days):
+    """
+    {student pk: (marked, present)} from (student pk, date, is_present)
+    rows, e.g. a values_list() over one date-range query. Students with
+    no rows get no entry.
+    """
+    arrays = {}
+    # ordinals instead of date subtraction, which builds a timedelta per row
+    first = start.toordinal()
+    for student_id, day, is_present in rows:
+        pair = arrays.get(student_id)
+        if pair is None:
+            pair = arrays[student_id] = (bytearray(days), bytearray(days))
+        i = day.toordinal() - first
+        pair[0][i] = 1
+        pair[1][i] = is_present
+    return arrays
+
+
+def status(marked, present):
+    """UNMARKED/ABSENT/PRESENT per day, as bytes"""
+    return bytes(map(add, marked, present))
+
+
+def school_days(day_status):
+    """The marked days only, so weekends and holidays neither break nor extend a run"""
+    return day_status.translate(None, bytes([UNMARKED]))
+
+
+def runs(days, code):
+    """Lengths of the runs of code (PRESENT or ABSENT) in school_days() output"""
+    return [len(run) for run in days.split(_SPLIT_ON[code]) if run]
+
+
+def longest_run(days, code):
+    return max(runs(days, code), default=0)
+
+
+def current_run(days, code):
+    """Length of the run of code that the days end with"""
+    return len(days) - len(days.rstrip(bytes([code])))
+
+
+def runs_at_least(days, code, length):
+    """How many runs of code are at least `length` school days long"""
+    return sum(1 for run in runs(days, code) if run >= length)
+
+
+def window_sums(values, window):
+    """Sum of values over the `window` days ending on each day (shorter at the start)"""
+    totals = [0, *accumulate(values)]
+    # window ending on day i = totals[i + 1] - totals[i + 1 - window]
+    return list(map(sub, totals[1:], [0] * (window - 1) + totals[:-window]))
+
+
+def rolling_percent(marked, present, window):
+    """Present % over the trailing `window` days, per day (None where the window has no marks)"""
+    return [
+        percent(p, m) if m else None
+        for p, m in zip(window_sums(present, window), window_sums(marked, window))
+    ]
@@ -0,0 +1,156 @@
+import csv
+import zlib
+
+from django.core.exceptions import ValidationError
+from django.db.models import FilteredRelation, Q, Subquery, OuterRef
+from django.http import StreamingHttpResponse
+from django.utils.text import slugify
+
+from .forms import DailyReportForm, MonthlyReportForm, RangeReportForm
+from .models import Student, Attendance
+from .stats import percent
+
+# Rows fetched per database round trip by .iterator()
+CHUNK_SIZE = 2000
+# Encoded CSV is sent in pieces of roughly this size
+FLUSH_BYTES = 64 * 1024
+
+DAILY_HEADER = ["student_id", "full_name", "date", "status"]
+MONTHLY_HEADER = ["student_id", "full_name", "year", "month", "total", "present", "absent", "percent"]
+RANGE_HEADER = ["student_id", "full_name", "program", "batch", "date", "status"]
+
+
+def _status(is_present):
+    return "Present" if is_present else "Absent"
+
+
+def daily_rows(program, batch, day):
+    """One row per student in the cohort; students without a mark count as absent"""
+    marked = (
+        Attendance.objects.filter(student=OuterRef("pk"), date=day)
+        .order_by()
+        .values("is_present")[:1]
+    )
+    students = (
+        Student.objects.filter(program=program, batch=batch)
+        .annotate(is_present=Subquery(marked))
+        .order_by("full_name", "student_id")
+        .values_list("student_id", "full_name", "is_present")
+    )
+    day = day.isoformat()
+    for student_id, full_name, is_present in students.iterator(chunk_size=CHUNK_SIZE):
+        yield [student_id, full_name, day, _status(is_present)]
+
+
+def monthly_rows(program, batch, year, month):
+    """Per-student totals for one month, read from AttendanceRollup in one joined query"""
+    students = (
+        Student.objects.filter(program=program, batch=batch)
+        .annotate(rollup=FilteredRelation("rollups", condition=Q(rollups__year=year, rollups__month=month)))
+        .order_by("full_name", "student_id")
+        .values_list("student_id", "full_name", "rollup__total", "rollup__present", "rollup__absent")
+    )
+    for student_id, full_name, total, present, absent in students.iterator(chunk_size=CHUNK_SIZE):
+        total, present, absent = total or 0, present or 0, absent or 0
+        yield [student_id, full_name, year, month, total, present, absent, percent(present, total)]
+
+
+def range_rows(start, end, program=None, batch=None):
+    """
+    Every attendance record between start and end (inclusive), optionally
+    limited to one program/batch. Ordered by (student, date) so the
+    (student, date) unique index serves the sort and rows stream at once.
+    """
+    records = Attendance.objects.filter(date__range=(start, end))
+    if program:
+        records = records.filter(student__program=program)
+    if batch:
+        records = records.filter(student__batch=batch)
+    records = records.order_by("student_id", "date").values_list(
+        "student__student_id", "student__full_name", "student__program__name", "student__batch__name",
+        "date", "is_present",
+    )
+    for student_id, full_name, program, batch, day, is_present in records.iterator(chunk_size=CHUNK_SIZE):
+        yield [student_id, full_name, program, batch, day.isoformat(), _status(is_present)]
+
+
+def export_source(params):
+    """
+    (filename without extension, header, rows) for the export described by
+    the report's query parameters ("type" is daily, monthly or range).
+    Raises ValidationError when they do not validate.
+    """
+    report_type = params.get("type", "daily")
+    form_class = {"daily": DailyReportForm, "monthly": MonthlyReportForm, "range": RangeReportForm}.get(report_type)
+    if form_class is None:
+        raise ValidationError("Unknown report type.")
+    form = form_class(params)
+    if not form.is_valid():
+        raise ValidationError(form.errors.as_text())
+    data = form.cleaned_data
+
+    if report_type == "daily":
+        filename = f"attendance-{slugify(data['program'])}-{slugify(data['batch'])}-{data['date']}"
+        return filename, DAILY_HEADER, daily_rows(data["program"], data["batch"], data["date"])
+    if report_type == "monthly":
+        year, month = int(data["year"]), int(data["month"])
+        filename = f"attendance-{slugify(data['program'])}-{slugify(data['batch'])}-{year}-{month:02d}"
+        return filename, MONTHLY_HEADER, monthly_rows(data["program"], data["batch"], year, month)
+    scope = "-".join(slugify(v) for v in (data["program"], data["batch"]) if v) or "all"
+    filename = f"attendance-{scope}-{data['start']}-to-{data['end']}"
+    return filename, RANGE_HEADER, range_rows(data["start"], data["end"], data["program"], data["batch"])
+
+
+class _Echo:
+    """File-like object whose write() hands the CSV line back to the caller"""
+
+    def write(self, value):
+        return value
+
+
+def csv_chunks(header, rows):
+    """
+    Encoded CSV: the header on its own (so the client gets its first byte
+    before the query has run), then rows batched into ~FLUSH_BYTES pieces.
+    """
+    writer = csv.writer(_Echo())
+    yield writer.writerow(header).encode()
+
+    buffer, size = [], 0
+    for row in rows:
+        line = writer.writerow(row)
+        buffer.append(line)
+        size += len(line)
+        if size >= FLUSH_BYTES:
+            yield "".join(buffer).encode()
+            buffer, size = [], 0
+    if buffer:
+        yield "".join(buffer).encode()
+
+
+def gzip_chunks(chunks):
+    """Compress a byte stream into a single gzip member, incrementally"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    first = True
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if first:
+            # push the gzip header and the CSV header out immediately
+            data += compressor.flush(zlib.Z_SYNC_FLUSH)
+            first = False
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def stream_csv(filename, header, rows, compress=False):
+    """StreamingHttpResponse serving rows as CSV (or .csv.gz) in constant memory"""
+    chunks = csv_chunks(header, rows)
+    if compress:
+        response = StreamingHttpResponse(gzip_chunks(chunks), content_type="application/gzip")
+        filename += ".csv.gz"
+    else:
+        response = StreamingHttpResponse(chunks, content_type="text/csv; charset=utf-8")
+        filename += ".csv"
+    response["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return response
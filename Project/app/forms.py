@@ -1,6 +1,8 @@
 from django import forms
 from django.contrib.auth.forms import UserCreationForm, AuthenticationForm
-from .models import CustomUser, Student
+from .models import CustomUser, Student, Program, Batch
+from .choices import cohort_choices
+from .term_report import ABSENCE_RUN_THRESHOLD, academic_year, period_bounds, period_choices
 from django.contrib.auth.password_validation import validate_password
 from django.utils import timezone
 from django.contrib.auth import get_user_model
@@ -44,18 +46,29 @@ class StudentForm(forms.ModelForm):
     
     class Meta:
         model = Student
-        fields = ["student_id", "full_name", "email", "program", "batch", "year"]
+        fields = ["student_id", "full_name", "email", "year"]
         widgets = {
             "student_id": forms.TextInput(attrs={"class": "form-control", "placeholder": "e.g., STU001"}),
             "full_name": forms.TextInput(attrs={"class": "form-control", "placeholder": "Enter full name"}),
             "email": forms.EmailInput(attrs={"class": "form-control", "placeholder": "student@example.com"}),
-            "program": forms.TextInput(attrs={"class": "form-control", "placeholder": "e.g., Computer Science"}),
-            "batch": forms.TextInput(attrs={"class": "form-control", "placeholder": "e.g., 2024"}),
             "year": forms.TextInput(attrs={"class": "form-control", "placeholder": "e.g., 2023"}),
         }
 
+    # typed by name; a new name creates the Program/Batch row on save
+    program = forms.CharField(
+        max_length=100,
+        widget=forms.TextInput(attrs={"class": "form-control", "placeholder": "e.g., Computer Science"})
+    )
+    batch = forms.CharField(
+        max_length=30,
+        widget=forms.TextInput(attrs={"class": "form-control", "placeholder": "e.g., 2024"})
+    )
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
+        if self.instance.pk:
+            self.initial.setdefault("program", self.instance.program.name)
+            self.initial.setdefault("batch", self.instance.batch.name)
         # If editing existing student, don't show username/password fields
         if self.instance.pk:
             self.fields.pop('username', None)
@@ -82,6 +95,8 @@ class StudentForm(forms.ModelForm):
 
     def save(self, commit=True):
         student = super().save(commit=False)
+        student.program, _ = Program.objects.get_or_create(name=self.cleaned_data["program"].strip())
+        student.batch, _ = Batch.objects.get_or_create(name=self.cleaned_data["batch"].strip())
         
         # Only create user account if this is a new student (not editing)
         if not self.instance.pk:
@@ -146,34 +161,50 @@ class ProfileForm(forms.ModelForm):
 
         return cleaned_data
 
+class CohortChoiceField(forms.ChoiceField):
+    """
+    Select over a Program/Batch lookup table whose choices come from the
+    cached list (see app.choices). Cleans to a model instance built from
+    that list, so validating the form runs no query either.
+    """
+
+    def __init__(self, model, **kwargs):
+        self.model = model
+        kwargs.setdefault("widget", forms.Select(attrs={"class": "form-select"}))
+        super().__init__(choices=[], **kwargs)
+
+    def clean(self, value):
+        value = super().clean(value)
+        if value in self.empty_values:
+            return None
+        names = {str(pk): name for pk, name in self.choices}
+        return self.model(pk=int(value), name=names[value])
+
+
 class AttendanceMarkForm(forms.Form):
     date = forms.DateField(initial=timezone.localdate, widget=forms.DateInput(attrs={"type": "date", "class": "form-control"}))
-    program = forms.ChoiceField(choices=[], required=True, widget=forms.Select(attrs={"class":"form-select"}))
-    batch = forms.ChoiceField(choices=[], required=True, widget=forms.Select(attrs={"class":"form-select"}))
+    program = CohortChoiceField(Program)
+    batch = CohortChoiceField(Batch)
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
 
-        programs = Student.objects.values_list("program", flat=True).distinct().order_by("program")
-        batches = Student.objects.values_list("batch", flat=True).distinct().order_by("batch")
-
-        self.fields["program"].choices = [(p, p) for p in programs]
-        self.fields["batch"].choices = [(b, b) for b in batches]
+        programs, batches = cohort_choices()
+        self.fields["program"].choices = programs
+        self.fields["batch"].choices = batches
 
 
 
 class ReportBaseForm(forms.Form):
-    program = forms.ChoiceField(choices=[], required=True, widget=forms.Select(attrs={"class":"form-select"}))
-    batch = forms.ChoiceField(choices=[], required=True, widget=forms.Select(attrs={"class":"form-select"}))
+    program = CohortChoiceField(Program)
+    batch = CohortChoiceField(Batch)
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
 
-        programs = Student.objects.values_list("program", flat=True).distinct().order_by("program")
-        batches = Student.objects.values_list("batch", flat=True).distinct().order_by("batch")
-
-        self.fields["program"].choices = [(p, p) for p in programs]
-        self.fields["batch"].choices = [(b, b) for b in batches]
+        programs, batches = cohort_choices()
+        self.fields["program"].choices = programs
+        self.fields["batch"].choices = batches
 
 
 class DailyReportForm(ReportBaseForm):
@@ -194,3 +225,117 @@ class MonthlyReportForm(ReportBaseForm):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.fields["month"].choices = [(i, calendar.month_name[i]) for i in range(1, 13)]
+
+
+def _allow_all_cohorts(form):
+    for name in ("program", "batch"):
+        form.fields[name].required = False
+        form.fields[name].choices = [("", "All")] + form.fields[name].choices
+
+
+class RangeReportForm(ReportBaseForm):
+    start = forms.DateField(widget=forms.DateInput(attrs={"type": "date", "class": "form-control"}))
+    end = forms.DateField(
+        initial=timezone.localdate,
+        widget=forms.DateInput(attrs={"type": "date", "class": "form-control"})
+    )
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # a range export may cover every program and batch
+        _allow_all_cohorts(self)
+
+    def clean(self):
+        cleaned_data = super().clean()
+        start = cleaned_data.get("start")
+        end = cleaned_data.get("end")
+        if start and end and start > end:
+            raise forms.ValidationError("Start date must be on or before the end date.")
+        return cleaned_data
+
+
+class CohortReportForm(ReportBaseForm):
+    """All-cohorts report for a day or a month; program/batch narrow it down (drill-down)"""
+    type = forms.ChoiceField(
+        choices=[("daily", "Daily"), ("monthly", "Monthly")], initial="daily",
+        widget=forms.Select(attrs={"class": "form-select"})
+    )
+    date = forms.DateField(
+        required=False, initial=timezone.localdate,
+        widget=forms.DateInput(attrs={"type": "date", "class": "form-control"})
+    )
+    month = forms.TypedChoiceField(coerce=int, choices=[], required=False, widget=forms.Select(attrs={"class": "form-select"}))
+    year = forms.IntegerField(
+        required=False, min_value=2000, max_value=2100,
+        initial=timezone.localdate().year,
+        widget=forms.NumberInput(attrs={"class": "form-control"})
+    )
+    sort = forms.ChoiceField(
+        choices=[("lowest", "Lowest attendance first"), ("name", "Name")], required=False,
+        widget=forms.Select(attrs={"class": "form-select"})
+    )
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        _allow_all_cohorts(self)
+        self.fields["month"].choices = [(i, calendar.month_name[i]) for i in range(1, 13)]
+        self.fields["month"].initial = timezone.localdate().month
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if cleaned_data.get("type") == "daily" and not cleaned_data.get("date"):
+            self.add_error("date", "Choose a date for the daily report.")
+        if cleaned_data.get("type") == "monthly":
+            for name in ("month", "year"):
+                if not cleaned_data.get(name):
+                    self.add_error(name, "Choose a month and year for the monthly report.")
+        return cleaned_data
+
+
+class TermReportForm(ReportBaseForm):
+    """One cohort over a term, semester, academic year or custom range; clean() resolves start and end"""
+    period = forms.ChoiceField(choices=[], initial="year", widget=forms.Select(attrs={"class": "form-select"}))
+    academic_year = forms.IntegerField(
+        required=False, min_value=2000, max_value=2100,
+        widget=forms.NumberInput(attrs={"class": "form-control"})
+    )
+    start = forms.DateField(required=False, widget=forms.DateInput(attrs={"type": "date", "class": "form-control"}))
+    end = forms.DateField(required=False, widget=forms.DateInput(attrs={"type": "date", "class": "form-control"}))
+    threshold = forms.IntegerField(
+        min_value=1, max_value=60, initial=ABSENCE_RUN_THRESHOLD,
+        widget=forms.NumberInput(attrs={"class": "form-control"})
+    )
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields["period"].choices = period_choices()
+        self.fields["academic_year"].initial = academic_year(timezone.localdate())
+
+    def clean(self):
+        cleaned_data = super().clean()
+        period = cleaned_data.get("period")
+        if period == "custom":
+            start, end = cleaned_data.get("start"), cleaned_data.get("end")
+            if not (start and end):
+                raise forms.ValidationError("Choose a start and end date for a custom range.")
+            if start > end:
+                raise forms.ValidationError("Start date must be on or before the end date.")
+        elif period:
+            year = cleaned_data.get("academic_year") or academic_year(timezone.localdate())
+            start, end = period_bounds(year, period)
+            # a period still in progress is reported up to today
+            end = max(start, min(end, timezone.localdate()))
+            cleaned_data["academic_year"] = year
+        else:
+            return cleaned_data
+        cleaned_data["start"], cleaned_data["end"] = start, end
+        return cleaned_data
+
+
+class RosterImportForm(forms.Form):
+    file = forms.FileField(widget=forms.ClearableFileInput(attrs={"class": "form-control", "accept": ".csv"}))
+    default_password = forms.CharField(
+        required=False,
+        widget=forms.PasswordInput(attrs={"class": "form-control", "placeholder": "Used when a row has no password"})
+    )
+    dry_run = forms.BooleanField(required=False, widget=forms.CheckboxInput(attrs={"class": "form-check-input"}))
@@ -0,0 +1,96 @@
+import calendar
+from datetime import date, timedelta
+
+from . import dayarrays
+from .calendars import WEEK
+from .dayarrays import ABSENT, PRESENT, UNMARKED
+from .models import Attendance
+from .stats import TREND_DAYS, percent
+
+# status bytes -> "0"/"1"/"2" text for the JSON endpoint
+STATUS_DIGITS = bytes.maketrans(bytes([UNMARKED, ABSENT, PRESENT]), b"012")
+
+
+def year_bits(student, year):
+    """
+    (marked, present) for one student-year: two bytearrays with one byte
+    per day of the year (index 0 is 1 January), set to 1 where the day
+    has a mark / a present mark. Built from one date-range query.
+    """
+    start = date(year, 1, 1)
+    days = 366 if calendar.isleap(year) else 365
+    marked, present = bytearray(days), bytearray(days)
+    rows = (
+        Attendance.objects.filter(student=student, date__range=(start, date(year, 12, 31)))
+        .order_by()
+        .values_list("date", "is_present")
+    )
+    for day, is_present in rows.iterator(chunk_size=days):
+        i = (day - start).days
+        marked[i] = 1
+        present[i] = is_present
+    return marked, present
+
+
+def year_summary(marked, present, year, window=TREND_DAYS):
+    """
+    Everything the heatmap shows, from the bytearrays of year_bits().
+    The counting is done with whole-array operations (bytes.count on
+    strided slices, split/rstrip on the marked days, running sums via
+    accumulate and map) rather than a Python loop over the days; only the
+    rolling percentages are formatted one by one.
+
+    - status: bytes with UNMARKED/ABSENT/PRESENT per day
+    - streaks count consecutive *marked* days, so weekends and holidays
+      neither break nor extend them
+    - rolling: present % over the trailing `window` days, per day (None
+      where the window has no marks)
+    - weekdays: per-weekday rates, Monday first
+    """
+    status = dayarrays.status(marked, present)
+    school_days = dayarrays.school_days(status)
+
+    first_weekday = date(year, 1, 1).weekday()
+    weekdays = []
+    for weekday in range(7):
+        offset = (weekday - first_weekday) % 7
+        total = marked[offset::7].count(1)
+        attended = present[offset::7].count(1)
+        weekdays.append({
+            "weekday": calendar.day_abbr[weekday],
+            "total": total,
+            "present": attended,
+            "percentage": percent(attended, total),
+        })
+
+    total = len(school_days)
+    attended = school_days.count(PRESENT)
+    return {
+        "status": status,
+        "total": total,
+        "present": attended,
+        "absent": total - attended,
+        "percentage": percent(attended, total),
+        "longest_streak": dayarrays.longest_run(school_days, PRESENT),
+        "current_streak": dayarrays.current_run(school_days, PRESENT),
+        "longest_absence": dayarrays.longest_run(school_days, ABSENT),
+        # the first window - 1 days have shorter windows, starting on 1 January
+        "rolling": dayarrays.rolling_percent(marked, present, window),
+        "rolling_window": window,
+        "weekdays": weekdays,
+    }
+
+
+def heatmap_rows(year, status):
+    """
+    The year laid out like a contribution graph: seven rows (weekdays, in
+    the calendar table's order) by one column per week. Cells are None
+    outside the year, else {"date", "status"}.
+    """
+    start = date(year, 1, 1)
+    lead = (start.weekday() - WEEK.firstweekday) % 7
+    cells = [None] * lead + [
+        {"date": start + timedelta(days=i), "status": code} for i, code in enumerate(status)
+    ]
+    cells += [None] * (-len(cells) % 7)
+    return [cells[row::7] for row in range(7)]
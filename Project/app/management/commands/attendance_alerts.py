@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+from app.alerts import WATERMARK_LAG, notify_pending, scan
+from datetime import timedelta
+
+
+class Command(BaseCommand):
+    help = ('Record low-attendance alerts for students whose attendance changed since the last run '
+            'and email the pending ones; schedule it (e.g. cron) every few minutes or nightly')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true',
+                            help='Rescan every student with attendance instead of resuming from the watermark')
+        parser.add_argument('--lag', type=int, default=int(WATERMARK_LAG.total_seconds()),
+                            help='Leave rows stamped in the last N seconds to the next run (default: %(default)s)')
+        parser.add_argument('--no-email', action='store_true', help='Record alerts only; they stay pending')
+
+    def handle(self, *args, **options):
+        run = scan(lag=timedelta(seconds=options['lag']), full=options['full'])
+        self.stdout.write(f'Scanned {run.students} changed students up to {run.watermark:%Y-%m-%d %H:%M:%S}')
+        self.stdout.write(f'Threshold crossings recorded: {run.alerts}')
+
+        if not options['no_email']:
+            run.notified = notify_pending()
+            if run.pk:
+                run.save(update_fields=['notified'])
+            self.stdout.write(f'Alert emails sent: {run.notified}')
+
+        self.stdout.write(self.style.SUCCESS('Attendance alerts done'))
@@ -0,0 +1,127 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.test import AsyncClient, override_settings
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.urls import reverse
+from app.benchmarking import analyze, benchmark_database, student_views, summarize
+from app.datagen import generate_dataset
+from app.models import Student
+from app.rollups import rebuild_student_rollups, rebuild_cohort_rollups
+from asgiref.sync import async_to_sync
+import asyncio
+import json
+import time
+
+
+class Command(BaseCommand):
+    help = ('Load-test the student views through the ASGI handler: the sync views (app.views) '
+            'vs their async versions (app.async_views), at a given concurrency')
+
+    VIEWS = ('student_dashboard', 'dashboard_data', 'attendance_history', 'monthly_summary')
+    MODES = ('sync', 'async')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--programs', type=int, default=3)
+        parser.add_argument('--batches', type=int, default=2)
+        parser.add_argument('--students', type=int, default=600, help='Students in the seeded dataset')
+        parser.add_argument('--days', type=int, default=200, help='School days of attendance per student')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--users', type=int, default=50, help='Distinct students the requests rotate over')
+        parser.add_argument('--requests', type=int, default=200, help='Measured requests per view and mode')
+        parser.add_argument('--concurrency', type=int, default=10, help='Requests in flight at once')
+        parser.add_argument('--cache', action='store_true',
+                            help='Keep the view cache on (default: off, so every request reaches the database)')
+        parser.add_argument('--only', nargs='*', help=f'Only these views ({", ".join(self.VIEWS)})')
+        parser.add_argument('--output', help='Write JSON results to this file (default: stdout)')
+        parser.add_argument('--keepdb', action='store_true', help='Keep (and reuse) the benchmark database')
+
+    def handle(self, *args, **options):
+        views = options['only'] or self.VIEWS
+        unknown = set(views) - set(self.VIEWS)
+        if unknown:
+            raise CommandError(f'Unknown views: {", ".join(sorted(unknown))}')
+        caches = {} if options['cache'] else {
+            'CACHES': {'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}
+        }
+
+        setup_test_environment()
+        try:
+            with benchmark_database(keepdb=options['keepdb']), override_settings(**caches):
+                self.seed(options)
+                results = {}
+                for mode in self.MODES:
+                    with student_views(mode == 'async'):
+                        self.stderr.write(f'{mode} views:')
+                        results[mode] = async_to_sync(self.run_mode)(views, options)
+        finally:
+            teardown_test_environment()
+
+        payload = json.dumps({
+            'dataset': {k: options[k] for k in ('programs', 'batches', 'students', 'days', 'seed')},
+            'users': options['users'], 'requests': options['requests'],
+            'concurrency': options['concurrency'], 'cache': options['cache'],
+            'modes': results,
+        }, indent=2, sort_keys=True)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(payload + '\n')
+            self.print_table(results)
+        else:
+            self.stdout.write(payload)
+
+    def seed(self, options):
+        if Student.objects.exists():
+            self.stderr.write('Reusing existing benchmark dataset')
+            return
+        self.stderr.write(f'Seeding {options["students"]} students x {options["days"]} days...')
+        generate_dataset(
+            programs=options['programs'], batches=options['batches'], students=options['students'],
+            days=options['days'], seed=options['seed'], prefix='BEN',
+        )
+        rebuild_student_rollups()
+        rebuild_cohort_rollups()
+        analyze()
+
+    async def run_mode(self, views, options):
+        """Each view in turn: `requests` GETs, `concurrency` at a time, over logged-in student clients"""
+        clients = []
+        async for student in Student.objects.select_related('user').order_by('student_id')[:options['users']]:
+            client = AsyncClient()
+            await client.aforce_login(student.user)
+            clients.append(client)
+        if not clients:
+            raise CommandError('No students to log in as')
+
+        results = {}
+        for name in views:
+            url = reverse(name)
+            # one unmeasured round, so both modes start with warm code paths
+            await asyncio.gather(*(client.get(url) for client in clients[:options['concurrency']]))
+            pending = iter(range(options['requests']))
+            wall = []
+
+            async def worker():
+                for i in pending:
+                    start = time.perf_counter()
+                    response = await clients[i % len(clients)].get(url)
+                    wall.append((time.perf_counter() - start) * 1000)
+                    if response.status_code != 200:
+                        raise CommandError(f'{name}: HTTP {response.status_code}')
+
+            started = time.perf_counter()
+            await asyncio.gather(*(worker() for _ in range(options['concurrency'])))
+            elapsed = time.perf_counter() - started
+            results[name] = {'wall_ms': summarize(wall), 'requests_per_s': round(len(wall) / elapsed, 1)}
+            self.stderr.write(f'  {name:<22}{results[name]["wall_ms"]["p50"]:>10.2f} ms p50'
+                              f'{results[name]["requests_per_s"]:>10.1f} req/s')
+        return results
+
+    def print_table(self, results):
+        self.stdout.write(f'{"view":<22}{"sync p50":>10}{"async p50":>11}{"sync p99":>10}{"async p99":>11}'
+                          f'{"sync rps":>10}{"async rps":>11}')
+        for name, sync in results['sync'].items():
+            asyn = results['async'][name]
+            self.stdout.write(
+                f'{name:<22}{sync["wall_ms"]["p50"]:>10.2f}{asyn["wall_ms"]["p50"]:>11.2f}'
+                f'{sync["wall_ms"]["p99"]:>10.2f}{asyn["wall_ms"]["p99"]:>11.2f}'
+                f'{sync["requests_per_s"]:>10.1f}{asyn["requests_per_s"]:>11.1f}'
+            )
@@ -0,0 +1,114 @@
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import Count, Q
+from app.benchmarking import analyze, benchmark_database
+from app.datagen import generate_dataset
+from app.models import Student, Attendance
+from django.utils import timezone
+from datetime import timedelta
+from statistics import median
+import random
+import time
+
+
+class Command(BaseCommand):
+    help = 'Compare query plans and timings of the attendance hot paths with and without the composite indexes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--students', type=int, default=10000, help='Number of synthetic students')
+        parser.add_argument('--years', type=int, default=3, help='Years of weekday attendance per student')
+        parser.add_argument('--repeat', type=int, default=20, help='Runs per query (median is reported)')
+        parser.add_argument('--seed', type=int, default=42, help='Random seed for the synthetic dataset')
+        parser.add_argument('--keepdb', action='store_true', help='Keep (and reuse) the benchmark database')
+        parser.add_argument('--no-plans', action='store_true', help='Only print timings')
+
+    def handle(self, *args, **options):
+        # Everything runs in a throwaway test database, never the real one
+        with benchmark_database(keepdb=options['keepdb']):
+            self.seed(options['students'], options['years'], options['seed'])
+            queries = self.hot_queries(options['seed'])
+            indexes = [(Attendance, i) for i in Attendance._meta.indexes] + \
+                      [(Student, i) for i in Student._meta.indexes]
+
+            with connection.schema_editor() as editor:
+                for model, index in indexes:
+                    editor.remove_index(model, index)
+            before = self.run(queries, options, 'WITHOUT composite indexes')
+
+            with connection.schema_editor() as editor:
+                for model, index in indexes:
+                    editor.add_index(model, index)
+            analyze()
+            after = self.run(queries, options, 'WITH composite indexes')
+
+            self.stdout.write('')
+            self.stdout.write(f'{"query":<28}{"before ms":>12}{"after ms":>12}{"speedup":>10}')
+            for name in before:
+                speedup = before[name] / after[name] if after[name] else float('inf')
+                self.stdout.write(f'{name:<28}{before[name]:>12.3f}{after[name]:>12.3f}{speedup:>9.1f}x')
+
+    def seed(self, n_students, years, seed):
+        if Student.objects.exists():
+            self.stdout.write('Reusing existing benchmark dataset')
+            return
+
+        self.stdout.write(f'Seeding {n_students} students x {years} years of weekdays...')
+        stats = generate_dataset(
+            programs=5, batches=4, students=n_students, days=260 * years,
+            seed=seed, prefix='BEN', with_users=False,
+        )
+        self.stdout.write(f'Seeded {stats["attendance"]} attendance rows in {stats["elapsed"]:.1f}s')
+        analyze()
+
+    def hot_queries(self, seed):
+        """
+        The access patterns used by the student and admin views, as
+        name -> (queryset, evaluate) pairs.
+        """
+        rng = random.Random(seed)
+        student = Student.objects.order_by('id')[rng.randrange(Student.objects.count())]
+        today = timezone.localdate()
+        month_start = (today.replace(day=1) - timedelta(days=60)).replace(day=1)
+        month_end = (month_start + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+        day = today - timedelta(days=today.weekday() + 7)
+
+        mine = Attendance.objects.filter(student=student).order_by()
+        cohort = Student.objects.filter(program_id=student.program_id, batch_id=student.batch_id)
+        count = lambda qs: qs.count()  # noqa: E731
+
+        return {
+            'student_window': (mine.filter(date__lte=today).order_by('-date')[:31], list),
+            'student_month_present': (
+                mine.filter(date__range=(month_start, month_end), is_present=True), count),
+            'student_history_range': (
+                mine.filter(date__range=(month_start, month_end)).order_by('-date'), list),
+            'cohort_roster': (cohort.order_by('full_name'), list),
+            'daily_report': (Attendance.objects.filter(student__in=cohort, date=day).order_by(), list),
+            'monthly_report': (
+                Attendance.objects.filter(student__in=cohort, date__range=(month_start, month_end))
+                .order_by().values('student_id')
+                .annotate(present=Count('id', filter=Q(is_present=True)), total=Count('id')),
+                list),
+            'date_range_all_present': (
+                Attendance.objects.filter(date__range=(month_start, month_end), is_present=True).order_by(),
+                count),
+        }
+
+    def run(self, queries, options, title):
+        self.stdout.write('')
+        self.stdout.write(self.style.MIGRATE_HEADING(title))
+        timings = {}
+        for name, (qs, evaluate) in queries.items():
+            # querysets cache results, so evaluate a fresh clone every run
+            evaluate(qs.all())  # warm up
+            samples = []
+            for _ in range(options['repeat']):
+                start = time.perf_counter()
+                evaluate(qs.all())
+                samples.append((time.perf_counter() - start) * 1000)
+            timings[name] = median(samples)
+            self.stdout.write(f'  {name:<28}{timings[name]:>10.3f} ms')
+            if not options['no_plans']:
+                for line in qs.explain().splitlines():
+                    self.stdout.write(f'      {line}')
+        return timings
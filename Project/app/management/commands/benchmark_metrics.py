@@ -0,0 +1,165 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from app.benchmarking import summarize
+from app.dayarrays import (ABSENT, longest_run, rolling_percent, runs_at_least, school_days, status,
+                           student_arrays)
+from app.stats import percent
+from app.term_report import ABSENCE_RUN_THRESHOLD, ROLLING_DAYS, academic_year, period_bounds, student_metrics
+from datetime import timedelta
+import json
+import random
+import time
+
+
+# Per-row baselines: what the metrics cost when each attendance row is a
+# Python object visited one by one (dicts keyed by date, running counters)
+
+def naive_fill(rows):
+    by_student = {}
+    for student_id, day, is_present in rows:
+        by_student.setdefault(student_id, {})[day] = is_present
+    return by_student
+
+
+def naive_rolling(marks, start, days, window):
+    rolling = []
+    for i in range(days):
+        total = attended = 0
+        for back in range(max(0, i - window + 1), i + 1):
+            mark = marks.get(start + timedelta(days=back))
+            if mark is not None:
+                total += 1
+                attended += mark
+        rolling.append(percent(attended, total) if total else None)
+    return rolling
+
+
+def naive_absence_runs(marks, threshold):
+    """(longest absence, runs of at least threshold) walking the marks in date order"""
+    longest = run = count = 0
+    for day in sorted(marks):
+        if marks[day]:
+            count += run >= threshold
+            run = 0
+        else:
+            run += 1
+            longest = max(longest, run)
+    count += run >= threshold
+    return longest, count
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the term report metrics: per-row Python baseline vs per-day byte arrays'
+
+    METRICS = ('fill', 'rolling', 'longest_absence', 'absence_runs', 'student_metrics')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--students', type=int, default=500)
+        parser.add_argument('--academic-year', type=int, help='Academic year to span (default: the last full one)')
+        parser.add_argument('--present-rate', type=float, default=0.85)
+        parser.add_argument('--threshold', type=int, default=ABSENCE_RUN_THRESHOLD)
+        parser.add_argument('--window', type=int, default=ROLLING_DAYS)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--runs', type=int, default=5, help='Measured runs per scenario')
+        parser.add_argument('--warmup', type=int, default=1, help='Unmeasured runs per scenario')
+        parser.add_argument('--only', nargs='*', help=f'Only these metrics ({", ".join(self.METRICS)})')
+        parser.add_argument('--output', help='Write JSON results to this file (default: stdout)')
+
+    def handle(self, *args, **options):
+        year = options['academic_year'] or academic_year(timezone.localdate()) - 1
+        start, end = period_bounds(year, 'year')
+        days = (end - start).days + 1
+        rows = self.rows(options['students'], start, days, options['present_rate'], options['seed'])
+        self.stderr.write(f'{options["students"]} students x {days} days, {len(rows)} rows')
+
+        metrics = options['only'] or self.METRICS
+        unknown = set(metrics) - set(self.METRICS)
+        if unknown:
+            raise CommandError(f'Unknown metrics: {", ".join(sorted(unknown))}')
+
+        scenarios = self.scenarios(rows, start, days, options['threshold'], options['window'])
+        results = {}
+        for metric in metrics:
+            results[metric] = {}
+            for variant, run_once in scenarios[metric].items():
+                wall = []
+                for run in range(options['warmup'] + options['runs']):
+                    started = time.perf_counter()
+                    run_once()
+                    elapsed = time.perf_counter() - started
+                    if run >= options['warmup']:
+                        wall.append(elapsed * 1000)
+                results[metric][variant] = {'wall_ms': summarize(wall)}
+                self.stderr.write(f'  {metric:<18}{variant:<8}{results[metric][variant]["wall_ms"]["p50"]:>12.2f} ms')
+
+        payload = json.dumps({
+            'students': options['students'], 'start': str(start), 'end': str(end), 'rows': len(rows),
+            'threshold': options['threshold'], 'window': options['window'], 'runs': options['runs'],
+            'metrics': results,
+        }, indent=2, sort_keys=True)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(payload + '\n')
+            self.print_table(results)
+        else:
+            self.stdout.write(payload)
+
+    def rows(self, students, start, days, present_rate, seed):
+        """(student, date, is_present) for every weekday, with absences in runs of 1-5 days"""
+        rng = random.Random(seed)
+        # mean run of 3 days keeps the overall absence rate near 1 - present_rate
+        run_start = (1 - present_rate) / 3
+        rows = []
+        for student_id in range(1, students + 1):
+            absent_left = 0
+            for i in range(days):
+                day = start + timedelta(days=i)
+                if day.weekday() >= 5:
+                    continue
+                if not absent_left and rng.random() < run_start:
+                    absent_left = rng.randint(1, 5)
+                rows.append((student_id, day, not absent_left))
+                absent_left = max(0, absent_left - 1)
+        return rows
+
+    def scenarios(self, rows, start, days, threshold, window):
+        """metric -> {"naive": callable, "arrays": callable}; the inputs are built once, outside the timing"""
+        marks = naive_fill(rows)
+        arrays = student_arrays(rows, start, days)
+        school = {pk: school_days(status(*pair)) for pk, pair in arrays.items()}
+
+        def naive_metrics():
+            for student_marks in marks.values():
+                values = list(student_marks.values())
+                percent(sum(values), len(values))
+                naive_rolling(student_marks, start, days, window)
+                naive_absence_runs(student_marks, threshold)
+
+        return {
+            'fill': {
+                'naive': lambda: naive_fill(rows),
+                'arrays': lambda: student_arrays(rows, start, days),
+            },
+            'rolling': {
+                'naive': lambda: [naive_rolling(m, start, days, window) for m in marks.values()],
+                'arrays': lambda: [rolling_percent(*pair, window) for pair in arrays.values()],
+            },
+            'longest_absence': {
+                'naive': lambda: [naive_absence_runs(m, threshold)[0] for m in marks.values()],
+                'arrays': lambda: [longest_run(s, ABSENT) for s in school.values()],
+            },
+            'absence_runs': {
+                'naive': lambda: [naive_absence_runs(m, threshold)[1] for m in marks.values()],
+                'arrays': lambda: [runs_at_least(s, ABSENT, threshold) for s in school.values()],
+            },
+            'student_metrics': {
+                'naive': naive_metrics,
+                'arrays': lambda: [student_metrics(*pair, threshold, window) for pair in arrays.values()],
+            },
+        }
+
+    def print_table(self, results):
+        self.stdout.write(f'{"metric":<18}{"naive ms":>12}{"arrays ms":>12}{"speedup":>10}')
+        for metric, r in results.items():
+            naive, arrays = r['naive']['wall_ms']['p50'], r['arrays']['wall_ms']['p50']
+            self.stdout.write(f'{metric:<18}{naive:>12.2f}{arrays:>12.2f}{naive / arrays:>9.1f}x')
@@ -0,0 +1,144 @@
+from django.core.management.base import BaseCommand
+from django.template import engines
+from django.template.loader import get_template
+from django.utils import timezone
+from app.benchmarking import summarize
+from app.calendars import WEEKDAYS, month_grid
+import calendar
+import json
+import random
+import time
+
+# The calendar table as it was before month_grid(): every cell scans the
+# whole attendance map for its day (about 31 x 31 iterations per month)
+LEGACY_CALENDAR = '''<table class="table table-bordered">
+    <thead class="table-light">
+        <tr>
+            <th class="text-center">Sun</th><th class="text-center">Mon</th><th class="text-center">Tue</th>
+            <th class="text-center">Wed</th><th class="text-center">Thu</th><th class="text-center">Fri</th>
+            <th class="text-center">Sat</th>
+        </tr>
+    </thead>
+    <tbody>
+        {% for week in calendar_weeks %}
+        <tr>
+            {% for day in week %}
+            <td class="text-center p-3" style="height: 60px; width: 14.28%;">
+                {% if day == 0 %}
+                {% else %}
+                    <div class="position-relative">
+                        <strong>{{ day }}</strong>
+                        {% for date, is_present in attendance_map.items %}
+                            {% if date == day %}
+                                {% if is_present %}
+                                    <div class="position-absolute top-0 end-0">
+                                        <i class="bi bi-check-circle-fill text-success"></i>
+                                    </div>
+                                {% else %}
+                                    <div class="position-absolute top-0 end-0">
+                                        <i class="bi bi-x-circle-fill text-danger"></i>
+                                    </div>
+                                {% endif %}
+                            {% endif %}
+                        {% endfor %}
+                    </div>
+                {% endif %}
+            </td>
+            {% endfor %}
+        </tr>
+        {% endfor %}
+    </tbody>
+</table>
+'''
+
+# Twelve month calendars on one page, each built by the same code as
+# monthly_summary
+YEAR_VIEW = '''{% for month in months %}
+<h6>{{ month.name }}</h6>
+{% include calendar with calendar_weeks=month.weeks attendance_map=month.attendance_map calendar_grid=month.grid %}
+{% endfor %}'''
+
+
+class Command(BaseCommand):
+    help = 'Benchmark rendering the monthly calendar (old day-scan loop vs precomputed grid) and a 12-month view'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--year', type=int, help='Year to render (default: last year)')
+        parser.add_argument('--present-rate', type=float, default=0.85)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--runs', type=int, default=200, help='Measured renders per scenario')
+        parser.add_argument('--warmup', type=int, default=10, help='Unmeasured renders per scenario')
+        parser.add_argument('--output', help='Write JSON results to this file (default: stdout)')
+
+    def handle(self, *args, **options):
+        year = options['year'] or timezone.localdate().year - 1
+        maps = self.attendance_maps(year, options['present_rate'], options['seed'])
+        scenarios = self.scenarios(year, maps)
+
+        results = {}
+        for name, render in scenarios.items():
+            wall = []
+            for run in range(options['warmup'] + options['runs']):
+                start = time.perf_counter()
+                html = render()
+                elapsed = time.perf_counter() - start
+                if run >= options['warmup']:
+                    wall.append(elapsed * 1000)
+            results[name] = {'wall_ms': summarize(wall), 'bytes': len(html)}
+            self.stderr.write(f'  {name:<16}{results[name]["wall_ms"]["p50"]:>10.3f} ms')
+
+        payload = json.dumps({'year': year, 'runs': options['runs'], 'templates': results}, indent=2, sort_keys=True)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(payload + '\n')
+            self.print_table(results)
+        else:
+            self.stdout.write(payload)
+
+    def attendance_maps(self, year, present_rate, seed):
+        """{month: {day: is_present}} with every weekday of the year marked"""
+        rng = random.Random(seed)
+        return {
+            month: {
+                day: rng.random() < present_rate
+                for day in range(1, calendar.monthrange(year, month)[1] + 1)
+                if calendar.weekday(year, month, day) < 5
+            }
+            for month in range(1, 13)
+        }
+
+    def scenarios(self, year, maps):
+        """name -> callable rendering one page; building the calendar data is part of the timing"""
+        engine = engines['django']
+        legacy = engine.from_string(LEGACY_CALENDAR)
+        grid = get_template('month_calendar.html')
+        year_view = engine.from_string(YEAR_VIEW)
+        month = max(maps)
+
+        def legacy_month():
+            return legacy.render({'calendar_weeks': calendar.monthcalendar(year, month),
+                                  'attendance_map': maps[month]})
+
+        def grid_month():
+            return grid.render({'calendar_grid': month_grid(year, month, maps[month]), 'weekdays': WEEKDAYS})
+
+        def legacy_year():
+            months = [{'name': calendar.month_name[m], 'weeks': calendar.monthcalendar(year, m),
+                       'attendance_map': maps[m]} for m in maps]
+            return year_view.render({'months': months, 'calendar': legacy.template})
+
+        def grid_year():
+            months = [{'name': calendar.month_name[m], 'grid': month_grid(year, m, maps[m])} for m in maps]
+            return year_view.render({'months': months, 'calendar': grid.template, 'weekdays': WEEKDAYS})
+
+        return {
+            'month_legacy': legacy_month,
+            'month_grid': grid_month,
+            'year_legacy': legacy_year,
+            'year_grid': grid_year,
+        }
+
+    def print_table(self, results):
+        self.stdout.write(f'{"template":<16}{"p50 ms":>10}{"p90 ms":>10}{"bytes":>10}')
+        for name, r in results.items():
+            self.stdout.write(f'{name:<16}{r["wall_ms"]["p50"]:>10.3f}{r["wall_ms"]["p90"]:>10.3f}{r["bytes"]:>10}')
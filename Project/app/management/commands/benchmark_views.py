@@ -0,0 +1,171 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import Client
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.urls import reverse
+from django.utils import timezone
+from app.benchmarking import QueryTimer, analyze, benchmark_database, summarize
+from app.datagen import generate_dataset
+from app.models import Student
+from app.rollups import rebuild_student_rollups, rebuild_cohort_rollups
+from datetime import timedelta
+import json
+import time
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the student and admin views (wall time, query count, DB time) and emit JSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--programs', type=int, default=3)
+        parser.add_argument('--batches', type=int, default=2)
+        parser.add_argument('--students', type=int, default=1200, help='Students in the seeded dataset')
+        parser.add_argument('--days', type=int, default=250, help='School days of attendance per student')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--runs', type=int, default=20, help='Measured requests per view')
+        parser.add_argument('--warmup', type=int, default=2, help='Unmeasured requests per view')
+        parser.add_argument('--only', nargs='*', help='Only run these scenarios')
+        parser.add_argument('--output', help='Write JSON results to this file (default: stdout)')
+        parser.add_argument('--compare', help='Previous JSON results to compare against')
+        parser.add_argument('--threshold', type=float, default=1.2,
+                            help='Flag views whose p50 wall time or query count grew by this factor')
+        parser.add_argument('--keepdb', action='store_true', help='Keep (and reuse) the benchmark database')
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        try:
+            with benchmark_database(keepdb=options['keepdb']):
+                self.seed(options)
+                results = {
+                    'dataset': {k: options[k] for k in ('programs', 'batches', 'students', 'days', 'seed')},
+                    'runs': options['runs'],
+                    'views': self.run_scenarios(options),
+                }
+        finally:
+            teardown_test_environment()
+
+        payload = json.dumps(results, indent=2, sort_keys=True)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(payload + '\n')
+            self.print_table(results)
+        else:
+            self.stdout.write(payload)
+
+        if options['compare']:
+            self.compare(results, options['compare'], options['threshold'])
+
+    def seed(self, options):
+        if Student.objects.exists():
+            self.stderr.write('Reusing existing benchmark dataset')
+            return
+        self.stderr.write(f'Seeding {options["students"]} students x {options["days"]} days...')
+        generate_dataset(
+            programs=options['programs'], batches=options['batches'], students=options['students'],
+            days=options['days'], seed=options['seed'], prefix='BEN',
+        )
+        rebuild_student_rollups()
+        rebuild_cohort_rollups()
+        analyze()
+        User.objects.create_superuser(username='bench_admin', password='admin123', email='bench_admin@example.com')
+
+    def scenarios(self):
+        """name -> (user, method, url, data factory); data factory takes the run number"""
+        student = Student.objects.select_related('user').order_by('student_id').first()
+        admin = User.objects.get(username='bench_admin')
+        today = timezone.localdate()
+        # the most recent weekday, so the cohort has attendance on that date
+        day = today - timedelta(days=max(0, today.weekday() - 4))
+        cohort = {'program': student.program_id, 'batch': student.batch_id}
+        cohort_ids = list(Student.objects.filter(**cohort).values_list('id', flat=True))
+        mark_url = reverse('attendance_mark') + f'?date={day}&program={student.program_id}&batch={student.batch_id}'
+
+        return {
+            'student_dashboard': (student.user, 'get', reverse('student_dashboard'), None),
+            'dashboard_data': (student.user, 'get', reverse('dashboard_data'), None),
+            'attendance_history': (student.user, 'get', reverse('attendance_history'), None),
+            'monthly_summary': (student.user, 'get', reverse('monthly_summary'), None),
+            'student_list': (admin, 'get', reverse('student_list'), None),
+            'mark_attendance_get': (admin, 'get', mark_url, None),
+            # alternate everyone present / every other student present so each
+            # run really writes rows instead of hitting the unchanged path
+            'mark_attendance_post': (admin, 'post', mark_url,
+                                     lambda run: {'present': cohort_ids[::1 + run % 2]}),
+            'attendance_report_daily': (admin, 'get', reverse('attendance_report'),
+                                        lambda run: {'type': 'daily', 'date': day, **cohort}),
+            'attendance_report_monthly': (admin, 'get', reverse('attendance_report'),
+                                          lambda run: {'type': 'monthly', 'month': today.month,
+                                                       'year': today.year, **cohort}),
+            'attendance_report_term': (admin, 'get', reverse('attendance_report'),
+                                       lambda run: {'type': 'term', 'period': 'year', 'threshold': 3, **cohort}),
+        }
+
+    def run_scenarios(self, options):
+        scenarios = self.scenarios()
+        if options['only']:
+            unknown = set(options['only']) - set(scenarios)
+            if unknown:
+                raise CommandError(f'Unknown scenarios: {", ".join(sorted(unknown))}')
+            scenarios = {name: scenarios[name] for name in options['only']}
+
+        results = {}
+        for name, (user, method, url, data) in scenarios.items():
+            client = Client()
+            client.force_login(user)
+            send = getattr(client, method)
+
+            wall, db, queries = [], [], []
+            for run in range(options['warmup'] + options['runs']):
+                timer = QueryTimer()
+                start = time.perf_counter()
+                with connection.execute_wrapper(timer):
+                    response = send(url, data(run) if data else None)
+                elapsed = time.perf_counter() - start
+                if response.status_code >= 400:
+                    raise CommandError(f'{name}: HTTP {response.status_code}')
+                if run >= options['warmup']:
+                    wall.append(elapsed * 1000)
+                    db.append(timer.duration * 1000)
+                    queries.append(timer.count)
+
+            results[name] = {
+                'url': url,
+                'method': method.upper(),
+                'wall_ms': summarize(wall),
+                'db_ms': summarize(db),
+                'queries': {'min': min(queries), 'max': max(queries)},
+            }
+            self.stderr.write(f'  {name:<28}{results[name]["wall_ms"]["p50"]:>10.2f} ms  '
+                              f'{max(queries):>4} queries')
+        return results
+
+    def print_table(self, results):
+        self.stdout.write(f'{"view":<28}{"p50 ms":>10}{"p90 ms":>10}{"db p50":>10}{"queries":>9}')
+        for name, r in results['views'].items():
+            self.stdout.write(f'{name:<28}{r["wall_ms"]["p50"]:>10.2f}{r["wall_ms"]["p90"]:>10.2f}'
+                              f'{r["db_ms"]["p50"]:>10.2f}{r["queries"]["max"]:>9}')
+
+    def compare(self, results, path, threshold):
+        with open(path) as f:
+            previous = json.load(f)['views']
+
+        regressions = 0
+        self.stderr.write('')
+        self.stderr.write(f'{"view":<28}{"p50 before":>12}{"p50 after":>12}{"queries":>12}')
+        for name, r in results['views'].items():
+            old = previous.get(name)
+            if not old:
+                continue
+            before, after = old['wall_ms']['p50'], r['wall_ms']['p50']
+            q_before, q_after = old['queries']['max'], r['queries']['max']
+            slower = before and after / before >= threshold
+            more_queries = q_after > q_before * threshold
+            flag = '  REGRESSION' if slower or more_queries else ''
+            regressions += bool(flag)
+            self.stderr.write(f'{name:<28}{before:>12.2f}{after:>12.2f}{f"{q_before}->{q_after}":>12}{flag}')
+
+        if regressions:
+            raise CommandError(f'{regressions} view(s) regressed beyond {threshold}x')
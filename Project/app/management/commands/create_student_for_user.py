@@ -1,6 +1,6 @@
 from django.core.management.base import BaseCommand
 from django.contrib.auth import get_user_model
-from app.models import Student
+from app.models import Program, Batch, Student
 
 User = get_user_model()
 
@@ -27,8 +27,8 @@ class Command(BaseCommand):
                 student_id=f'STU{user.id:03d}',
                 full_name=f'{user.first_name} {user.last_name}' if user.first_name else user.username,
                 email=user.email or f'{user.username}@example.com',
-                program='Computer Science',
-                batch='2024'
+                program=Program.objects.get_or_create(name='Computer Science')[0],
+                batch=Batch.objects.get_or_create(name='2024')[0],
             )
             
             self.stdout.write(self.style.SUCCESS(f'Successfully created student record for {username}'))
@@ -1,6 +1,6 @@
 from django.core.management.base import BaseCommand
 from django.contrib.auth import get_user_model
-from app.models import Student, Attendance
+from app.models import Program, Batch, Student, Attendance
 from django.utils import timezone
 from datetime import datetime, timedelta
 import random
@@ -46,8 +46,8 @@ class Command(BaseCommand):
                 'user': student_user,
                 'full_name': 'John Doe',
                 'email': 'john.doe@example.com',
-                'program': 'Computer Science',
-                'batch': '2024'
+                'program': Program.objects.get_or_create(name='Computer Science')[0],
+                'batch': Batch.objects.get_or_create(name='2024')[0],
             }
         )
         if created:
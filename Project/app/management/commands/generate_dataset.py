@@ -0,0 +1,69 @@
+from django.core.management.base import BaseCommand, CommandError
+from app.datagen import generate_dataset
+from app.models import Student
+from app.rollups import rebuild_student_rollups, rebuild_cohort_rollups
+
+
+class Command(BaseCommand):
+    help = 'Generate a large synthetic dataset (students, users and attendance) for load testing'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--programs', type=int, default=3, help='Number of programs')
+        parser.add_argument('--batches', type=int, default=2, help='Number of batches per program')
+        parser.add_argument('--students', type=int, default=300, help='Total number of students')
+        parser.add_argument('--days', type=int, default=60, help='School days (weekdays) of attendance per student')
+        parser.add_argument('--absence-rate', type=float, default=0.15, help='Mean probability of being absent on a day')
+        parser.add_argument('--spread', type=float, default=0.0,
+                            help='0 = same absence rate for everyone; >0 draws per-student rates from a beta '
+                                 'distribution (larger = more chronic absentees)')
+        parser.add_argument('--seed', type=int, default=42, help='Random seed (same seed, same dataset)')
+        parser.add_argument('--prefix', default='GEN', help='Prefix for generated student IDs and usernames')
+        parser.add_argument('--password', default='student123', help='Password for every generated user')
+        parser.add_argument('--no-users', action='store_true', help='Do not create login users')
+        parser.add_argument('--chunk-size', type=int, default=10000, help='Attendance rows per bulk insert')
+        parser.add_argument('--skip-rollups', action='store_true', help='Do not rebuild the rollup tables afterwards')
+
+    def handle(self, *args, **options):
+        if not 0 <= options['absence_rate'] < 1:
+            raise CommandError('--absence-rate must be in [0, 1)')
+        if Student.objects.filter(student_id__startswith=options['prefix']).exists():
+            raise CommandError(f'Students with prefix {options["prefix"]} already exist; use another --prefix')
+
+        total = options['students'] * options['days']
+        self.stdout.write(f'Generating {options["students"]} students and {total} attendance rows...')
+
+        def progress(stats):
+            self.stdout.write(
+                f'\r  {stats["students"]}/{options["students"]} students, '
+                f'{stats["attendance"]}/{total} attendance rows, '
+                f'{stats["rows_per_sec"]:,.0f} rows/s',
+                ending='',
+            )
+            self.stdout.flush()
+
+        stats = generate_dataset(
+            programs=options['programs'],
+            batches=options['batches'],
+            students=options['students'],
+            days=options['days'],
+            absence_rate=options['absence_rate'],
+            spread=options['spread'],
+            seed=options['seed'],
+            prefix=options['prefix'],
+            password=options['password'],
+            with_users=not options['no_users'],
+            chunk_size=options['chunk_size'],
+            progress=progress,
+        )
+        self.stdout.write('')
+
+        if not options['skip_rollups']:
+            self.stdout.write('Rebuilding attendance rollups...')
+            rebuild_student_rollups()
+            rebuild_cohort_rollups()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Created {stats["users"]} users, {stats["students"]} students and '
+            f'{stats["attendance"]} attendance rows in {stats["elapsed"]:.1f}s '
+            f'({stats["rows_per_sec"]:,.0f} rows/s)'
+        ))
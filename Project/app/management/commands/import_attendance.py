@@ -0,0 +1,76 @@
+from django.core.management.base import BaseCommand, CommandError
+from app.attendance_import import import_attendance, BATCH_SIZE
+import csv
+import gzip
+import json
+import os
+
+
+class Command(BaseCommand):
+    help = ('Import attendance from CSV dumps of (student_id, date, present) rows. '
+            'Re-importing a file is a no-op; an interrupted import resumes from its checkpoint.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('csv_file', help='Path to the dump (.csv or .csv.gz)')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help='Rows upserted per transaction')
+        parser.add_argument('--checkpoint', help='Checkpoint file (default: <csv_file>.checkpoint)')
+        parser.add_argument('--restart', action='store_true', help='Ignore an existing checkpoint')
+        parser.add_argument('--errors', help='Write rejected rows to this CSV file')
+
+    def handle(self, *args, **options):
+        path = options['csv_file']
+        checkpoint_path = options['checkpoint'] or f'{path}.checkpoint'
+        try:
+            size = os.path.getsize(path)
+        except OSError as e:
+            raise CommandError(str(e))
+
+        skip = 0
+        if os.path.exists(checkpoint_path) and not options['restart']:
+            with open(checkpoint_path) as f:
+                saved = json.load(f)
+            if saved.get('size') != size:
+                raise CommandError(f'{path} changed since the checkpoint was written; use --restart')
+            skip = saved['rows']
+            self.stdout.write(f'Resuming after {skip} rows')
+
+        def checkpoint(rows):
+            # write-then-rename so a crash never leaves a half-written checkpoint
+            with open(checkpoint_path + '.tmp', 'w') as f:
+                json.dump({'file': path, 'size': size, 'rows': rows}, f)
+            os.replace(checkpoint_path + '.tmp', checkpoint_path)
+
+        def progress(stats):
+            self.stdout.write(
+                f'\r  {stats["rows"]:,} rows: {stats["created"]:,} created, {stats["updated"]:,} updated, '
+                f'{stats["unchanged"]:,} unchanged, {stats["error_count"]:,} errors',
+                ending='',
+            )
+            self.stdout.flush()
+
+        opener = gzip.open if path.endswith('.gz') else open
+        with opener(path, 'rt', newline='', encoding='utf-8-sig') as f:
+            stats = import_attendance(
+                f, batch_size=options['batch_size'], skip=skip, checkpoint=checkpoint, progress=progress,
+            )
+        self.stdout.write('')
+        if os.path.exists(checkpoint_path):
+            os.remove(checkpoint_path)
+
+        if stats['errors']:
+            if options['errors']:
+                with open(options['errors'], 'w', newline='') as f:
+                    writer = csv.writer(f)
+                    writer.writerow(['line', 'error', 'row'])
+                    for e in stats['errors']:
+                        writer.writerow([e['line'], e['error'], ','.join(e['row'])])
+            else:
+                for e in stats['errors'][:20]:
+                    self.stderr.write(f'  line {e["line"]}: {e["error"]}')
+            if stats['error_count'] > len(stats['errors']):
+                self.stderr.write(f'  ... only the first {len(stats["errors"])} of {stats["error_count"]} errors kept')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {stats["rows"] - skip:,} rows in {stats["elapsed"]:.1f}s: {stats["created"]:,} created, '
+            f'{stats["updated"]:,} updated, {stats["unchanged"]:,} unchanged, {stats["error_count"]:,} rejected'
+        ))
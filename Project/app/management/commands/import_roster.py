@@ -0,0 +1,58 @@
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from app.roster import import_roster, CHUNK_SIZE
+import csv
+
+
+class Command(BaseCommand):
+    help = ('Import students and their login users from a CSV file with columns '
+            'student_id, full_name, email, program, batch, year[, username, password]')
+
+    def add_arguments(self, parser):
+        parser.add_argument('csv_file', help='Path to the roster CSV')
+        parser.add_argument('--default-password', default='',
+                            help='Password for rows without one (default: unusable password)')
+        parser.add_argument('--workers', type=int, default=None,
+                            help='Processes for password hashing (default: CPU count, 0 = no pool)')
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help='Rows validated and inserted per batch')
+        parser.add_argument('--errors', help='Write the per-row error report to this CSV file')
+        parser.add_argument('--dry-run', action='store_true', help='Validate and check for duplicates only')
+
+    def handle(self, *args, **options):
+        def progress(stats):
+            self.stdout.write(f'\r  {stats["rows"]} rows read, {stats["valid"]} valid, '
+                              f'{len(stats["errors"])} errors', ending='')
+            self.stdout.flush()
+
+        try:
+            with open(options['csv_file'], newline='', encoding='utf-8-sig') as f:
+                stats = import_roster(
+                    f,
+                    default_password=options['default_password'],
+                    dry_run=options['dry_run'],
+                    workers=options['workers'],
+                    chunk_size=options['chunk_size'],
+                    progress=progress,
+                )
+        except OSError as e:
+            raise CommandError(str(e))
+        except ValidationError as e:
+            raise CommandError(' '.join(e.messages))
+        self.stdout.write('')
+
+        if options['errors']:
+            with open(options['errors'], 'w', newline='') as f:
+                writer = csv.writer(f)
+                writer.writerow(['line', 'student_id', 'error'])
+                for error in stats['errors']:
+                    for message in error['errors']:
+                        writer.writerow([error['line'], error['student_id'], message])
+        else:
+            for error in stats['errors']:
+                self.stderr.write(f'  line {error["line"]} ({error["student_id"]}): {"; ".join(error["errors"])}')
+
+        verb = 'would be imported' if options['dry_run'] else 'imported'
+        self.stdout.write(self.style.SUCCESS(
+            f'{stats["valid"]} of {stats["rows"]} students {verb} in {stats["elapsed"]:.1f}s; '
+            f'{len(stats["errors"])} rows rejected'
+        ))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from app.models import AttendanceRollup, CohortDailyRollup
+from app.rollups import rebuild_student_rollups, rebuild_cohort_rollups
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the attendance rollup tables from raw attendance records'
+
+    def handle(self, *args, **options):
+        rebuild_student_rollups()
+        self.stdout.write(f'Student monthly rollups: {AttendanceRollup.objects.count()} rows')
+
+        rebuild_cohort_rollups()
+        self.stdout.write(f'Cohort daily rollups: {CohortDailyRollup.objects.count()} rows')
+
+        self.stdout.write(self.style.SUCCESS('Attendance rollups rebuilt successfully'))
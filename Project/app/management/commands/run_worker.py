@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from app.tasks import claim, requeue_stale, run
+import os
+import socket
+import time
+
+
+class Command(BaseCommand):
+    help = 'Run queued background tasks (attendance marking, exports, rollup rebuilds) until stopped'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Exit once no task is due instead of polling')
+        parser.add_argument('--sleep', type=float, default=2.0, help='Seconds between polls when idle')
+        parser.add_argument('--max-tasks', type=int, help='Exit after running this many tasks')
+        parser.add_argument('--name', default=f'{socket.gethostname()}:{os.getpid()}', help='Worker name stored on claimed tasks')
+
+    def handle(self, *args, **options):
+        ran = 0
+        self.stdout.write(f'Worker {options["name"]} started')
+        try:
+            while options['max_tasks'] is None or ran < options['max_tasks']:
+                # a long idle loop must not hold on to a connection the server dropped
+                close_old_connections()
+                requeued = requeue_stale()
+                if requeued:
+                    self.stdout.write(self.style.WARNING(f'Requeued {requeued} stale tasks'))
+
+                task = claim(options['name'])
+                if task is None:
+                    if options['once']:
+                        break
+                    time.sleep(options['sleep'])
+                    continue
+
+                started = time.perf_counter()
+                run(task)
+                ran += 1
+                line = f'{task} (attempt {task.attempts}) in {time.perf_counter() - started:.2f}s'
+                self.stdout.write(self.style.SUCCESS(line) if task.status == task.SUCCEEDED else self.style.ERROR(line))
+        except KeyboardInterrupt:
+            self.stdout.write('Stopping')
+        self.stdout.write(f'Ran {ran} tasks')
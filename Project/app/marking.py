@@ -0,0 +1,80 @@
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import Attendance
+from .rollups import rebuild_student_rollups, rebuild_cohort_rollups
+
+BATCH_SIZE = 500
+
+
+def save_attendance_marks(students, att_date, present_ids, marked_by, program=None, batch=None):
+    """
+    Save one day's attendance for a list of students in a single transaction.
+
+    New rows go in with bulk_create (as a native upsert on backends that
+    support ON CONFLICT, so a concurrent marker cannot make it fail), rows
+    whose is_present flipped go out with one bulk_update, and rows that did
+    not change are not written at all. The query count does not depend on
+    the number of students.
+
+    Bulk writes skip the model signals, so the rollups for the touched
+    students and cohort are rebuilt for att_date afterwards.
+
+    Returns {"created": n, "updated": n, "unchanged": n}.
+    """
+    students = list(students)
+    present_ids = set(present_ids)
+    now = timezone.now()
+
+    with transaction.atomic():
+        existing = {
+            a.student_id: a
+            for a in Attendance.objects.filter(student__in=students, date=att_date)
+            .order_by()
+            .select_for_update()
+        }
+
+        new_rows, changed_rows = [], []
+        for s in students:
+            is_present = s.id in present_ids
+            a = existing.get(s.id)
+            if a is None:
+                new_rows.append(Attendance(
+                    student=s, date=att_date, is_present=is_present, marked_by=marked_by, updated_at=now
+                ))
+            elif a.is_present != is_present:
+                a.is_present = is_present
+                a.marked_by = marked_by
+                # bulk_update does not apply auto_now
+                a.updated_at = now
+                changed_rows.append(a)
+
+        if new_rows:
+            if connection.features.supports_update_conflicts_with_target:
+                Attendance.objects.bulk_create(
+                    new_rows,
+                    batch_size=BATCH_SIZE,
+                    update_conflicts=True,
+                    unique_fields=["student", "date"],
+                    update_fields=["is_present", "marked_by", "updated_at"],
+                )
+            else:
+                Attendance.objects.bulk_create(new_rows, batch_size=BATCH_SIZE)
+        if changed_rows:
+            Attendance.objects.bulk_update(
+                changed_rows, ["is_present", "marked_by", "updated_at"], batch_size=BATCH_SIZE
+            )
+
+        touched = [a.student_id for a in new_rows + changed_rows]
+        if touched:
+            rebuild_student_rollups(student_ids=touched, start=att_date, end=att_date)
+            if program is not None and batch is not None:
+                rebuild_cohort_rollups(program=program, batch=batch, start=att_date, end=att_date)
+            else:
+                rebuild_cohort_rollups(start=att_date, end=att_date)
+
+    return {
+        "created": len(new_rows),
+        "updated": len(changed_rows),
+        "unchanged": len(students) - len(new_rows) - len(changed_rows),
+    }
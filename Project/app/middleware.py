@@ -0,0 +1,195 @@
+import json
+import logging
+import random
+import time
+from contextlib import ExitStack
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured, MiddlewareNotUsed
+from django.db import connections
+from django.urls import resolve
+
+from .benchmarking import QueryTimer
+from .querycheck import QueryBudgetExceeded, QueryInspector, check_queries
+
+logger = logging.getLogger("app.queries")
+
+
+def _url_names():
+    from . import urls
+    return {p.name for p in urls.urlpatterns if p.name}
+
+
+class QueryInspectorMiddleware:
+    """
+    Opt-in per-request SQL inspection (settings.QUERY_INSPECTOR).
+
+    Records every query a request runs, groups them by normalized SQL shape
+    and checks them against the budget for the request's URL name. A shape
+    repeated N_PLUS_ONE_THRESHOLD times is reported as an N+1 candidate.
+    Violations raise QueryBudgetExceeded when RAISE is set (tests) and are
+    logged to "app.queries" otherwise (production).
+
+    When ENABLED is false the middleware removes itself from the chain at
+    startup, so it costs nothing.
+    """
+
+    def __init__(self, get_response):
+        config = getattr(settings, "QUERY_INSPECTOR", {})
+        if not config.get("ENABLED"):
+            raise MiddlewareNotUsed
+
+        self.get_response = get_response
+        self.budgets = config.get("BUDGETS", {})
+        self.default_budget = config.get("DEFAULT_BUDGET")
+        self.n_plus_one = config.get("N_PLUS_ONE_THRESHOLD")
+        self.should_raise = config.get("RAISE", False)
+
+        unknown = set(self.budgets) - _url_names()
+        if unknown:
+            raise ImproperlyConfigured(
+                f"QUERY_INSPECTOR budgets for unknown URL names: {', '.join(sorted(unknown))}"
+            )
+
+    def __call__(self, request):
+        with QueryInspector() as inspector:
+            response = self.get_response(request)
+
+        match = request.resolver_match
+        url_name = match.url_name if match else None
+        budget = self.budgets.get(url_name, self.default_budget)
+
+        problem = check_queries(inspector, budget, self.n_plus_one)
+        if problem:
+            message = f"{request.method} {request.path} ({url_name}): {problem}"
+            if self.should_raise:
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+        return response
+
+
+# ---------- Server-Timing instrumentation ----------
+
+timing_logger = logging.getLogger("app.timing")
+
+# Collector for the request being timed; None when the request is not sampled
+_current_timings = ContextVar("server_timings", default=None)
+
+
+def _install_template_timer():
+    """
+    Wrap the Django template backend's render() once, so sampled requests
+    can attribute time to template rendering. Unsampled requests pay only
+    one ContextVar lookup per render.
+    """
+    from django.template.backends.django import Template
+
+    if getattr(Template.render, "_server_timing", False):
+        return
+    original = Template.render
+
+    def render(self, context=None, request=None):
+        timings = _current_timings.get()
+        if timings is None:
+            return original(self, context, request)
+        start = time.perf_counter()
+        try:
+            return original(self, context, request)
+        finally:
+            timings["template"] += time.perf_counter() - start
+
+    render._server_timing = True
+    Template.render = render
+
+
+class ServerTimingMiddleware:
+    """
+    Sampled per-request timing breakdown (settings.SERVER_TIMING).
+
+    For a SAMPLE_RATE fraction of requests it measures URL resolution,
+    session/auth loading, the view (including inner middleware), template
+    rendering and DB queries (count and time, via connection execute
+    wrappers). It emits them as a Server-Timing response header and as one
+    JSON line on the "app.timing" logger. With SAMPLE_RATE 0 the middleware
+    removes itself at startup; otherwise unsampled requests cost one
+    random() call.
+
+    Should be first in MIDDLEWARE so "total" covers the whole stack.
+    """
+
+    def __init__(self, get_response):
+        config = getattr(settings, "SERVER_TIMING", {})
+        self.sample_rate = config.get("SAMPLE_RATE", 0.0)
+        if self.sample_rate <= 0:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.header = config.get("HEADER", True)
+        self.log = config.get("LOG", True)
+        _install_template_timer()
+
+    def __call__(self, request):
+        if self.sample_rate < 1 and random.random() >= self.sample_rate:
+            return self.get_response(request)
+
+        timings = {"resolve": 0.0, "auth": 0.0, "template": 0.0, "view_start": None}
+        request._server_timings = timings
+        db = QueryTimer()
+        token = _current_timings.set(timings)
+        start = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for alias in connections:
+                    stack.enter_context(connections[alias].execute_wrapper(db))
+                response = self.get_response(request)
+        finally:
+            _current_timings.reset(token)
+        end = time.perf_counter()
+
+        view_start = timings["view_start"] or end
+        metrics = {
+            "total": end - start,
+            "resolve": timings["resolve"],
+            "auth": timings["auth"],
+            "view": end - view_start,
+            "template": timings["template"],
+            "db": db.duration,
+        }
+        if self.header:
+            response["Server-Timing"] = ", ".join(
+                [f"{name};dur={seconds * 1000:.2f}" for name, seconds in metrics.items()]
+                + [f'queries;desc="{db.count} queries"']
+            )
+        if self.log:
+            match = request.resolver_match
+            timing_logger.info(json.dumps({
+                "method": request.method,
+                "path": request.path,
+                "url_name": match.url_name if match else None,
+                "status": response.status_code,
+                "queries": db.count,
+                **{f"{name}_ms": round(seconds * 1000, 3) for name, seconds in metrics.items()},
+            }))
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        timings = getattr(request, "_server_timings", None)
+        if timings is None:
+            return None
+
+        # Django has already resolved the URL at this point; resolving the
+        # path again on sampled requests gives the cost of that step.
+        start = time.perf_counter()
+        resolve(request.path_info, getattr(request, "urlconf", None))
+        timings["resolve"] = time.perf_counter() - start
+
+        # request.user is lazy: force the session and user loads here so
+        # they are attributed to auth rather than to the view
+        start = time.perf_counter()
+        user = getattr(request, "user", None)
+        if user is not None:
+            user.is_authenticated
+        timings["auth"] = time.perf_counter() - start
+
+        timings["view_start"] = time.perf_counter()
+        return None
@@ -0,0 +1,75 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:08
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, F, Q
+from django.db.models.functions import ExtractMonth, ExtractYear
+
+
+def backfill_rollups(apps, schema_editor):
+    Attendance = apps.get_model('app', 'Attendance')
+    AttendanceRollup = apps.get_model('app', 'AttendanceRollup')
+    CohortDailyRollup = apps.get_model('app', 'CohortDailyRollup')
+    counts = dict(
+        present=Count('id', filter=Q(is_present=True)),
+        absent=Count('id', filter=Q(is_present=False)),
+        total=Count('id'),
+    )
+
+    monthly = (
+        Attendance.objects.order_by()
+        .annotate(year=ExtractYear('date'), month=ExtractMonth('date'))
+        .values('student_id', 'year', 'month')
+        .annotate(**counts)
+    )
+    AttendanceRollup.objects.bulk_create((AttendanceRollup(**row) for row in monthly), batch_size=1000)
+
+    daily = (
+        Attendance.objects.order_by()
+        .values(program=F('student__program'), batch=F('student__batch'), day=F('date'))
+        .annotate(**counts)
+    )
+    CohortDailyRollup.objects.bulk_create(
+        (CohortDailyRollup(date=row.pop('day'), **row) for row in daily), batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0004_student_year'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CohortDailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('program', models.CharField(max_length=100)),
+                ('batch', models.CharField(max_length=30)),
+                ('date', models.DateField()),
+                ('present', models.IntegerField(default=0)),
+                ('absent', models.IntegerField(default=0)),
+                ('total', models.IntegerField(default=0)),
+            ],
+            options={
+                'unique_together': {('program', 'batch', 'date')},
+            },
+        ),
+        migrations.CreateModel(
+            name='AttendanceRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.IntegerField()),
+                ('month', models.IntegerField()),
+                ('present', models.IntegerField(default=0)),
+                ('absent', models.IntegerField(default=0)),
+                ('total', models.IntegerField(default=0)),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rollups', to='app.student')),
+            ],
+            options={
+                'unique_together': {('student', 'year', 'month')},
+            },
+        ),
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
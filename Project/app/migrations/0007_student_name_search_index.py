@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:18
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0006_attendance_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='student',
+            index=models.Index(django.db.models.functions.text.Upper('full_name'), name='student_upper_name_idx'),
+        ),
+    ]
@@ -0,0 +1,226 @@
+from collections import Counter, defaultdict
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def _normalized(name):
+    return ' '.join(name.split()).casefold()
+
+
+def fill_lookups(apps, schema_editor):
+    """
+    One Program/Batch row per distinct name, then point every row at it.
+
+    The legacy columns were free text, so names differing only in spacing
+    or case ('CS', 'CS ', 'cs') are one cohort: they share a lookup row
+    named after their most common spelling, and rollup rows that end up
+    on the same (program, batch, date) are merged.
+    """
+    Program = apps.get_model('app', 'Program')
+    Batch = apps.get_model('app', 'Batch')
+    Student = apps.get_model('app', 'Student')
+    CohortDailyRollup = apps.get_model('app', 'CohortDailyRollup')
+
+    for lookup, field in ((Program, 'program'), (Batch, 'batch')):
+        counts = Counter()
+        for model in (Student, CohortDailyRollup):
+            for name, n in model.objects.order_by().values_list(field).annotate(n=Count('pk')):
+                counts[name] += n
+        spellings = defaultdict(Counter)
+        for name, n in counts.items():
+            spellings[_normalized(name)][' '.join(name.split())] += n
+        canonical = {
+            key: min(found, key=lambda spelling: (-found[spelling], spelling))
+            for key, found in spellings.items()
+        }
+        lookup.objects.bulk_create([lookup(name=name) for name in sorted(canonical.values())])
+        pks = dict(lookup.objects.values_list('name', 'pk'))
+
+        # one UPDATE per distinct raw name rather than one per row
+        for name in counts:
+            pk = pks[canonical[_normalized(name)]]
+            for model in (Student, CohortDailyRollup):
+                model.objects.filter(**{field: name}).update(**{f'{field}_ref': pk})
+
+    duplicates = (
+        CohortDailyRollup.objects.order_by().values('program_ref', 'batch_ref', 'date')
+        .annotate(n=Count('pk')).filter(n__gt=1)
+    )
+    for cohort in duplicates:
+        rows = CohortDailyRollup.objects.filter(
+            program_ref=cohort['program_ref'], batch_ref=cohort['batch_ref'], date=cohort['date'],
+        ).order_by('pk')
+        keep, *merged = rows
+        for row in merged:
+            keep.present += row.present
+            keep.absent += row.absent
+            keep.total += row.total
+        keep.save(update_fields=['present', 'absent', 'total'])
+        rows.exclude(pk=keep.pk).delete()
+
+
+def copy_names_back(apps, schema_editor):
+    Program = apps.get_model('app', 'Program')
+    Batch = apps.get_model('app', 'Batch')
+    Student = apps.get_model('app', 'Student')
+    CohortDailyRollup = apps.get_model('app', 'CohortDailyRollup')
+
+    for lookup, field in ((Program, 'program'), (Batch, 'batch')):
+        for pk, name in lookup.objects.values_list('pk', 'name'):
+            for model in (Student, CohortDailyRollup):
+                model.objects.filter(**{f'{field}_ref': pk}).update(**{field: name})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0007_student_name_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Program',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+            ],
+            options={
+                'ordering': ['name'],
+            },
+        ),
+        migrations.CreateModel(
+            name='Batch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=30, unique=True)),
+            ],
+            options={
+                'ordering': ['name'],
+                'verbose_name_plural': 'batches',
+            },
+        ),
+
+        # nullable FKs next to the old text columns, filled from them
+        migrations.AddField(
+            model_name='student',
+            name='program_ref',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='app.program'),
+        ),
+        migrations.AddField(
+            model_name='student',
+            name='batch_ref',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='app.batch'),
+        ),
+        migrations.AddField(
+            model_name='cohortdailyrollup',
+            name='program_ref',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='app.program'),
+        ),
+        migrations.AddField(
+            model_name='cohortdailyrollup',
+            name='batch_ref',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='app.batch'),
+        ),
+        # the text-column index and unique key go before the data step, so
+        # that backwards they come back only after copy_names_back() has
+        # refilled the columns (re-added as '' they would collide)
+        migrations.RemoveIndex(
+            model_name='student',
+            name='student_cohort_name_idx',
+        ),
+        migrations.AlterUniqueTogether(
+            name='cohortdailyrollup',
+            unique_together=set(),
+        ),
+        migrations.RunPython(fill_lookups, copy_names_back),
+
+        # drop the text columns and take over their names
+        # (the defaults only matter when migrating backwards, where the
+        # text columns are re-added to tables that already have rows)
+        migrations.AlterField(
+            model_name='student',
+            name='program',
+            field=models.CharField(default='', max_length=100),
+        ),
+        migrations.AlterField(
+            model_name='student',
+            name='batch',
+            field=models.CharField(default='', max_length=30),
+        ),
+        migrations.AlterField(
+            model_name='cohortdailyrollup',
+            name='program',
+            field=models.CharField(default='', max_length=100),
+        ),
+        migrations.AlterField(
+            model_name='cohortdailyrollup',
+            name='batch',
+            field=models.CharField(default='', max_length=30),
+        ),
+        migrations.RemoveField(
+            model_name='student',
+            name='program',
+        ),
+        migrations.RemoveField(
+            model_name='student',
+            name='batch',
+        ),
+        migrations.RemoveField(
+            model_name='cohortdailyrollup',
+            name='program',
+        ),
+        migrations.RemoveField(
+            model_name='cohortdailyrollup',
+            name='batch',
+        ),
+        migrations.RenameField(
+            model_name='student',
+            old_name='program_ref',
+            new_name='program',
+        ),
+        migrations.RenameField(
+            model_name='student',
+            old_name='batch_ref',
+            new_name='batch',
+        ),
+        migrations.RenameField(
+            model_name='cohortdailyrollup',
+            old_name='program_ref',
+            new_name='program',
+        ),
+        migrations.RenameField(
+            model_name='cohortdailyrollup',
+            old_name='batch_ref',
+            new_name='batch',
+        ),
+        migrations.AlterField(
+            model_name='student',
+            name='program',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='students', to='app.program'),
+        ),
+        migrations.AlterField(
+            model_name='student',
+            name='batch',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='students', to='app.batch'),
+        ),
+        migrations.AlterField(
+            model_name='cohortdailyrollup',
+            name='program',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='app.program'),
+        ),
+        migrations.AlterField(
+            model_name='cohortdailyrollup',
+            name='batch',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='app.batch'),
+        ),
+        migrations.AddIndex(
+            model_name='student',
+            index=models.Index(fields=['program', 'batch', 'full_name'], name='student_cohort_name_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='cohortdailyrollup',
+            unique_together={('program', 'batch', 'date')},
+        ),
+    ]
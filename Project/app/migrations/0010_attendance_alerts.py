@@ -0,0 +1,54 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:01
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0009_attendance_updated_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AlertRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('watermark', models.DateTimeField()),
+                ('started_at', models.DateTimeField(auto_now_add=True)),
+                ('students', models.IntegerField(default=0)),
+                ('alerts', models.IntegerField(default=0)),
+                ('notified', models.IntegerField(default=0)),
+            ],
+            options={
+                'get_latest_by': 'watermark',
+            },
+        ),
+        migrations.CreateModel(
+            name='AttendanceAlert',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('level', models.CharField(choices=[('critical', 'Critical'), ('below_average', 'Below average'), ('ok', 'Recovered')], max_length=20)),
+                ('previous_level', models.CharField(choices=[('critical', 'Critical'), ('below_average', 'Below average'), ('ok', 'Recovered')], max_length=20)),
+                ('percentage', models.FloatField()),
+                ('present', models.IntegerField()),
+                ('total', models.IntegerField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('notified_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='attendance',
+            index=models.Index(fields=['updated_at'], name='att_updated_idx'),
+        ),
+        migrations.AddField(
+            model_name='attendancealert',
+            name='student',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='alerts', to='app.student'),
+        ),
+        migrations.AddIndex(
+            model_name='attendancealert',
+            index=models.Index(fields=['student', 'created_at'], name='alert_student_created_idx'),
+        ),
+    ]
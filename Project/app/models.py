@@ -1,4 +1,5 @@
 from django.db import models
+from django.db.models.functions import Upper
 from django.contrib.auth.models import AbstractUser
 from django.conf import settings
 from django.utils import timezone
@@ -16,6 +17,28 @@ class CustomUser(AbstractUser):
 User = settings.AUTH_USER_MODEL
 
 
+# Lookup tables for the cohort a student belongs to
+class Program(models.Model):
+    name = models.CharField(max_length=100, unique=True)
+
+    class Meta:
+        ordering = ["name"]
+
+    def __str__(self):
+        return self.name
+
+
+class Batch(models.Model):
+    name = models.CharField(max_length=30, unique=True)
+
+    class Meta:
+        ordering = ["name"]
+        verbose_name_plural = "batches"
+
+    def __str__(self):
+        return self.name
+
+
 # Student profile table (admin manages this)
 class Student(models.Model):
     # Optional link to login user account (can be used later)
@@ -30,12 +53,21 @@ class Student(models.Model):
     student_id = models.CharField(max_length=20, unique=True)
     full_name = models.CharField(max_length=100)
     email = models.EmailField(unique=True)
-    program = models.CharField(max_length=100)
-    batch = models.CharField(max_length=30)
+    program = models.ForeignKey(Program, on_delete=models.PROTECT, related_name="students")
+    batch = models.ForeignKey(Batch, on_delete=models.PROTECT, related_name="students")
     year = models.IntegerField(max_length=30, default=2022)
 
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # admin views filter by (program, batch) and order by full_name
+            models.Index(fields=["program", "batch", "full_name"], name="student_cohort_name_idx"),
+            # case-insensitive prefix search on the student list
+            models.Index(Upper("full_name"), name="student_upper_name_idx"),
+            models.Index(Upper("student_id"), name="student_upper_id_idx"),
+        ]
+
     def __str__(self):
         return f"{self.student_id} - {self.full_name}"
     
@@ -53,6 +85,149 @@ class Attendance(models.Model):
     class Meta:
         unique_together = ("student", "date")
         ordering = ["-date", "student__full_name"]
+        indexes = [
+            # student views filter by (student, date range, is_present); the
+            # trailing is_present lets counts be answered from the index alone
+            models.Index(fields=["student", "date", "is_present"], name="att_student_date_present_idx"),
+            # admin reports filter a date or date range across many students
+            models.Index(fields=["date", "is_present"], name="att_date_present_idx"),
+            # the dashboard ETag reads a student's latest updated_at
+            models.Index(fields=["student", "updated_at"], name="att_student_updated_idx"),
+            # the alert scan finds the rows changed since its last watermark
+            models.Index(fields=["updated_at"], name="att_updated_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.student.full_name} - {self.date} - {'P' if self.is_present else 'A'}"
+
+# Materialized attendance counters (kept in sync by app.signals, rebuilt by
+# the rebuild_rollups management command)
+class AttendanceRollup(models.Model):
+    student = models.ForeignKey(Student, on_delete=models.CASCADE, related_name="rollups")
+    year = models.IntegerField()
+    month = models.IntegerField()
+
+    present = models.IntegerField(default=0)
+    absent = models.IntegerField(default=0)
+    total = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ("student", "year", "month")
+
+    def __str__(self):
+        return f"{self.student_id} - {self.year}-{self.month:02d} - {self.present}/{self.total}"
+
+
+class CohortDailyRollup(models.Model):
+    program = models.ForeignKey(Program, on_delete=models.CASCADE, related_name="+")
+    batch = models.ForeignKey(Batch, on_delete=models.CASCADE, related_name="+")
+    date = models.DateField()
+
+    present = models.IntegerField(default=0)
+    absent = models.IntegerField(default=0)
+    total = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ("program", "batch", "date")
+
+    def __str__(self):
+        return f"{self.program_id} {self.batch_id} - {self.date} - {self.present}/{self.total}"
+
+
+# Low-attendance alerts: one row each time a student's overall attendance
+# crosses a status threshold (written by app.alerts)
+class AttendanceAlert(models.Model):
+    LEVEL_CHOICES = [
+        ("critical", "Critical"),
+        ("below_average", "Below average"),
+        ("ok", "Recovered"),
+    ]
+
+    student = models.ForeignKey(Student, on_delete=models.CASCADE, related_name="alerts")
+    level = models.CharField(max_length=20, choices=LEVEL_CHOICES)
+    previous_level = models.CharField(max_length=20, choices=LEVEL_CHOICES)
+    percentage = models.FloatField()
+    present = models.IntegerField()
+    total = models.IntegerField()
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    # set once the email has been handed to the email backend
+    notified_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # the scan reads the latest alert of each changed student
+            models.Index(fields=["student", "created_at"], name="alert_student_created_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.student_id} - {self.level} ({self.percentage}%) - {self.created_at:%Y-%m-%d}"
+
+
+# One row per alert scan; the newest watermark is where the next scan resumes
+class AlertRun(models.Model):
+    watermark = models.DateTimeField()
+    started_at = models.DateTimeField(auto_now_add=True)
+    students = models.IntegerField(default=0)
+    alerts = models.IntegerField(default=0)
+    notified = models.IntegerField(default=0)
+
+    class Meta:
+        get_latest_by = "watermark"
+
+    def __str__(self):
+        return f"{self.started_at:%Y-%m-%d %H:%M} - up to {self.watermark:%Y-%m-%d %H:%M} - {self.alerts} alerts"
+
+
+# Background job queue (app.tasks, run by the run_worker command): heavy
+# admin operations are stored here and executed outside the request
+class Task(models.Model):
+    QUEUED, RUNNING, SUCCEEDED, FAILED = "queued", "running", "succeeded", "failed"
+    STATUS_CHOICES = [
+        (QUEUED, "Queued"),
+        (RUNNING, "Running"),
+        (SUCCEEDED, "Succeeded"),
+        (FAILED, "Failed"),
+    ]
+
+    kind = models.CharField(max_length=50)
+    params = models.JSONField(default=dict)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED)
+
+    # progress: done out of total steps (total is None while unknown)
+    done = models.IntegerField(default=0)
+    total = models.IntegerField(null=True, blank=True)
+
+    attempts = models.IntegerField(default=0)
+    max_attempts = models.IntegerField(default=3)
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True)
+
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name="+")
+    created_at = models.DateTimeField(auto_now_add=True)
+    # not picked up before this (retries back off)
+    run_after = models.DateTimeField(default=timezone.now)
+    started_at = models.DateTimeField(null=True, blank=True)
+    # refreshed by progress updates; a running task that stops beating is requeued
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    worker = models.CharField(max_length=100, blank=True)
+
+    class Meta:
+        indexes = [
+            # workers poll for the oldest due queued task
+            models.Index(fields=["status", "run_after"], name="task_status_run_after_idx"),
+        ]
+
+    @property
+    def percent(self):
+        if self.status == self.SUCCEEDED:
+            return 100
+        return round(self.done * 100 / self.total) if self.total else 0
+
+    @property
+    def finished(self):
+        return self.status in (self.SUCCEEDED, self.FAILED)
 
     def __str__(self):
-        return f"{self.student.full_name} - {self.date} - {'P' if self.is_present else 'A'}"
\ No newline at end of file
+        return f"{self.kind} #{self.pk} - {self.status}"
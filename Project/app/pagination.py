@@ -0,0 +1,58 @@
+def keyset_page(queryset, field, size, after=None, before=None, descending=False):
+    """
+    One page of queryset in `field` order, using the last/first key of the
+    neighbouring page as a cursor instead of OFFSET, so every page costs the
+    same however deep it is. `field` must be unique within the queryset.
+
+    after:  return the page that follows this key (in list order)
+    before: return the page that ends just before this key
+
+    Returns {"items", "next", "prev"}, where next/prev are the cursors for
+    the "after"/"before" links (None when there is no such page).
+    """
+    query, backwards = _page_query(queryset, field, size, after, before, descending)
+    return _page(list(query), field, size, after, backwards)
+
+
+async def akeyset_page(queryset, field, size, after=None, before=None, descending=False):
+    """keyset_page() on the async ORM"""
+    query, backwards = _page_query(queryset, field, size, after, before, descending)
+    return _page([row async for row in query], field, size, after, backwards)
+
+
+def _page_query(queryset, field, size, after, before, descending):
+    """The size + 1 rows to fetch, and whether they come back in reverse list order"""
+    forward, backward = ("lt", "gt") if descending else ("gt", "lt")
+    order = f"-{field}" if descending else field
+    reverse_order = field if descending else f"-{field}"
+
+    if before is not None:
+        return queryset.filter(**{f"{field}__{backward}": before}).order_by(reverse_order)[:size + 1], True
+    if after is not None:
+        queryset = queryset.filter(**{f"{field}__{forward}": after})
+    return queryset.order_by(order)[:size + 1], False
+
+
+def _page(rows, field, size, after, backwards):
+    has_more = len(rows) > size
+    if backwards:
+        rows = rows[:size][::-1]
+        has_next, has_prev = True, has_more
+    else:
+        rows = rows[:size]
+        has_next, has_prev = has_more, after is not None
+
+    return {
+        "items": rows,
+        "next": getattr(rows[-1], field) if rows and has_next else None,
+        "prev": getattr(rows[0], field) if rows and has_prev else None,
+    }
+
+
+def page_size(request, default, maximum):
+    """?per_page=N clamped to [1, maximum], falling back to default"""
+    try:
+        size = int(request.GET.get("per_page", default))
+    except ValueError:
+        return default
+    return max(1, min(size, maximum))
@@ -0,0 +1,119 @@
+import re
+import time
+from collections import Counter
+from contextlib import ExitStack
+
+from django.db import connections
+
+# Literals and placeholders collapse to "?", IN lists to "IN (?)", so two
+# queries that differ only in their parameters share one shape
+_IN_LIST = re.compile(r"\bIN \(\?(?:\s*,\s*\?)*\)", re.IGNORECASE)
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PLACEHOLDER = re.compile(r"%s|\?")
+_SPACE = re.compile(r"\s+")
+
+
+def normalize_sql(sql):
+    """Reduce a SQL statement to its shape, e.g. for N+1 detection"""
+    sql = _STRING.sub("?", sql)
+    sql = _PLACEHOLDER.sub("?", sql)
+    sql = _NUMBER.sub("?", sql)
+    sql = _IN_LIST.sub("IN (?)", sql)
+    return _SPACE.sub(" ", sql).strip()
+
+
+class QueryBudgetExceeded(AssertionError):
+    """Raised when a request or block runs more queries than its budget allows"""
+
+
+class QueryInspector:
+    """
+    Context manager that records every SQL query on every database
+    connection while it is active.
+
+        with QueryInspector() as inspector:
+            ...
+        inspector.count, inspector.duration, inspector.repeated(5)
+    """
+
+    def __init__(self):
+        self.queries = []
+        self._stack = None
+
+    def __enter__(self):
+        self._stack = ExitStack()
+        for alias in connections:
+            self._stack.enter_context(connections[alias].execute_wrapper(self._record))
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stack.close()
+
+    def _record(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append((sql, time.perf_counter() - start))
+
+    @property
+    def count(self):
+        return len(self.queries)
+
+    @property
+    def duration(self):
+        return sum(duration for _, duration in self.queries)
+
+    def shapes(self):
+        """Counter of normalized SQL shape -> number of executions"""
+        return Counter(normalize_sql(sql) for sql, _ in self.queries)
+
+    def repeated(self, threshold):
+        """Shapes executed at least threshold times: N+1 candidates"""
+        return [(shape, n) for shape, n in self.shapes().most_common() if n >= threshold]
+
+    def report(self, limit=5):
+        lines = [f"{self.count} queries in {self.duration * 1000:.1f} ms"]
+        for shape, n in self.shapes().most_common(limit):
+            lines.append(f"  {n:>4} x {shape[:200]}")
+        return "\n".join(lines)
+
+
+class query_budget:
+    """
+    Test helper: fail if the block runs more than max_queries queries, or
+    (with n_plus_one) repeats any one query shape that many times.
+
+        with query_budget(6, n_plus_one=3):
+            self.client.get(url)
+    """
+
+    def __init__(self, max_queries=None, n_plus_one=None):
+        self.max_queries = max_queries
+        self.n_plus_one = n_plus_one
+        self.inspector = QueryInspector()
+
+    def __enter__(self):
+        self.inspector.__enter__()
+        return self.inspector
+
+    def __exit__(self, exc_type, *exc_info):
+        self.inspector.__exit__(exc_type, *exc_info)
+        if exc_type is None:
+            problem = check_queries(self.inspector, self.max_queries, self.n_plus_one)
+            if problem:
+                raise QueryBudgetExceeded(problem)
+
+
+def check_queries(inspector, max_queries=None, n_plus_one=None):
+    """Describe a budget or N+1 violation, or return None if there is none"""
+    problems = []
+    if max_queries is not None and inspector.count > max_queries:
+        problems.append(f"query budget exceeded: {inspector.count} > {max_queries}")
+    if n_plus_one:
+        for shape, n in inspector.repeated(n_plus_one):
+            problems.append(f"possible N+1: {n} x {shape[:200]}")
+    if not problems:
+        return None
+    return "\n".join(problems + [inspector.report()])
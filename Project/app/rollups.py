@@ -0,0 +1,251 @@
+import calendar
+from itertools import islice
+
+from django.db import transaction
+from django.db.models import Count, F, Q
+from django.db.models.functions import ExtractMonth, ExtractYear
+
+from . import caching
+from .models import Attendance, AttendanceRollup, CohortDailyRollup, Student
+
+BATCH_SIZE = 1000
+# Past this many (student, month) cache tokens, drop every cached view instead
+INVALIDATE_LIMIT = 10000
+
+
+def _bump(model, keys, present, absent):
+    """
+    Add present/absent deltas to one rollup row, creating it if missing and
+    deleting it once it counts nothing, so readers never see empty rows
+    """
+    if not (present or absent):
+        return
+    changes = {
+        "present": F("present") + present,
+        "absent": F("absent") + absent,
+        "total": F("total") + present + absent,
+    }
+    if model.objects.filter(**keys).update(**changes):
+        if present + absent < 0:
+            model.objects.filter(**keys, total__lte=0).delete()
+        return
+    obj, created = model.objects.get_or_create(
+        **keys,
+        defaults={"present": present, "absent": absent, "total": present + absent},
+    )
+    if not created:
+        model.objects.filter(pk=obj.pk).update(**changes)
+
+
+def bump_attendance(student, day, is_present, sign=1):
+    """
+    Incrementally count (sign=1) or uncount (sign=-1) one attendance row in
+    both the per-student monthly and the per-cohort daily rollups.
+    """
+    present = sign if is_present else 0
+    absent = 0 if is_present else sign
+    with transaction.atomic():
+        _bump(AttendanceRollup, {"student_id": student.pk, "year": day.year, "month": day.month},
+              present, absent)
+        _bump(CohortDailyRollup, {"program_id": student.program_id, "batch_id": student.batch_id, "date": day},
+              present, absent)
+
+
+def _apply_counts(model, fields, counts, rollups):
+    """
+    Add {key: [present, absent]} deltas to the rollup rows of `model`
+    whose `fields` values are key; `rollups` is a queryset holding at least
+    those rows. The touched rows are locked, deleted and inserted again with
+    their new counts (far cheaper than bulk_update's CASE per row); rows
+    left counting nothing are not inserted again.
+    """
+    existing = {tuple(getattr(obj, f) for f in fields): obj for obj in rollups.select_for_update()}
+    stale, rows = [], []
+    for key, (present, absent) in counts.items():
+        obj = existing.get(key)
+        if obj is not None:
+            stale.append(obj.pk)
+            present += obj.present
+            absent += obj.absent
+        if present + absent > 0:
+            rows.append(model(**dict(zip(fields, key)), present=present, absent=absent, total=present + absent))
+    for first in range(0, len(stale), BATCH_SIZE):
+        model.objects.filter(pk__in=stale[first:first + BATCH_SIZE]).delete()
+    _bulk_insert(model, rows)
+
+
+def add_counts(marks):
+    """
+    Count a bulk attendance write into both rollups incrementally. marks
+    holds (student pk, date, present delta, absent delta) per written row:
+    (1, 0) for a new present row, (-1, 1) for one changed to absent, etc.
+
+    Only the touched (student, month) and (cohort, day) rows are read and
+    rewritten, in a few queries per call, so the cost follows the rows
+    written rather than the history they fall in. Call it inside the
+    transaction that wrote the rows.
+    """
+    cohorts = {
+        pk: (program, batch) for pk, program, batch in
+        Student.objects.filter(pk__in={pk for pk, *_ in marks}).values_list("pk", "program_id", "batch_id")
+    }
+    student_counts, cohort_counts = {}, {}
+    for pk, day, present, absent in marks:
+        for counts, key in ((student_counts, (pk, day.year, day.month)), (cohort_counts, (*cohorts[pk], day))):
+            entry = counts.setdefault(key, [0, 0])
+            entry[0] += present
+            entry[1] += absent
+    if not student_counts:
+        return
+
+    first = min(day for _, day, *_ in marks)
+    last = max(day for _, day, *_ in marks)
+    _apply_counts(
+        AttendanceRollup, ("student_id", "year", "month"), student_counts,
+        AttendanceRollup.objects.filter(
+            Q(year__gt=first.year) | Q(year=first.year, month__gte=first.month),
+            Q(year__lt=last.year) | Q(year=last.year, month__lte=last.month),
+            student_id__in=cohorts,
+        ),
+    )
+    _apply_counts(
+        CohortDailyRollup, ("program_id", "batch_id", "date"), cohort_counts,
+        CohortDailyRollup.objects.filter(
+            program_id__in={program for program, _ in cohorts.values()},
+            batch_id__in={batch for _, batch in cohorts.values()},
+            date__range=(first, last),
+        ),
+    )
+    _drop_cached_months(list(student_counts))
+
+
+def _bulk_insert(model, objs):
+    """bulk_create from a generator in BATCH_SIZE chunks, keeping memory bounded"""
+    objs = iter(objs)
+    while chunk := list(islice(objs, BATCH_SIZE)):
+        model.objects.bulk_create(chunk)
+
+
+def _month_bounds(start, end):
+    """Widen a date range to whole months, since student rollups are monthly"""
+    if start:
+        start = start.replace(day=1)
+    if end:
+        end = end.replace(day=calendar.monthrange(end.year, end.month)[1])
+    return start, end
+
+
+def _date_range(qs, start, end, field="date"):
+    if start:
+        qs = qs.filter(**{f"{field}__gte": start})
+    if end:
+        qs = qs.filter(**{f"{field}__lte": end})
+    return qs
+
+
+def rebuild_student_rollups(student_ids=None, start=None, end=None):
+    """
+    Recompute AttendanceRollup rows from raw Attendance.
+
+    Scope is optional: limit to some students and/or to the months touching
+    [start, end]. Runs as one delete, one grouped aggregate and batched
+    inserts, so the query count does not grow with the number of rows.
+
+    Every bulk Attendance write ends here, so this is also where those
+    students' cached views are dropped.
+    """
+    start, end = _month_bounds(start, end)
+
+    rollups = AttendanceRollup.objects.all()
+    # order_by() drops Attendance.Meta.ordering, which would otherwise join
+    # Student and leak into the GROUP BY
+    qs = Attendance.objects.order_by()
+    if student_ids is not None:
+        rollups = rollups.filter(student_id__in=student_ids)
+        qs = qs.filter(student_id__in=student_ids)
+    if start:
+        rollups = rollups.filter(Q(year__gt=start.year) | Q(year=start.year, month__gte=start.month))
+    if end:
+        rollups = rollups.filter(Q(year__lt=end.year) | Q(year=end.year, month__lte=end.month))
+    qs = _date_range(qs, start, end)
+
+    agg = (
+        qs.annotate(year=ExtractYear("date"), month=ExtractMonth("date"))
+        .values("student_id", "year", "month")
+        .annotate(
+            present=Count("id", filter=Q(is_present=True)),
+            absent=Count("id", filter=Q(is_present=False)),
+            total=Count("id"),
+        )
+    )
+
+    with transaction.atomic():
+        rollups.delete()
+        _bulk_insert(AttendanceRollup, (AttendanceRollup(**row) for row in agg.iterator(chunk_size=BATCH_SIZE)))
+
+    _drop_cached_views(student_ids, start, end)
+
+
+def _months(start, end):
+    year, month = start.year, start.month
+    while (year, month) <= (end.year, end.month):
+        yield year, month
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+
+
+def _drop_cached_views(student_ids, start, end):
+    if student_ids is None or not start or not end:
+        caching.invalidate_all()
+        return
+    months = list(_months(start, end))
+    if len(student_ids) * len(months) > INVALIDATE_LIMIT:
+        caching.invalidate_all()
+        return
+    _drop_cached_months([(pk, year, month) for pk in student_ids for year, month in months])
+
+
+def _drop_cached_months(student_months):
+    """Drop the cached views of these (student pk, year, month)s"""
+    if len(student_months) > INVALIDATE_LIMIT:
+        # cheaper to start over than to replace that many tokens
+        caching.invalidate_all()
+        return
+    caching.invalidate_students({pk for pk, _, _ in student_months})
+    caching.invalidate_months(student_months)
+
+
+def rebuild_cohort_rollups(program=None, batch=None, start=None, end=None):
+    """
+    Recompute CohortDailyRollup rows from raw Attendance (optionally scoped;
+    program and batch are Program/Batch instances or pks)
+    """
+    rollups = CohortDailyRollup.objects.all()
+    qs = Attendance.objects.order_by()
+    if program is not None:
+        rollups = rollups.filter(program=program)
+        qs = qs.filter(student__program=program)
+    if batch is not None:
+        rollups = rollups.filter(batch=batch)
+        qs = qs.filter(student__batch=batch)
+    rollups = _date_range(rollups, start, end)
+    qs = _date_range(qs, start, end)
+
+    agg = (
+        qs.values(program=F("student__program"), batch=F("student__batch"), day=F("date"))
+        .annotate(
+            present=Count("id", filter=Q(is_present=True)),
+            absent=Count("id", filter=Q(is_present=False)),
+            total=Count("id"),
+        )
+    )
+
+    with transaction.atomic():
+        rollups.delete()
+        _bulk_insert(CohortDailyRollup, (
+            CohortDailyRollup(
+                program_id=row["program"], batch_id=row["batch"], date=row["day"],
+                present=row["present"], absent=row["absent"], total=row["total"],
+            )
+            for row in agg.iterator(chunk_size=BATCH_SIZE)
+        ))
+
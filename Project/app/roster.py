@@ -0,0 +1,234 @@
+import csv
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from itertools import islice
+
+import django
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import IntegrityError, transaction
+
+from . import choices
+from .datagen import _pk_map
+from .models import Program, Batch, Student
+
+User = get_user_model()
+
+# Columns a roster CSV must have; username and password are optional
+REQUIRED_COLUMNS = ["student_id", "full_name", "email", "program", "batch", "year"]
+OPTIONAL_COLUMNS = ["username", "password"]
+CHUNK_SIZE = 1000
+
+
+def _field_limits():
+    limits = {name: Student._meta.get_field(name).max_length for name in ("student_id", "full_name")}
+    limits["program"] = Program._meta.get_field("name").max_length
+    limits["batch"] = Batch._meta.get_field("name").max_length
+    limits["username"] = User._meta.get_field("username").max_length
+    return limits
+
+
+def parse_row(row, limits):
+    """Clean one CSV row into a dict, or raise ValidationError with every problem found"""
+    errors = []
+    data = {name: (row.get(name) or "").strip() for name in REQUIRED_COLUMNS + OPTIONAL_COLUMNS}
+    data["password"] = row.get("password") or ""  # passwords keep their whitespace
+
+    for name in REQUIRED_COLUMNS:
+        if not data[name]:
+            errors.append(f"{name} is required")
+    data["email"] = data["email"].lower()
+    data["username"] = data["username"] or data["student_id"].lower()
+
+    for name, limit in limits.items():
+        if len(data[name]) > limit:
+            errors.append(f"{name} is longer than {limit} characters")
+    if data["email"]:
+        try:
+            validate_email(data["email"])
+        except ValidationError:
+            errors.append(f"invalid email {data['email']!r}")
+    if data["year"]:
+        try:
+            data["year"] = int(data["year"])
+        except ValueError:
+            errors.append(f"year must be a number, got {data['year']!r}")
+
+    if errors:
+        raise ValidationError(errors)
+    return data
+
+
+def _setup_worker():
+    # workers started with "spawn" (macOS, Windows) import nothing from the parent
+    django.setup()
+
+
+def hash_passwords(passwords, pool=None, workers=1):
+    """
+    make_password() for every password, spread over `pool` (a process pool
+    of `workers` processes) since each PBKDF2 hash is pure CPU; without a
+    pool they are hashed in this process. Empty passwords give unusable
+    passwords.
+    """
+    passwords = [p or None for p in passwords]
+    if pool is None or len(passwords) < 2:
+        return [make_password(p) for p in passwords]
+    return list(pool.map(make_password, passwords, chunksize=max(1, len(passwords) // (workers * 4))))
+
+
+@contextmanager
+def hashing_pool(workers=None):
+    """
+    (pool, workers) for hash_passwords(), started once for a whole import:
+    workers=None uses every CPU, 0 or 1 hashes in this process (pool None).
+    """
+    workers = (os.cpu_count() or 1) if workers is None else workers
+    if workers <= 1:
+        yield None, 1
+        return
+    with ProcessPoolExecutor(max_workers=workers, initializer=_setup_worker) as pool:
+        yield pool, workers
+
+
+def _existing(model, field, values):
+    """Which of values are already taken in model.field: one IN query"""
+    if not values:
+        return set()
+    return set(model.objects.filter(**{f"{field}__in": values}).values_list(field, flat=True))
+
+
+def _check_unique(chunk, seen):
+    """
+    Drop rows whose username, email or student_id is already used in the
+    database or earlier in the file. Three set-based lookups per chunk
+    (four for email, which must be unique on both users and students).
+    """
+    taken = {
+        "student_id": _existing(Student, "student_id", [d["student_id"] for _, d in chunk]),
+        "username": _existing(User, "username", [d["username"] for _, d in chunk]),
+        "email": (_existing(User, "email", [d["email"] for _, d in chunk])
+                  | _existing(Student, "email", [d["email"] for _, d in chunk])),
+    }
+    accepted, errors = [], []
+    for line, data in chunk:
+        problems = []
+        for field in ("student_id", "username", "email"):
+            value = data[field]
+            if value in taken[field]:
+                problems.append(f"{field} {value!r} already exists")
+            elif value in seen[field]:
+                problems.append(f"{field} {value!r} is repeated on line {seen[field][value]}")
+        if problems:
+            errors.append({"line": line, "student_id": data["student_id"], "errors": problems})
+            continue
+        for field in ("student_id", "username", "email"):
+            seen[field][data[field]] = line
+        accepted.append((line, data))
+    return accepted, errors
+
+
+def _insert(chunk, default_hash, hashing):
+    """
+    Create the users and students for one validated chunk in one
+    transaction. Rows without a password share default_hash; the others
+    are hashed with hashing, a hashing_pool() value.
+    """
+    own = iter(hash_passwords([data["password"] for _, data in chunk if data["password"]], *hashing))
+    hashes = [next(own) if data["password"] else default_hash for _, data in chunk]
+    with transaction.atomic():
+        users = [
+            User(username=data["username"], email=data["email"], password=password)
+            for (_, data), password in zip(chunk, hashes)
+        ]
+        User.objects.bulk_create(users, batch_size=CHUNK_SIZE)
+        user_pks = _pk_map(User, "username", [u.username for u in users], users)
+        program_ids = choices.lookup_ids(Program, {data["program"] for _, data in chunk})
+        batch_ids = choices.lookup_ids(Batch, {data["batch"] for _, data in chunk})
+        Student.objects.bulk_create([
+            Student(
+                user_id=user_pks[data["username"]],
+                student_id=data["student_id"],
+                full_name=data["full_name"],
+                email=data["email"],
+                program_id=program_ids[data["program"]],
+                batch_id=batch_ids[data["batch"]],
+                year=data["year"],
+            )
+            for _, data in chunk
+        ], batch_size=CHUNK_SIZE)
+
+
+def import_roster(lines, default_password="", dry_run=False, workers=None, chunk_size=CHUNK_SIZE, progress=None):
+    """
+    Import students (each with a login user) from CSV text lines.
+
+    The file is read chunk_size rows at a time. Each chunk is validated,
+    checked for duplicates against the database and against the rest of
+    the file, its passwords are hashed in a process pool (of `workers`
+    processes, started once for the import; 0 hashes in this process), and
+    its valid rows are bulk-inserted. Invalid rows are skipped and
+    reported; they never stop the import.
+
+    Rows without a username use the lower-cased student_id; rows without
+    a password get default_password (or an unusable password if that is
+    empty too), hashed once and shared.
+
+    With dry_run nothing is written: rows are only validated and checked.
+
+    Returns {"rows", "valid", "created", "errors", "elapsed"}, where errors
+    is a list of {"line", "student_id", "errors"} sorted by CSV line.
+    """
+    started = time.perf_counter()
+    reader = csv.DictReader(lines)
+    missing = [c for c in REQUIRED_COLUMNS if c not in (reader.fieldnames or [])]
+    if missing:
+        raise ValidationError(f"Missing CSV columns: {', '.join(missing)}")
+
+    limits = _field_limits()
+    seen = {"student_id": {}, "username": {}, "email": {}}
+    stats = {"rows": 0, "valid": 0, "created": 0, "errors": [], "elapsed": 0.0}
+
+    rows = ((reader.line_num, row) for row in reader)
+    # one pool for the whole import, not one per chunk
+    with hashing_pool(0 if dry_run else workers) as hashing:
+        default_hash = None if dry_run else make_password(default_password or None)
+        while True:
+            batch = list(islice(rows, chunk_size))
+            if not batch:
+                break
+            stats["rows"] += len(batch)
+
+            chunk = []
+            for line, row in batch:
+                try:
+                    chunk.append((line, parse_row(row, limits)))
+                except ValidationError as e:
+                    stats["errors"].append({"line": line, "student_id": (row.get("student_id") or "").strip(),
+                                            "errors": e.messages})
+
+            accepted, errors = _check_unique(chunk, seen)
+            stats["errors"].extend(errors)
+            if accepted and not dry_run:
+                try:
+                    _insert(accepted, default_hash, hashing)
+                except IntegrityError as e:
+                    # someone added a conflicting row between the check and the insert
+                    stats["errors"].extend(
+                        {"line": line, "student_id": data["student_id"], "errors": [f"not imported: {e}"]}
+                        for line, data in accepted
+                    )
+                    accepted = []
+                stats["created"] += len(accepted)
+            stats["valid"] += len(accepted)
+
+            if progress:
+                progress(dict(stats, elapsed=time.perf_counter() - started))
+
+    stats["errors"].sort(key=lambda e: e["line"])
+    stats["elapsed"] = time.perf_counter() - started
+    return stats
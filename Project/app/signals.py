@@ -0,0 +1,113 @@
+from django.db.models import Max, Min, QuerySet
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete
+from django.dispatch import receiver
+
+from .models import Program, Batch, Student, Attendance
+from .rollups import bump_attendance, rebuild_cohort_rollups
+from . import caching, choices
+
+
+# ---------- Attendance -> rollups ----------
+
+@receiver(pre_save, sender=Attendance)
+def remember_old_attendance(sender, instance, raw, **kwargs):
+    """Keep the stored row so post_save can uncount it from the rollups"""
+    instance._rollup_old = None
+    if raw or instance.pk is None:
+        return
+    instance._rollup_old = (
+        Attendance.objects.filter(pk=instance.pk)
+        .select_related("student")
+        .order_by()
+        .first()
+    )
+
+
+@receiver(post_save, sender=Attendance)
+def count_attendance(sender, instance, created, raw, **kwargs):
+    if raw:
+        return
+    old = getattr(instance, "_rollup_old", None)
+    if old is not None:
+        if (old.student_id, old.date, old.is_present) == (instance.student_id, instance.date, instance.is_present):
+            return
+        bump_attendance(old.student, old.date, old.is_present, sign=-1)
+    bump_attendance(instance.student, instance.date, instance.is_present)
+
+
+def _deleting_student(origin):
+    return isinstance(origin, Student) or (isinstance(origin, QuerySet) and origin.model is Student)
+
+
+@receiver(post_delete, sender=Attendance)
+def uncount_attendance(sender, instance, origin=None, **kwargs):
+    # Cascades from a student delete are settled once in forget_student_rollups
+    if _deleting_student(origin):
+        return
+    bump_attendance(instance.student, instance.date, instance.is_present, sign=-1)
+
+
+# ---------- Attendance -> cached student views ----------
+
+@receiver(post_save, sender=Attendance)
+@receiver(post_delete, sender=Attendance)
+def drop_student_views(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    records = [instance]
+    old = getattr(instance, "_rollup_old", None)
+    if old is not None:
+        records.append(old)
+    caching.invalidate_students(r.student_id for r in records)
+    caching.invalidate_months((r.student_id, r.date.year, r.date.month) for r in records)
+
+
+# ---------- Student cohort changes ----------
+
+@receiver(pre_save, sender=Student)
+def remember_old_cohort(sender, instance, raw, **kwargs):
+    instance._rollup_cohort = None
+    if raw or instance.pk is None:
+        return
+    instance._rollup_cohort = (
+        Student.objects.filter(pk=instance.pk).values_list("program", "batch").first()
+    )
+
+
+@receiver(post_save, sender=Student)
+def move_cohort_rollups(sender, instance, raw, **kwargs):
+    """A student changing program/batch moves their days to another cohort"""
+    old = getattr(instance, "_rollup_cohort", None)
+    if raw or old is None or old == (instance.program_id, instance.batch_id):
+        return
+    # only the days this student has marks on change, in both cohorts
+    span = Attendance.objects.filter(student=instance).aggregate(start=Min("date"), end=Max("date"))
+    if not span["start"]:
+        return
+    for program, batch in (old, (instance.program_id, instance.batch_id)):
+        rebuild_cohort_rollups(program=program, batch=batch, **span)
+
+
+@receiver(pre_delete, sender=Student)
+def remember_student_range(sender, instance, **kwargs):
+    instance._rollup_range = Attendance.objects.filter(student=instance).aggregate(
+        start=Min("date"), end=Max("date")
+    )
+
+
+@receiver(post_delete, sender=Student)
+def forget_student_rollups(sender, instance, **kwargs):
+    """Their AttendanceRollup rows cascade; recount their cohort's days"""
+    span = getattr(instance, "_rollup_range", None)
+    if span and span["start"]:
+        rebuild_cohort_rollups(program=instance.program_id, batch=instance.batch_id, **span)
+
+
+# ---------- Cohort choice lists ----------
+
+@receiver(post_save, sender=Program)
+@receiver(post_save, sender=Batch)
+@receiver(post_delete, sender=Program)
+@receiver(post_delete, sender=Batch)
+def refresh_cohort_choices(sender, **kwargs):
+    choices.invalidate()
@@ -0,0 +1,151 @@
+import asyncio
+from datetime import timedelta
+
+from django.db.models import Q, Sum
+from django.utils import timezone
+
+from .models import Attendance, AttendanceRollup
+
+# Number of days shown on the dashboard trend chart
+TREND_DAYS = 30
+# Number of rows shown in the "Recent Records" list
+RECENT_LIMIT = 10
+# Status thresholds shared by the dashboard badge and the low-attendance alerts
+BELOW_AVERAGE_PERCENT = 60
+CRITICAL_PERCENT = 50
+
+# Alert levels, worst first; OK means at or above BELOW_AVERAGE_PERCENT
+CRITICAL, BELOW_AVERAGE, OK = "critical", "below_average", "ok"
+
+
+def percent(present, total):
+    """Percentage of present days, rounded the same way the templates expect"""
+    return round((present / total) * 100, 2) if total > 0 else 0
+
+
+def attendance_status(percentage):
+    """Map an attendance percentage to the dashboard status badge"""
+    if percentage >= 90:
+        return {"status_message": "Excellent! Keep up the great work!",
+                "status_class": "success", "status_icon": "bi-trophy-fill"}
+    if percentage >= 75:
+        return {"status_message": "Good attendance. You're on track!",
+                "status_class": "success", "status_icon": "bi-check-circle-fill"}
+    if percentage >= BELOW_AVERAGE_PERCENT:
+        return {"status_message": "Average attendance. Try to improve!",
+                "status_class": "warning", "status_icon": "bi-exclamation-triangle-fill"}
+    if percentage >= CRITICAL_PERCENT:
+        return {"status_message": "Below average. Need improvement!",
+                "status_class": "warning", "status_icon": "bi-exclamation-circle-fill"}
+    return {"status_message": "Critical! Attend classes regularly!",
+            "status_class": "danger", "status_icon": "bi-x-circle-fill"}
+
+
+def alert_level(percentage):
+    """CRITICAL / BELOW_AVERAGE / OK, on the same thresholds as attendance_status()"""
+    if percentage < CRITICAL_PERCENT:
+        return CRITICAL
+    if percentage < BELOW_AVERAGE_PERCENT:
+        return BELOW_AVERAGE
+    return OK
+
+
+def student_attendance_stats(student, today=None):
+    """
+    Compute every dashboard window for one student in two queries:
+
+    1. one aggregate over the student's monthly AttendanceRollup rows for
+       the overall and month-to-date counts (cost independent of history)
+    2. one date-bounded scan of the last TREND_DAYS days, which yields the
+       last-7-days counts, the trend, the recent records list and the last
+       attendance
+
+    The returned dict uses the same keys as the student_dashboard context.
+    """
+    today = today or timezone.localdate()
+    rollups, window = _stats_queries(student, today)
+    counts = rollups.aggregate(**_stats_aggregates(today))
+    return _stats_result(counts, list(window), today)
+
+
+async def astudent_attendance_stats(student, today=None):
+    """student_attendance_stats() on the async ORM, with its two queries issued concurrently"""
+    today = today or timezone.localdate()
+    rollups, window = _stats_queries(student, today)
+    counts, rows = await asyncio.gather(
+        rollups.aaggregate(**_stats_aggregates(today)),
+        _alist(window),
+    )
+    return _stats_result(counts, rows, today)
+
+
+async def _alist(queryset):
+    return [row async for row in queryset]
+
+
+def _stats_aggregates(today):
+    this_month = Q(year=today.year, month=today.month)
+    return {
+        "all_total": Sum("total"),
+        "all_present": Sum("present"),
+        "month_total": Sum("total", filter=this_month),
+        "month_present": Sum("present", filter=this_month),
+    }
+
+
+def _stats_queries(student, today):
+    """(monthly rollups to aggregate, newest rows up to today) for one student"""
+    rollups = AttendanceRollup.objects.filter(student=student)
+    # One row per date, so the newest TREND_DAYS + 1 rows up to today cover
+    # the whole trend window and the recent list in a single scan.
+    window = (
+        Attendance.objects.filter(student=student, date__lte=today)
+        .order_by("-date")[:max(TREND_DAYS + 1, RECENT_LIMIT)]
+    )
+    return rollups, window
+
+
+def _stats_result(counts, window, today):
+    week_ago = today - timedelta(days=7)
+    trend_start = today - timedelta(days=TREND_DAYS)
+    counts = {key: value or 0 for key, value in counts.items()}
+
+    trend = [r for r in reversed(window) if r.date >= trend_start]
+    week = [r for r in trend if r.date >= week_ago]
+    counts["week_total"] = len(week)
+    counts["week_present"] = sum(1 for r in week if r.is_present)
+    last = window[0] if window else None
+
+    total = counts["all_total"]
+    present_days = counts["all_present"]
+
+    return {
+        # Overall stats
+        "total_attendance": total,
+        "present_days": present_days,
+        "absent_days": total - present_days,
+        "attendance_percentage": percent(present_days, total),
+
+        # Recent records
+        "recent_attendance": window[:RECENT_LIMIT],
+
+        # This month
+        "this_month_total": counts["month_total"],
+        "this_month_present": counts["month_present"],
+        "this_month_absent": counts["month_total"] - counts["month_present"],
+        "this_month_percentage": percent(counts["month_present"], counts["month_total"]),
+
+        # Last 7 days
+        "week_total": counts["week_total"],
+        "week_present": counts["week_present"],
+        "week_absent": counts["week_total"] - counts["week_present"],
+        "week_percentage": percent(counts["week_present"], counts["week_total"]),
+
+        # Trend data for charts (1 for present, 0 for absent)
+        "trend_dates": [r.date.strftime("%b %d") for r in trend],
+        "trend_status": [1 if r.is_present else 0 for r in trend],
+
+        # Last attendance
+        "last_attendance_date": last.date if last else None,
+        "last_attendance_status": last.is_present if last else None,
+    }
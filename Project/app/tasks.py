@@ -0,0 +1,238 @@
+"""
+A small database-backed task queue for heavy admin operations.
+
+Views enqueue() a Task and redirect to its status page, which polls for
+progress; `manage.py run_worker` claims due tasks one at a time and runs
+the function registered for their kind. No broker is involved: claiming is
+a conditional UPDATE (queued -> running), so several workers can share the
+table without running a task twice.
+
+A failing task is retried after TASK_RETRY_DELAY seconds, doubled per
+attempt, until it has used max_attempts; the last traceback is kept in
+Task.error. Task functions must therefore be safe to run again, and must
+call progress() at least every TASK_STALE_AFTER seconds: it also writes
+the heartbeat, and a run that stops beating is requeued.
+"""
+import logging
+import os
+import time
+import traceback
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.db.models import F
+from django.utils import timezone
+
+from . import exports
+from .marking import save_attendance_marks
+from .models import CohortDailyRollup, Student, Task
+from .rollups import rebuild_cohort_rollups, rebuild_student_rollups
+
+logger = logging.getLogger(__name__)
+
+# kind -> function(task, progress) returning the JSON-serializable result
+REGISTRY = {}
+# kind -> title shown on the status page
+LABELS = {}
+# Raised for inputs that will never work; not retried
+PERMANENT_ERRORS = (LookupError, ValidationError)
+# Progress is written at most this often (seconds), besides the final step
+PROGRESS_INTERVAL = 1.0
+# Rows between progress checks while writing an export
+EXPORT_PROGRESS_ROWS = 5000
+# Students saved per transaction (and progress step) when marking attendance
+MARK_PROGRESS_STUDENTS = 500
+
+
+def task(kind, label):
+    """Register a task function under `kind`"""
+    def register(func):
+        REGISTRY[kind] = func
+        LABELS[kind] = label
+        return func
+    return register
+
+
+def enqueue(kind, params=None, user=None, max_attempts=None):
+    if kind not in REGISTRY:
+        raise ValueError(f"Unknown task kind {kind!r}")
+    return Task.objects.create(
+        kind=kind, params=params or {}, created_by=user,
+        max_attempts=max_attempts or settings.TASK_MAX_ATTEMPTS,
+    )
+
+
+def claim(worker, now=None):
+    """Take the oldest due queued task for `worker`, or return None"""
+    now = now or timezone.now()
+    due = Task.objects.filter(status=Task.QUEUED, run_after__lte=now).order_by("run_after", "pk")
+    for pk in due.values_list("pk", flat=True)[:10]:
+        # another worker may have taken it since the SELECT
+        claimed = Task.objects.filter(pk=pk, status=Task.QUEUED).update(
+            status=Task.RUNNING, worker=worker, attempts=F("attempts") + 1,
+            started_at=now, heartbeat_at=now,
+        )
+        if claimed:
+            return Task.objects.get(pk=pk)
+    return None
+
+
+def requeue_stale(now=None):
+    """Requeue running tasks whose worker stopped beating (or fail them when out of attempts)"""
+    now = now or timezone.now()
+    stale = Task.objects.filter(
+        status=Task.RUNNING, heartbeat_at__lt=now - timedelta(seconds=settings.TASK_STALE_AFTER)
+    )
+    failed = stale.filter(attempts__gte=F("max_attempts")).update(
+        status=Task.FAILED, error="Worker stopped responding.", finished_at=now,
+    )
+    return failed + stale.update(status=Task.QUEUED, run_after=now)
+
+
+def _claimed(task):
+    """
+    The task's row while this run still holds it: requeue_stale() may have
+    handed a silent run to another worker, whose attempt must not be
+    overwritten by the first one finishing late.
+    """
+    return Task.objects.filter(pk=task.pk, status=Task.RUNNING, worker=task.worker, attempts=task.attempts)
+
+
+class Progress:
+    """progress(done, total=None) callable handed to task functions; throttles the UPDATEs"""
+
+    def __init__(self, task):
+        self.task = task
+        self.written = 0.0
+
+    def __call__(self, done, total=None):
+        self.task.done, self.task.total = done, total
+        now = time.monotonic()
+        if now - self.written >= PROGRESS_INTERVAL or (total is not None and done >= total):
+            self.written = now
+            _claimed(self.task).update(done=done, total=total, heartbeat_at=timezone.now())
+
+
+def run(task):
+    """Run one claimed task and record its result, retry or failure"""
+    func = REGISTRY.get(task.kind)
+    try:
+        if func is None:
+            raise LookupError(f"No task registered as {task.kind!r}")
+        result = func(task, Progress(task))
+    except Exception as exc:
+        logger.exception("Task %s (%s) failed, attempt %s of %s", task.pk, task.kind, task.attempts, task.max_attempts)
+        now = timezone.now()
+        changes = {"error": traceback.format_exc()}
+        if task.attempts < task.max_attempts and not isinstance(exc, PERMANENT_ERRORS):
+            delay = settings.TASK_RETRY_DELAY * 2 ** (task.attempts - 1)
+            changes.update(status=Task.QUEUED, run_after=now + timedelta(seconds=delay))
+        else:
+            changes.update(status=Task.FAILED, finished_at=now)
+    else:
+        changes = {"status": Task.SUCCEEDED, "result": result, "error": "", "finished_at": timezone.now()}
+    if not _claimed(task).update(**changes):
+        logger.warning("Task %s (%s) was requeued while attempt %s ran; its outcome is dropped",
+                       task.pk, task.kind, task.attempts)
+        task.refresh_from_db()
+        return task
+    for name, value in changes.items():
+        setattr(task, name, value)
+    return task
+
+
+def run_pending(worker="inline", limit=None):
+    """Run due tasks until none is left (or `limit` have run); returns how many ran"""
+    ran = 0
+    while limit is None or ran < limit:
+        claimed = claim(worker)
+        if claimed is None:
+            break
+        run(claimed)
+        ran += 1
+    return ran
+
+
+def result_path(task):
+    """Where a task's output file lives (see export())"""
+    return settings.TASK_RESULTS_DIR / task.result["file"]
+
+
+@task("mark_attendance", "Attendance marking")
+def mark_attendance(task, progress):
+    """One day's marks for a cohort: params date, program, batch, present (student pks), user"""
+    params = task.params
+    students = Student.objects.filter(program=params["program"], batch=params["batch"]).order_by("full_name")
+    marked_by = get_user_model().objects.filter(pk=params.get("user")).first()
+    students = list(students)
+    result = {"created": 0, "updated": 0, "unchanged": 0}
+    progress(0, len(students))
+    # saved a chunk at a time so progress (and the heartbeat) moves during
+    # a large cohort; each chunk is its own transaction, which is safe since
+    # saving marks is idempotent and a retry redoes the whole list
+    for first in range(0, len(students), MARK_PROGRESS_STUDENTS):
+        chunk = students[first:first + MARK_PROGRESS_STUDENTS]
+        saved = save_attendance_marks(
+            chunk, date.fromisoformat(params["date"]), params["present"], marked_by,
+            program=params["program"], batch=params["batch"],
+        )
+        for key, count in saved.items():
+            result[key] += count
+        progress(first + len(chunk), len(students))
+    return result
+
+
+@task("export", "Report export")
+def export(task, progress):
+    """A report CSV written to TASK_RESULTS_DIR: params are the export view's query parameters"""
+    params = task.params
+    filename, header, rows = exports.export_source(params)
+    compress = params.get("gzip") == "1"
+    filename += ".csv.gz" if compress else ".csv"
+    stored = f"{task.pk}-{filename}"
+    written = [0]
+
+    def counted():
+        for row in rows:
+            written[0] += 1
+            if written[0] % EXPORT_PROGRESS_ROWS == 0:
+                progress(written[0])
+            yield row
+
+    chunks = exports.csv_chunks(header, counted())
+    if compress:
+        chunks = exports.gzip_chunks(chunks)
+    os.makedirs(settings.TASK_RESULTS_DIR, exist_ok=True)
+    path = settings.TASK_RESULTS_DIR / stored
+    # written under a temporary name, so a retry never serves half a file
+    partial = path.with_name(path.name + ".part")
+    with open(partial, "wb") as f:
+        for chunk in chunks:
+            f.write(chunk)
+    os.replace(partial, path)
+    progress(written[0], written[0])
+    return {"file": stored, "filename": filename, "rows": written[0]}
+
+
+@task("rebuild_rollups", "Summary rebuild")
+def rebuild_rollups(task, progress):
+    """
+    Recompute both rollup tables from the raw attendance, one cohort at a
+    time, so progress (and with it the heartbeat) is written between cohorts
+    rather than once per full-table pass.
+    """
+    cohorts = list(Student.objects.order_by().values_list("program", "batch").distinct())
+    # cohorts left without students keep no cohort rollups
+    gone = set(CohortDailyRollup.objects.order_by().values_list("program", "batch").distinct()) - set(cohorts)
+    for program, batch in gone:
+        CohortDailyRollup.objects.filter(program=program, batch=batch).delete()
+
+    progress(0, len(cohorts))
+    for done, (program, batch) in enumerate(cohorts, 1):
+        students = Student.objects.filter(program=program, batch=batch).values_list("pk", flat=True)
+        rebuild_student_rollups(student_ids=list(students))
+        rebuild_cohort_rollups(program=program, batch=batch)
+        progress(done, len(cohorts))
+    return {"cohorts": len(cohorts)}
@@ -0,0 +1,119 @@
+from datetime import date, timedelta
+
+from django.conf import settings
+
+from .dayarrays import (ABSENT, PRESENT, current_run, longest_run, rolling_percent, runs_at_least, school_days,
+                        status, student_arrays)
+from .models import Attendance
+from .stats import percent
+
+# Trailing window of the rolling attendance percentage (4 weeks)
+ROLLING_DAYS = 28
+# Absence runs of at least this many consecutive school days are counted
+ABSENCE_RUN_THRESHOLD = 3
+# Parts of the academic year per period kind
+SEMESTERS_PER_YEAR = 2
+
+
+def period_choices():
+    """Choices for a term report period: the whole academic year, a semester, a term, or a custom range"""
+    return [
+        ("year", "Academic year"),
+        *((f"semester-{i}", f"Semester {i}") for i in range(1, SEMESTERS_PER_YEAR + 1)),
+        *((f"term-{i}", f"Term {i}") for i in range(1, settings.TERMS_PER_YEAR + 1)),
+        ("custom", "Custom range"),
+    ]
+
+
+def academic_year(day):
+    """The calendar year the academic year containing `day` starts in"""
+    return day.year if day.month >= settings.ACADEMIC_YEAR_START_MONTH else day.year - 1
+
+
+def period_bounds(year, period):
+    """
+    (start, end) of "year", "semester-N" or "term-N" in the academic year
+    starting in `year`. Semesters and terms are equal runs of whole months,
+    so TERMS_PER_YEAR must divide 12.
+    """
+    kind, _, part = period.partition("-")
+    parts = {"year": 1, "semester": SEMESTERS_PER_YEAR, "term": settings.TERMS_PER_YEAR}[kind]
+    months = 12 // parts
+    # months since January of `year`
+    first = settings.ACADEMIC_YEAR_START_MONTH - 1 + (int(part or 1) - 1) * months
+    after = first + months
+    start = date(year + first // 12, first % 12 + 1, 1)
+    end = date(year + after // 12, after % 12 + 1, 1) - timedelta(days=1)
+    return start, end
+
+
+def student_metrics(marked, present, threshold=ABSENCE_RUN_THRESHOLD, window=ROLLING_DAYS):
+    """
+    Metrics for one student's (marked, present) day arrays over a range:
+    - rolling_latest: present % over the last `window` days of the range
+    - rolling_lowest: the lowest present % over any full `window`-day stretch
+      (the whole range when it is shorter than the window)
+    - longest_absence: most consecutive school days absent
+    - absence_runs: how many absence runs are `threshold` school days or longer
+    """
+    days = school_days(status(marked, present))
+    total = len(days)
+    attended = days.count(PRESENT)
+    rolling = rolling_percent(marked, present, window)
+    full = [p for p in rolling[window - 1:] or rolling[-1:] if p is not None]
+    return {
+        "total": total,
+        "present": attended,
+        "absent": total - attended,
+        "percent": percent(attended, total),
+        "rolling_latest": rolling[-1] if rolling else None,
+        "rolling_lowest": min(full, default=None),
+        "longest_absence": longest_run(days, ABSENT),
+        "current_absence": current_run(days, ABSENT),
+        "absence_runs": runs_at_least(days, ABSENT, threshold),
+    }
+
+
+def term_report(students, start, end, threshold=ABSENCE_RUN_THRESHOLD, window=ROLLING_DAYS):
+    """
+    Attendance and derived metrics for each of `students` (a queryset, in
+    display order) over [start, end], plus a cohort summary.
+
+    The range is read with one query over the compact (student, date,
+    is_present) columns, which the attendance index covers, and laid out
+    as per-student day arrays (app.dayarrays); every metric is then
+    computed on whole arrays. Model instances are only built for the
+    students themselves.
+    """
+    days = (end - start).days + 1
+    rows = (
+        Attendance.objects.filter(student__in=students, date__range=(start, end))
+        .order_by()
+        .values_list("student_id", "date", "is_present")
+    )
+    arrays = student_arrays(rows.iterator(chunk_size=5000), start, days)
+    empty = bytearray(days)
+
+    table = []
+    for student in students:
+        marked, present = arrays.get(student.pk, (empty, empty))
+        table.append({"student": student, **student_metrics(marked, present, threshold, window)})
+
+    total = sum(r["total"] for r in table)
+    attended = sum(r["present"] for r in table)
+    return {
+        "start": start,
+        "end": end,
+        "threshold": threshold,
+        "window": window,
+        "table": table,
+        "summary": {
+            "students": len(table),
+            "total": total,
+            "present": attended,
+            "absent": total - attended,
+            "percent": percent(attended, total),
+            "flagged": sum(1 for r in table if r["absence_runs"]),
+            "longest_absence": max((r["longest_absence"] for r in table), default=0),
+        },
+    }
@@ -1,3 +1,1268 @@
-from django.test import TestCase
+import csv
+import gzip
+import io
+import json
+import random
+import shutil
+import tempfile
+from pathlib import Path
+from unittest import mock
+from datetime import date, timedelta
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Sum
+from django.db.migrations.executor import MigrationExecutor
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve, reverse
+from django.utils import timezone
+
+from . import choices
+from .forms import AttendanceMarkForm, DailyReportForm, MonthlyReportForm
+from .querycheck import QueryBudgetExceeded, normalize_sql, query_budget
+from .models import Program, Batch, Student, Attendance, AttendanceRollup, CohortDailyRollup
+from .datagen import absence_rates, generate_dataset
+from .rollups import rebuild_student_rollups, rebuild_cohort_rollups
+from .stats import percent, student_attendance_stats
+from . import attendance_import, roster
+from .roster import import_roster
+from .attendance_import import import_attendance
+from .calendars import WEEKDAYS, month_grid
+from .cohort_report import (cohort_day_totals, cohort_report, day_student_counts, student_counts,
+                            student_month_counts)
+from .heatmap import PRESENT, year_bits, year_summary
+from .term_report import period_bounds, student_metrics, term_report
+from .alerts import WATERMARK_LAG, notify_pending, scan
+from .models import AlertRun, AttendanceAlert, Task
+from . import tasks
+from .benchmarking import student_views
+from asgiref.sync import iscoroutinefunction, sync_to_async
+
+User = get_user_model()
+
+
+class AttendanceTestMixin:
+    """Shared fixture: one student with 60 days of alternating attendance"""
+
+    days = 60
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.today = timezone.localdate()
+        cls.user = User.objects.create_user(
+            username="john_doe", password="student123", email="john@example.com"
+        )
+        cls.program = Program.objects.create(name="Computer Science")
+        cls.batch = Batch.objects.create(name="2024")
+        cls.student = Student.objects.create(
+            user=cls.user, student_id="STU001", full_name="John Doe",
+            email="john@example.com", program=cls.program, batch=cls.batch,
+        )
+        Attendance.objects.bulk_create([
+            Attendance(student=cls.student, date=cls.today - timedelta(days=i), is_present=(i % 2 == 0))
+            for i in range(cls.days)
+        ])
+        # bulk_create skips the rollup signals
+        rebuild_student_rollups()
+        rebuild_cohort_rollups()
+
+    def setUp(self):
+        super().setUp()
+        # the cache is not rolled back with the test transaction
+        cache.clear()
+
+
+class StudentAttendanceStatsTests(AttendanceTestMixin, TestCase):
+
+    def test_stats_use_two_queries(self):
+        with self.assertNumQueries(2):
+            stats = student_attendance_stats(self.student, today=self.today)
+        self.assertEqual(stats["total_attendance"], self.days)
+        self.assertEqual(stats["present_days"], self.days // 2)
+        self.assertEqual(len(stats["recent_attendance"]), 10)
+
+    def test_stats_match_per_window_counts(self):
+        stats = student_attendance_stats(self.student, today=self.today)
+        qs = Attendance.objects.filter(student=self.student)
+
+        month = qs.filter(date__gte=self.today.replace(day=1), date__lte=self.today)
+        self.assertEqual(stats["this_month_total"], month.count())
+        self.assertEqual(stats["this_month_present"], month.filter(is_present=True).count())
+
+        week = qs.filter(date__gte=self.today - timedelta(days=7), date__lte=self.today)
+        self.assertEqual(stats["week_total"], week.count())
+        self.assertEqual(stats["week_present"], week.filter(is_present=True).count())
+
+        trend = qs.filter(date__gte=self.today - timedelta(days=30), date__lte=self.today).order_by("date")
+        self.assertEqual(stats["trend_status"], [1 if a.is_present else 0 for a in trend])
+        self.assertEqual(stats["last_attendance_date"], self.today)
+        self.assertTrue(stats["last_attendance_status"])
+
+    def test_dashboard_query_count(self):
+        self.client.force_login(self.user)
+        # session + user + student; the page loads its data separately
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse("student_dashboard"))
+        self.assertEqual(response.status_code, 200)
+        # session + user + student with ETag inputs + stats aggregate + stats window
+        with self.assertNumQueries(5):
+            response = self.client.get(reverse("dashboard_data"))
+        self.assertEqual(response.json()["total_attendance"], self.days)
+
+
+class DashboardDataTests(AttendanceTestMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.user)
+
+    def test_json_matches_stats(self):
+        response = self.client.get(reverse("dashboard_data"))
+        data = response.json()
+        stats = student_attendance_stats(self.student, today=self.today)
+        for key in ("present_days", "week_total", "this_month_percentage", "trend_status", "trend_dates"):
+            self.assertEqual(data[key], stats[key])
+        self.assertEqual(data["last_attendance_date"], self.today.isoformat())
+        self.assertEqual(len(data["recent_attendance"]), len(stats["recent_attendance"]))
+        self.assertIn("status_class", data)
+        self.assertIn("no-cache", response["Cache-Control"])
+        self.assertIn("private", response["Cache-Control"])
+
+    def test_conditional_get(self):
+        etag = self.client.get(reverse("dashboard_data"))["ETag"]
+        self.assertTrue(etag.startswith('"'))
+
+        # session + user + student with ETag inputs
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse("dashboard_data"), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["ETag"], etag)
+
+        record = Attendance.objects.get(student=self.student, date=self.today)
+        record.is_present = False
+        record.save()
+        response = self.client.get(reverse("dashboard_data"), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertEqual(response.json()["present_days"], self.days // 2 - 1)
+
+        etag = response["ETag"]
+        record.delete()
+        response = self.client.get(reverse("dashboard_data"), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["total_attendance"], self.days - 1)
+
+
+class AttendanceRollupTests(AttendanceTestMixin, TestCase):
+
+    def rollup_snapshot(self):
+        monthly = set(AttendanceRollup.objects.values_list(
+            "student_id", "year", "month", "present", "absent", "total"))
+        daily = set(CohortDailyRollup.objects.values_list(
+            "program", "batch", "date", "present", "absent", "total"))
+        return monthly, daily
+
+    def assertRollupsMatchRebuild(self):
+        incremental = self.rollup_snapshot()
+        rebuild_student_rollups()
+        rebuild_cohort_rollups()
+        self.assertEqual(incremental, self.rollup_snapshot())
+
+    def test_create_update_delete_keep_rollups_in_sync(self):
+        a = Attendance.objects.create(student=self.student, date=self.today - timedelta(days=400), is_present=True)
+        self.assertRollupsMatchRebuild()
+
+        a.is_present = False
+        a.save()
+        self.assertRollupsMatchRebuild()
+
+        a.date = self.today - timedelta(days=500)
+        a.save()
+        self.assertRollupsMatchRebuild()
+
+        a.delete()
+        self.assertRollupsMatchRebuild()
+
+    def test_student_cohort_change_and_delete(self):
+        self.student.program = Program.objects.create(name="Mathematics")
+        self.student.save()
+        self.assertRollupsMatchRebuild()
+        self.assertFalse(CohortDailyRollup.objects.filter(program=self.program).exists())
+
+        self.student.delete()
+        self.assertRollupsMatchRebuild()
+        self.assertFalse(CohortDailyRollup.objects.exists())
+        self.assertFalse(AttendanceRollup.objects.exists())
+
+    def test_monthly_summary_reads_rollup(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse("monthly_summary"), {"month": self.today.month, "year": self.today.year})
+        month = Attendance.objects.filter(student=self.student, date__year=self.today.year, date__month=self.today.month)
+        self.assertEqual(response.context["total_days"], month.count())
+        self.assertEqual(response.context["present_days"], month.filter(is_present=True).count())
+
+
+class MarkAttendanceTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(username="admin", password="admin123", email="admin@example.com")
+        cls.batch = Batch.objects.create(name="2024")
+        cls.programs = {}
+        for name, size in (("Small", 5), ("Large", 50)):
+            program = cls.programs[name] = Program.objects.create(name=name)
+            Student.objects.bulk_create([
+                Student(student_id=f"{name[0]}{i:03d}", full_name=f"{name} {i}",
+                        email=f"{name.lower()}{i}@example.com", program=program, batch=cls.batch)
+                for i in range(size)
+            ])
+        cls.today = timezone.localdate()
+
+    def post_marks(self, program, present_ids):
+        url = reverse("attendance_mark") + f"?date={self.today}&program={self.programs[program].pk}&batch={self.batch.pk}"
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post(url, {"present": present_ids}, follow=True)
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries), str(list(response.context["messages"])[0])
+
+    def test_query_count_does_not_grow_with_section_size(self):
+        self.client.force_login(self.admin)
+        small = list(Student.objects.filter(program__name="Small").values_list("id", flat=True))
+        large = list(Student.objects.filter(program__name="Large").values_list("id", flat=True))
+
+        small_queries, _ = self.post_marks("Small", small)
+        large_queries, message = self.post_marks("Large", large)
+        self.assertEqual(small_queries, large_queries)
+        self.assertIn("50 created, 0 updated, 0 unchanged", message)
+        self.assertEqual(AttendanceRollup.objects.get(student_id=large[0]).present, 1)
+
+    def test_only_changed_rows_are_updated(self):
+        self.client.force_login(self.admin)
+        ids = list(Student.objects.filter(program__name="Small").values_list("id", flat=True))
+        self.post_marks("Small", ids)
+        _, message = self.post_marks("Small", ids[2:])
+        self.assertIn("0 created, 2 updated, 3 unchanged", message)
+        self.assertEqual(Attendance.objects.filter(student_id__in=ids, is_present=False).count(), 2)
+        daily = CohortDailyRollup.objects.get(program=self.programs["Small"], batch=self.batch, date=self.today)
+        self.assertEqual((daily.present, daily.absent, daily.total), (3, 2, 5))
+
+
+class GenerateDatasetTests(TestCase):
+
+    def test_generates_requested_rows_deterministically(self):
+        stats = generate_dataset(programs=2, batches=2, students=30, days=10, seed=7,
+                                 student_chunk=8, chunk_size=25)
+        self.assertEqual((stats["users"], stats["students"], stats["attendance"]), (30, 30, 300))
+        self.assertEqual(Student.objects.values("program", "batch").distinct().count(), 4)
+        self.assertEqual((Program.objects.count(), Batch.objects.count()), (2, 2))
+        # one password hash shared by every generated user
+        self.assertEqual(User.objects.values("password").distinct().count(), 1)
+        self.assertTrue(User.objects.first().check_password("student123"))
+
+        first = list(Attendance.objects.order_by("student__student_id", "date").values_list("is_present", flat=True))
+        Attendance.objects.all().delete()
+        Student.objects.all().delete()
+        User.objects.all().delete()
+        generate_dataset(programs=2, batches=2, students=30, days=10, seed=7)
+        second = list(Attendance.objects.order_by("student__student_id", "date").values_list("is_present", flat=True))
+        self.assertEqual(first, second)
+
+    def test_zero_absence_rate_with_spread(self):
+        rng = random.Random(1)
+        self.assertEqual(absence_rates(rng, 3, 0.0, 0.5), [0.0, 0.0, 0.0])
+        self.assertTrue(all(0 < rate < 1 for rate in absence_rates(rng, 3, 0.2, 0.5)))
+
+
+class QueryBudgetTests(AttendanceTestMixin, TestCase):
+
+    def test_normalize_sql_collapses_parameters(self):
+        self.assertEqual(
+            normalize_sql('SELECT * FROM "t" WHERE "id" IN (%s, %s, %s) AND "x" = \'a\' LIMIT 21'),
+            'SELECT * FROM "t" WHERE "id" IN (?) AND "x" = ? LIMIT ?',
+        )
+
+    def test_query_budget_flags_n_plus_one(self):
+        with self.assertRaises(QueryBudgetExceeded):
+            with query_budget(n_plus_one=5):
+                # Attendance.__str__ touches self.student: one query per row
+                [str(a) for a in Attendance.objects.filter(student=self.student)[:10]]
+        with query_budget(max_queries=1, n_plus_one=5):
+            [str(a) for a in Attendance.objects.filter(student=self.student).select_related("student")[:10]]
+
+
+@override_settings(QUERY_INSPECTOR={**settings.QUERY_INSPECTOR, "ENABLED": True, "RAISE": True, "N_PLUS_ONE_THRESHOLD": 5})
+class ViewQueryBudgetTests(AttendanceTestMixin, TestCase):
+    """Every student and admin page stays within its configured budget"""
+
+    def test_student_views(self):
+        self.client.force_login(self.user)
+        for name in ("student_dashboard", "dashboard_data", "attendance_history", "monthly_summary",
+                     "attendance_heatmap", "attendance_heatmap_data"):
+            self.assertEqual(self.client.get(reverse(name)).status_code, 200)
+
+    def test_admin_views(self):
+        admin = User.objects.create_superuser(username="admin", password="admin123", email="admin@example.com")
+        self.client.force_login(admin)
+        cohort = {"program": self.program.pk, "batch": self.batch.pk}
+        self.assertEqual(self.client.get(reverse("admin_dashboard")).status_code, 200)
+        self.assertEqual(self.client.get(reverse("student_list")).status_code, 200)
+        self.assertEqual(self.client.get(reverse("attendance_mark"), {"date": self.today, **cohort}).status_code, 200)
+        self.assertEqual(self.client.get(reverse("attendance_report"),
+                                         {"type": "daily", "date": self.today, **cohort}).status_code, 200)
+        self.assertEqual(self.client.get(reverse("all_cohorts_report")).status_code, 200)
+        self.assertEqual(self.client.get(reverse("attendance_report"),
+                                         {"type": "monthly", "month": self.today.month,
+                                          "year": self.today.year, **cohort}).status_code, 200)
+
+
+class ServerTimingTests(AttendanceTestMixin, TestCase):
+
+    def test_disabled_by_default(self):
+        self.client.force_login(self.user)
+        self.assertNotIn("Server-Timing", self.client.get(reverse("student_dashboard")).headers)
+
+    @override_settings(SERVER_TIMING={"SAMPLE_RATE": 1.0, "HEADER": True, "LOG": True})
+    def test_sampled_request_gets_header_and_log_line(self):
+        self.client.force_login(self.user)
+        with self.assertLogs("app.timing", level="INFO") as logs:
+            response = self.client.get(reverse("student_dashboard"))
+        header = response["Server-Timing"]
+        for metric in ("total;dur=", "resolve;dur=", "auth;dur=", "view;dur=", "template;dur=", "db;dur="):
+            self.assertIn(metric, header)
+        self.assertIn('queries;desc="3 queries"', header)
+
+        line = json.loads(logs.records[0].getMessage())
+        self.assertEqual(line["url_name"], "student_dashboard")
+        self.assertEqual(line["queries"], 3)
+        self.assertGreater(line["template_ms"], 0)
+
+
+class StudentFormTests(TestCase):
+
+    @override_settings(PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"])
+    def test_add_and_edit_resolve_program_and_batch_by_name(self):
+        admin = User.objects.create_superuser(username="admin", password="admin123", email="admin@example.com")
+        self.client.force_login(admin)
+        data = {"username": "jane", "password": "pw12345!", "student_id": "STU009", "full_name": "Jane Roe",
+                "email": "jane@example.com", "program": "Physics", "batch": "2025", "year": 2025}
+        self.assertRedirects(self.client.post(reverse("student_add"), data), reverse("student_list"))
+        student = Student.objects.select_related("program", "batch").get(student_id="STU009")
+        self.assertEqual((student.program.name, student.batch.name), ("Physics", "2025"))
+
+        edit_url = reverse("student_edit", args=[student.pk])
+        self.assertEqual(self.client.get(edit_url).context["form"]["program"].value(), "Physics")
+        self.client.post(edit_url, {**data, "program": "Chemistry"})
+        student.refresh_from_db()
+        self.assertEqual(student.program.name, "Chemistry")
+        self.assertEqual(Program.objects.count(), 2)
+
+class StudentListTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(username="admin", password="admin123", email="admin@example.com")
+        cs, math = Program.objects.create(name="CS"), Program.objects.create(name="Math")
+        batch = Batch.objects.create(name="2024")
+        Student.objects.bulk_create([
+            Student(student_id=f"STU{i:03d}", full_name=f"{'Alice' if i % 2 else 'Bob'} {i}",
+                    email=f"s{i}@example.com", program=cs if i < 20 else math, batch=batch, year=2024)
+            for i in range(25)
+        ])
+
+    def get(self, **params):
+        self.client.force_login(self.admin)
+        response = self.client.get(reverse("student_list"), params)
+        self.assertEqual(response.status_code, 200)
+        return response.context
+
+    def ids(self, context):
+        return [s.student_id for s in context["students"]]
+
+    def test_walks_pages_forward_and_back(self):
+        first = self.get(per_page=10)
+        self.assertEqual(self.ids(first), [f"STU{i:03d}" for i in range(10)])
+        self.assertIsNone(first["page"]["prev"])
+
+        second = self.get(per_page=10, after=first["page"]["next"])
+        self.assertEqual(self.ids(second), [f"STU{i:03d}" for i in range(10, 20)])
+
+        third = self.get(per_page=10, after=second["page"]["next"])
+        self.assertEqual(self.ids(third), [f"STU{i:03d}" for i in range(20, 25)])
+        self.assertIsNone(third["page"]["next"])
+
+        back = self.get(per_page=10, before=third["page"]["prev"])
+        self.assertEqual(self.ids(back), self.ids(second))
+
+    def test_filters_and_prefix_search(self):
+        self.assertEqual(len(self.get(program="Math")["students"]), 5)
+        self.assertEqual(self.ids(self.get(q="STU02")), [f"STU{i:03d}" for i in range(20, 25)])
+        # name and student id prefixes are case-insensitive
+        self.assertEqual(len(self.get(q="ali", program="CS")["students"]), 10)
+        context = self.get(q="stu02")
+        self.assertEqual(self.ids(context), [f"STU{i:03d}" for i in range(20, 25)])
+        self.assertEqual(context["filters"]["q"], "stu02")
+
+    def test_no_offset_in_page_query(self):
+        self.client.force_login(self.admin)
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(reverse("student_list"), {"per_page": 5, "after": "STU010"})
+        self.assertFalse(any("OFFSET" in q["sql"] for q in ctx.captured_queries))
+
+
+class AttendanceHistoryTests(AttendanceTestMixin, TestCase):
+
+    def get(self, **params):
+        self.client.force_login(self.user)
+        return self.client.get(reverse("attendance_history"), params)
+
+    def test_load_older_walks_whole_history(self):
+        seen = []
+        params = {"per_page": 25}
+        while True:
+            context = self.get(**params).context
+            seen += [a.date for a in context["attendance_records"]]
+            if not context["page"]["next"]:
+                break
+            params["after"] = context["page"]["next"].isoformat()
+        self.assertEqual(seen, sorted(seen, reverse=True))
+        self.assertEqual(len(seen), self.days)
+        self.assertEqual(context["summary"]["total"], self.days)
+
+    def test_month_filter_uses_date_range(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.get(month=self.today.month, year=self.today.year, status="present")
+        page_sql = ctx.captured_queries[-1]["sql"]
+        self.assertIn("BETWEEN", page_sql)
+        self.assertNotIn("strftime", page_sql)
+        expected = Attendance.objects.filter(
+            student=self.student, date__year=self.today.year, date__month=self.today.month, is_present=True
+        ).count()
+        self.assertEqual(len(response.context["attendance_records"]), expected)
+        self.assertEqual(response.context["summary"]["total"], expected)
+
+    def test_full_history_streams_every_row(self):
+        response = self.get(full=1)
+        self.assertTrue(response.streaming)
+        html = b"".join(response.streaming_content).decode()
+        self.assertEqual(html.count("<tr>"), self.days + 1)  # plus the header row
+        self.assertIn("</html>", html)
+
+
+class CohortReportTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.day = timezone.localdate()
+        cls.batch = Batch.objects.create(name="2024")
+        cls.science = Program.objects.create(name="Science")
+        cls.arts = Program.objects.create(name="Arts")
+        # Science: 2 of 3 present; Arts: 1 of 2 present, one unmarked
+        marks = {"SCI1": True, "SCI2": True, "SCI3": False, "ART1": True, "ART2": None}
+        for student_id, present in marks.items():
+            student = Student.objects.create(
+                user=User.objects.create_user(username=student_id.lower(), email=f"{student_id}@example.com"),
+                student_id=student_id, full_name=f"Student {student_id}", email=f"{student_id}@example.com",
+                program=cls.science if student_id.startswith("SCI") else cls.arts, batch=cls.batch,
+            )
+            if present is not None:
+                Attendance.objects.create(student=student, date=cls.day, is_present=present)
+        cls.admin = User.objects.create_superuser(username="admin", password="admin123", email="admin@example.com")
+
+    def test_daily_overview_in_one_query(self):
+        choices.cohort_choices()
+        with self.assertNumQueries(1):
+            report = cohort_report(student_counts(self.day, self.day), unmarked_absent=True)
+        self.assertEqual([(c["program"], c["present"], c["absent"], c["percent"]) for c in report["cohorts"]],
+                         [("Arts", 1, 1, 50.0), ("Science", 2, 1, 66.67)])
+        self.assertEqual(report["cohorts"][0]["unmarked"], 1)
+        self.assertEqual(report["totals"], {"students": 5, "days": 5, "present": 3, "absent": 2, "percent": 60.0})
+        # lowest attendance first, then by name
+        self.assertEqual([s["student_id"] for s in report["students"]], ["ART2", "SCI3", "ART1", "SCI1", "SCI2"])
+
+        by_name = cohort_report(student_counts(self.day, self.day), unmarked_absent=True, sort="name", limit=2)
+        self.assertEqual([c["program"] for c in by_name["cohorts"]], ["Arts", "Science"])
+        self.assertEqual([s["student_id"] for s in by_name["students"]], ["ART1", "ART2"])
+
+    def test_daily_cohort_totals_read_rollups(self):
+        expected = cohort_report(student_counts(self.day, self.day), unmarked_absent=True)
+        choices.cohort_choices()
+        with self.assertNumQueries(3):
+            report = cohort_report(day_student_counts(self.day), unmarked_absent=True,
+                                   cohorts=cohort_day_totals(self.day))
+        self.assertEqual(report, expected)
+        by_name = day_student_counts(self.day, sort="name", limit=2)
+        self.assertEqual([row[1] for row in by_name], ["ART1", "ART2"])
+
+        self.client.force_login(self.admin)
+        response = self.client.get(reverse("attendance_report"), {
+            "type": "daily", "date": self.day, "program": self.science.pk, "batch": self.batch.pk,
+        })
+        summary = response.context["summary"]
+        self.assertEqual((summary["present"], summary["absent"], summary["total"]), (2, 1, 3))
+
+    def test_monthly_reads_rollups(self):
+        report = cohort_report(student_month_counts(self.day.year, self.day.month, program=self.science))
+        self.assertEqual(len(report["cohorts"]), 1)
+        self.assertEqual(report["totals"]["present"], 2)
+        self.assertEqual(report["totals"]["days"], 3)
+
+    def test_view_drill_down(self):
+        self.client.force_login(self.admin)
+        response = self.client.get(reverse("all_cohorts_report"))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context["report"]["totals"]["students"], 5)
+
+        response = self.client.get(reverse("all_cohorts_report"), {
+            "type": "monthly", "month": self.day.month, "year": self.day.year,
+            "program": self.arts.pk, "batch": self.batch.pk,
+        })
+        report = response.context["report"]
+        self.assertTrue(report["drilled"])
+        self.assertEqual([s["student_id"] for s in report["students"]], ["ART2", "ART1"])
+        self.assertContains(response, "All cohorts")
+
+        response = self.client.get(reverse("all_cohorts_report"), {"type": "monthly"})
+        self.assertIsNone(response.context["report"])
+        self.assertTrue(response.context["form"].errors)
+
+
+class AttendanceExportTests(AttendanceTestMixin, TestCase):
+
+    def export(self, **params):
+        admin = User.objects.create_superuser(username="admin", password="admin123", email="admin@example.com")
+        self.client.force_login(admin)
+        response = self.client.get(reverse("attendance_export"), params)
+        self.assertTrue(response.streaming)
+        body = b"".join(response.streaming_content)
+        if params.get("gzip"):
+            body = gzip.decompress(body)
+        return response, list(csv.reader(io.StringIO(body.decode())))
+
+    def test_daily_export_matches_report(self):
+        day = self.today - timedelta(days=1)
+        response, rows = self.export(type="daily", date=day, program=self.program.pk, batch=self.batch.pk)
+        self.assertEqual(response["Content-Type"], "text/csv; charset=utf-8")
+        self.assertEqual(rows, [
+            ["student_id", "full_name", "date", "status"],
+            ["STU001", "John Doe", day.isoformat(), "Absent"],
+        ])
+
+    def test_monthly_export_reads_rollups(self):
+        _, rows = self.export(type="monthly", month=self.today.month, year=self.today.year,
+                              program=self.program.pk, batch=self.batch.pk)
+        rollup = AttendanceRollup.objects.get(student=self.student, year=self.today.year, month=self.today.month)
+        self.assertEqual(rows[1][4:7], [str(rollup.total), str(rollup.present), str(rollup.absent)])
+
+    def test_range_export_gzip_streams_every_record(self):
+        start = self.today - timedelta(days=self.days - 1)
+        response, rows = self.export(type="range", start=start, end=self.today, gzip="1")
+        self.assertEqual(response["Content-Type"], "application/gzip")
+        self.assertIn(".csv.gz", response["Content-Disposition"])
+        self.assertEqual(len(rows), self.days + 1)
+        self.assertEqual([r[4] for r in rows[1:]], sorted(r[4] for r in rows[1:]))
+
+    def test_invalid_range_is_rejected(self):
+        admin = User.objects.create_superuser(username="admin", password="admin123", email="admin@example.com")
+        self.client.force_login(admin)
+        response = self.client.get(reverse("attendance_export"),
+                                   {"type": "range", "start": self.today, "end": self.today - timedelta(days=1)})
+        self.assertEqual(response.status_code, 400)
+
+
+@override_settings(PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"])
+class RosterImportTests(TestCase):
+
+    header = "student_id,full_name,email,program,batch,year,username,password\n"
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(username="admin", password="admin123", email="admin@example.com")
+        Student.objects.create(student_id="OLD001", full_name="Old Student", email="old@example.com",
+                               program=Program.objects.create(name="CS"), batch=Batch.objects.create(name="2024"))
+
+    def test_import_creates_users_and_students(self):
+        rows = [f"NEW{i:03d},Student {i},new{i}@example.com,CS,2025,2025,,pw{i}" for i in range(25)]
+        stats = import_roster(io.StringIO(self.header + "\n".join(rows)), workers=0, chunk_size=10)
+        self.assertEqual((stats["rows"], stats["created"], stats["errors"]), (25, 25, []))
+        student = Student.objects.select_related("user").get(student_id="NEW007")
+        self.assertEqual(student.user.username, "new007")
+        self.assertTrue(student.user.check_password("pw7"))
+
+    def test_one_hashing_pool_per_import(self):
+        rows = [f"NEW{i:03d},Student {i},new{i}@example.com,CS,2025,2025,,{'pw' if i % 2 else ''}"
+                for i in range(25)]
+        with mock.patch.object(roster, "ProcessPoolExecutor", wraps=roster.ProcessPoolExecutor) as pool:
+            stats = import_roster(io.StringIO(self.header + "\n".join(rows)), default_password="start",
+                                  workers=2, chunk_size=10)
+        self.assertEqual(stats["created"], 25)
+        self.assertEqual(pool.call_count, 1)
+        users = User.objects.filter(username__startswith="new")
+        # rows without a password share the default's single hash
+        self.assertEqual(users.filter(username__in=["new000", "new002"]).values("password").distinct().count(), 1)
+        self.assertTrue(users.get(username="new001").check_password("pw"))
+        self.assertTrue(users.get(username="new004").check_password("start"))
+
+    def test_uniqueness_checked_in_chunks(self):
+        rows = [
+            "NEW001,A,a@example.com,CS,2025,2025,,",
+            "OLD001,B,b@example.com,CS,2025,2025,,",     # student_id exists
+            "NEW002,C,old@example.com,CS,2025,2025,,",   # email exists
+            "NEW003,D,a@example.com,CS,2025,2025,,",     # email repeated in the file
+            "NEW004,E,e@example.com,CS,2025,2025,admin,",  # username exists
+            "NEW005,,f@example.com,CS,2025,abc,,",       # missing name, bad year
+        ]
+        with CaptureQueriesContext(connection) as ctx:
+            stats = import_roster(io.StringIO(self.header + "\n".join(rows)), workers=0, dry_run=True)
+        self.assertEqual(len(ctx.captured_queries), 4)
+        self.assertEqual(stats["valid"], 1)
+        self.assertEqual(stats["created"], 0)
+        self.assertEqual([e["line"] for e in stats["errors"]], [3, 4, 5, 6, 7])
+        self.assertIn("repeated on line 2", stats["errors"][2]["errors"][0])
+        self.assertEqual(len(stats["errors"][4]["errors"]), 2)
+        self.assertFalse(Student.objects.filter(student_id="NEW001").exists())
+
+    def test_admin_upload_reports_errors(self):
+        self.client.force_login(self.admin)
+        upload = SimpleUploadedFile("roster.csv", (
+            self.header + "NEW001,A,a@example.com,CS,2025,2025,,\nOLD001,B,b@example.com,CS,2025,2025,,\n"
+        ).encode())
+        response = self.client.post(reverse("student_import"), {"file": upload, "default_password": "start123"})
+        self.assertEqual(response.context["result"]["created"], 1)
+        self.assertContains(response, "already exists")
+        self.assertTrue(User.objects.get(username="new001").check_password("start123"))
+
+
+class AttendanceImportTests(AttendanceTestMixin, TestCase):
+
+    def dump(self, *rows):
+        return io.StringIO("student_id,date,present\n" + "\n".join(",".join(map(str, r)) for r in rows))
+
+    def test_import_upserts_and_updates_rollups(self):
+        other = Student.objects.create(student_id="STU002", full_name="Jane Roe", email="jane@example.com",
+                                       program=self.program, batch=self.batch)
+        yesterday = self.today - timedelta(days=1)  # absent in the fixture
+        stats = import_attendance(self.dump(
+            ("STU001", yesterday, "P"),
+            ("STU002", yesterday, "1"),
+            ("STU002", f"{self.today}T08:01:00", "absent"),
+            ("NOPE", self.today, 1),
+            ("STU001", "yesterday", 1),
+        ), batch_size=2)
+        self.assertEqual((stats["created"], stats["updated"], stats["error_count"]), (2, 1, 2))
+        self.assertEqual([e["line"] for e in stats["errors"]], [5, 6])
+        self.assertTrue(Attendance.objects.get(student=self.student, date=yesterday).is_present)
+
+        rollup = AttendanceRollup.objects.get(student=other, year=self.today.year, month=self.today.month)
+        self.assertEqual((rollup.present, rollup.absent), (1 if yesterday.month == self.today.month else 0, 1))
+        cohort = CohortDailyRollup.objects.get(program=self.program, batch=self.batch, date=yesterday)
+        self.assertEqual((cohort.present, cohort.absent), (2, 0))
+
+    def test_incremental_rollups_match_a_rebuild(self):
+        other = Student.objects.create(student_id="STU002", full_name="Jane Roe", email="jane@example.com",
+                                       program=Program.objects.create(name="Mathematics"), batch=self.batch)
+        rows = [("STU001", self.today - timedelta(days=i), "P") for i in range(90)]
+        rows += [("STU002", self.today - timedelta(days=400 + i), int(i % 3 == 0)) for i in range(50)]
+        import_attendance(self.dump(*rows), batch_size=7)
+
+        def snapshot():
+            return (
+                sorted(AttendanceRollup.objects.values_list("student", "year", "month", "present", "absent", "total")),
+                sorted(CohortDailyRollup.objects.values_list("program", "batch", "date", "present", "absent", "total")),
+            )
+
+        imported = snapshot()
+        rebuild_student_rollups()
+        rebuild_cohort_rollups()
+        self.assertEqual(imported, snapshot())
+        self.assertTrue(AttendanceRollup.objects.filter(student=other).exists())
+
+    def test_batch_is_redone_when_a_row_appears_after_its_snapshot(self):
+        day = self.today - timedelta(days=400)
+        real_inserter = attendance_import._attendance_inserter
+
+        def racing_inserter():
+            insert = real_inserter()
+
+            def racing_insert(rows):
+                if inserter.call_count == 1:
+                    # another writer marks the day between the batch's SELECT and INSERT
+                    Attendance.objects.create(student=self.student, date=day, is_present=False)
+                insert(rows)
+            return racing_insert
+
+        with mock.patch.object(attendance_import, "_attendance_inserter", side_effect=racing_inserter) as inserter:
+            stats = import_attendance(self.dump(("STU001", day, "P"), ("STU001", day + timedelta(days=1), "A")))
+        self.assertEqual(inserter.call_count, 2)
+        self.assertEqual(stats["created"], 2)
+        self.assertTrue(Attendance.objects.get(student=self.student, date=day).is_present)
+
+        imported = sorted(AttendanceRollup.objects.values_list("student", "year", "month", "present", "absent"))
+        rebuild_student_rollups()
+        self.assertEqual(imported, sorted(AttendanceRollup.objects.values_list("student", "year", "month",
+                                                                               "present", "absent")))
+
+    def test_reimport_is_a_no_op(self):
+        rows = [("STU001", self.today - timedelta(days=i), int(i % 2 == 1)) for i in range(10)]
+        first = import_attendance(self.dump(*rows))
+        self.assertEqual(first["updated"], 10)
+        with CaptureQueriesContext(connection) as ctx:
+            again = import_attendance(self.dump(*rows))
+        self.assertEqual((again["created"], again["updated"], again["unchanged"]), (0, 0, 10))
+        self.assertFalse(any(q["sql"].startswith(("INSERT", "UPDATE", "DELETE")) for q in ctx.captured_queries))
+
+    def test_resume_skips_checkpointed_rows(self):
+        rows = [("STU001", self.today - timedelta(days=i), 1) for i in range(6)]
+        done = []
+        import_attendance(self.dump(*rows[:4]), batch_size=2, checkpoint=done.append)
+        self.assertEqual(done, [2, 4])
+        stats = import_attendance(self.dump(*rows), batch_size=2, skip=done[-1])
+        self.assertEqual(stats["rows"], 6)
+        self.assertEqual(stats["created"] + stats["updated"] + stats["unchanged"], 2)
+
+
+class MonthGridTests(TestCase):
+
+    def test_weeks_start_on_sunday_like_the_header(self):
+        self.assertEqual(WEEKDAYS[0], "Sun")
+        # 1 March 2024 was a Friday
+        grid = month_grid(2024, 3, {1: True, 4: False})
+        self.assertEqual(grid[0][:5], [None] * 5)
+        self.assertEqual(grid[0][5], {"day": 1, "is_present": True})
+        self.assertEqual(grid[1][1], {"day": 4, "is_present": False})
+        self.assertEqual(grid[1][2], {"day": 5, "is_present": None})
+        self.assertEqual([c["day"] for week in grid for c in week if c], list(range(1, 32)))
+
+
+class HeatmapTests(AttendanceTestMixin, TestCase):
+
+    def test_year_summary_matches_the_records(self):
+        year = self.today.year
+        with self.assertNumQueries(1):
+            marked, present = year_bits(self.student, year)
+        summary = year_summary(marked, present, year, window=7)
+
+        records = list(Attendance.objects.filter(student=self.student, date__year=year).order_by("date"))
+        self.assertEqual(summary["total"], len(records))
+        self.assertEqual(summary["present"], sum(r.is_present for r in records))
+        # the fixture alternates, ending with today present
+        self.assertEqual(summary["longest_streak"], 1)
+        self.assertEqual(summary["current_streak"], 1)
+        self.assertEqual(summary["longest_absence"], 1)
+        self.assertEqual(sum(d["total"] for d in summary["weekdays"]), len(records))
+        self.assertEqual(summary["weekdays"][self.today.weekday()]["weekday"], self.today.strftime("%a"))
+
+        i = self.today.timetuple().tm_yday - 1
+        self.assertEqual(summary["status"][i], PRESENT)
+        week = [r for r in records if 0 <= (self.today - r.date).days < 7]
+        self.assertEqual(summary["rolling"][i], percent(sum(r.is_present for r in week), len(week)))
+
+    def test_streaks_skip_unmarked_days(self):
+        marked = bytearray([1, 1, 0, 0, 1, 1, 1, 0, 1])
+        present = bytearray([1, 1, 0, 0, 1, 0, 1, 0, 1])
+        summary = year_summary(marked, present, 2023, window=3)
+        self.assertEqual(summary["status"], bytes([2, 2, 0, 0, 2, 1, 2, 0, 2]))
+        self.assertEqual(summary["longest_streak"], 3)
+        self.assertEqual(summary["current_streak"], 2)
+        self.assertEqual(summary["longest_absence"], 1)
+        self.assertEqual(summary["rolling"][:4], [100.0, 100.0, 100.0, 100.0])
+        self.assertIsNone(year_summary(bytearray(3), bytearray(3), 2023)["rolling"][0])
+
+    def test_views(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse("attendance_heatmap"))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'class="heat-2"')
+
+        with self.assertNumQueries(3):  # session + user + student; the year is cached
+            data = self.client.get(reverse("attendance_heatmap_data")).json()
+        self.assertEqual(data["year"], self.today.year)
+        self.assertEqual(len(data["status"]), 366 if self.today.year % 4 == 0 else 365)
+        self.assertEqual(data["status"][self.today.timetuple().tm_yday - 1], "2")
+
+
+class TermReportTests(AttendanceTestMixin, TestCase):
+
+    @override_settings(ACADEMIC_YEAR_START_MONTH=9, TERMS_PER_YEAR=3)
+    def test_period_bounds(self):
+        self.assertEqual(period_bounds(2024, "year"), (date(2024, 9, 1), date(2025, 8, 31)))
+        self.assertEqual(period_bounds(2024, "term-1"), (date(2024, 9, 1), date(2024, 12, 31)))
+        self.assertEqual(period_bounds(2024, "term-3"), (date(2025, 5, 1), date(2025, 8, 31)))
+        self.assertEqual(period_bounds(2024, "semester-2"), (date(2025, 3, 1), date(2025, 8, 31)))
+
+    def test_absence_runs_skip_unmarked_days(self):
+        # P A A - - A P A A A P A A A A ; "-" is a weekend, which does not break a run
+        marked = bytearray([1, 1, 1, 0, 0, 1, 1, 1, 1, 1, 1, 1, 1, 1, 1])
+        present = bytearray([1, 0, 0, 0, 0, 0, 1, 0, 0, 0, 1, 0, 0, 0, 0])
+        metrics = student_metrics(marked, present, threshold=3, window=7)
+        self.assertEqual((metrics["total"], metrics["present"]), (13, 3))
+        self.assertEqual(metrics["longest_absence"], 4)
+        self.assertEqual(metrics["current_absence"], 4)
+        self.assertEqual(metrics["absence_runs"], 3)
+        self.assertEqual(student_metrics(marked, present, threshold=4, window=7)["absence_runs"], 1)
+        # last 7 days: P A A A P A A A A minus the first two -> 1 of 7
+        self.assertEqual(metrics["rolling_latest"], percent(1, 7))
+        self.assertEqual(metrics["rolling_lowest"], percent(1, 7))
+
+        empty = student_metrics(bytearray(5), bytearray(5), window=7)
+        self.assertEqual((empty["total"], empty["longest_absence"], empty["absence_runs"]), (0, 0, 0))
+        self.assertIsNone(empty["rolling_lowest"])
+
+    def test_report_matches_the_records(self):
+        start, end = self.today - timedelta(days=27), self.today
+        students = Student.objects.order_by("full_name")
+        with self.assertNumQueries(2):  # students + one scan of the range
+            report = term_report(students, start, end, threshold=1, window=7)
+        records = Attendance.objects.filter(student=self.student, date__range=(start, end))
+        row = report["table"][0]
+        self.assertEqual(row["total"], records.count())
+        self.assertEqual(row["present"], records.filter(is_present=True).count())
+        # the fixture alternates, so every absence is a run of one
+        self.assertEqual(row["longest_absence"], 1)
+        self.assertEqual(row["absence_runs"], records.filter(is_present=False).count())
+        self.assertEqual(report["summary"]["flagged"], 1)
+        self.assertEqual(report["summary"]["percent"], row["percent"])
+
+    def test_view(self):
+        admin = User.objects.create_superuser(username="admin", password="admin123", email="admin@example.com")
+        self.client.force_login(admin)
+        response = self.client.get(reverse("attendance_report"), {
+            "type": "term", "period": "custom", "threshold": 2,
+            "start": self.today - timedelta(days=13), "end": self.today,
+            "program": self.program.pk, "batch": self.batch.pk,
+        })
+        term = response.context["term"]
+        self.assertEqual(term["table"][0]["total"], 14)
+        self.assertEqual(term["table"][0]["absence_runs"], 0)
+
+        response = self.client.get(reverse("attendance_report"), {
+            "type": "term", "period": "year", "threshold": 3,
+            "program": self.program.pk, "batch": self.batch.pk,
+        })
+        self.assertLessEqual(response.context["term"]["end"], self.today)
+        self.assertContains(response, "Academic year")
+
+
+class AttendanceAlertTests(AttendanceTestMixin, TestCase):
+    """The fixture student is at exactly 50%: below average, not critical"""
+
+    def scan(self):
+        # no lag, so the rows the test just wrote are covered
+        return scan(lag=timedelta(0))
+
+    def mark(self, days, is_present):
+        for i in range(1, days + 1):
+            Attendance.objects.create(student=self.student, date=self.today + timedelta(days=i), is_present=is_present)
+
+    def test_crossings_are_recorded_once_and_emailed(self):
+        run = self.scan()
+        self.assertEqual((run.students, run.alerts), (1, 1))
+        alert = AttendanceAlert.objects.get()
+        self.assertEqual((alert.level, alert.previous_level, alert.percentage), ("below_average", "ok", 50.0))
+
+        self.assertEqual(notify_pending(), 1)
+        self.assertEqual(mail.outbox[0].to, ["john@example.com"])
+        self.assertIn("Below average", mail.outbox[0].subject)
+        self.assertIsNotNone(AttendanceAlert.objects.get().notified_at)
+        self.assertEqual(notify_pending(), 0)
+
+        # nothing changed since the watermark: nothing scanned
+        run = self.scan()
+        self.assertEqual((run.students, run.alerts), (0, 0))
+
+    def test_only_changed_students_are_scanned(self):
+        self.scan()
+        other_user = User.objects.create_user(username="jane", password="student123", email="jane@example.com")
+        other = Student.objects.create(
+            user=other_user, student_id="STU002", full_name="Jane Roe",
+            email="jane@example.com", program=self.program, batch=self.batch,
+        )
+        Attendance.objects.create(student=other, date=self.today, is_present=False)
+        self.mark(5, is_present=False)
+
+        # watermark, changed students, latest alerts, rollups, insert, run + the savepoint pair
+        with self.assertNumQueries(8):
+            run = self.scan()
+        self.assertEqual((run.students, run.alerts), (2, 2))
+        alert = AttendanceAlert.objects.get(student=self.student, level="critical")
+        self.assertEqual(alert.previous_level, "below_average")
+        self.assertEqual(AttendanceAlert.objects.get(student=other).level, "critical")
+
+    def test_recovery_is_recorded_but_not_emailed(self):
+        self.scan()
+        notify_pending()
+        self.mark(20, is_present=True)
+        run = self.scan()
+        self.assertEqual(run.alerts, 1)
+        self.assertEqual(AttendanceAlert.objects.latest("created_at").level, "ok")
+        self.assertEqual(notify_pending(), 0)
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_recent_rows_wait_for_the_next_run(self):
+        run = scan()
+        self.assertEqual(run.students, 0)
+        self.assertLess(run.watermark, timezone.now() - WATERMARK_LAG + timedelta(seconds=1))
+        self.assertEqual(AlertRun.objects.count(), 1)
+        self.assertEqual(self.scan().students, 1)
+
+
+class TaskQueueTests(AttendanceTestMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        results = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, results)
+        overrides = self.settings(TASK_RESULTS_DIR=Path(results), TASK_RETRY_DELAY=0)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        self.admin = User.objects.create_superuser(username="admin", password="admin123", email="admin@example.com")
+        self.client.force_login(self.admin)
+
+    def register(self, kind, func):
+        tasks.task(kind, kind)(func)
+        self.addCleanup(tasks.REGISTRY.pop, kind)
+
+    @override_settings(MARK_ATTENDANCE_INLINE_LIMIT=0)
+    def test_large_cohort_marking_is_queued(self):
+        day = self.today + timedelta(days=1)
+        url = reverse("attendance_mark") + f"?date={day}&program={self.program.pk}&batch={self.batch.pk}"
+        response = self.client.post(url, {"present": [self.student.pk]})
+        task = Task.objects.get()
+        self.assertRedirects(response, reverse("task_status", args=[task.pk]))
+        self.assertFalse(Attendance.objects.filter(date=day).exists())
+
+        self.assertEqual(tasks.run_pending(), 1)
+        task.refresh_from_db()
+        self.assertEqual((task.status, task.percent, task.attempts), (Task.SUCCEEDED, 100, 1))
+        self.assertEqual(task.result["created"], 1)
+        self.assertTrue(Attendance.objects.get(date=day).is_present)
+        self.assertEqual(task.params["user"], self.admin.pk)
+
+    def test_background_export(self):
+        params = {"type": "range", "start": self.today - timedelta(days=9), "end": self.today, "background": "1"}
+        response = self.client.get(reverse("attendance_export"), params)
+        task = Task.objects.get()
+        self.assertRedirects(response, reverse("task_status", args=[task.pk]))
+        self.assertNotIn("background", task.params)
+        self.assertEqual(self.client.get(reverse("task_download", args=[task.pk])).status_code, 404)
+
+        tasks.run_pending()
+        data = self.client.get(reverse("task_status_data", args=[task.pk])).json()
+        self.assertEqual((data["status"], data["finished"], data["result"]["rows"]), ("succeeded", True, 10))
+        response = self.client.get(reverse("task_download", args=[task.pk]))
+        rows = list(csv.reader(io.StringIO(b"".join(response.streaming_content).decode())))
+        self.assertEqual(len(rows), 11)
+        task.refresh_from_db()
+        self.assertIn(task.result["filename"], response["Content-Disposition"])
+
+        page = self.client.get(reverse("task_status", args=[task.pk]))
+        self.assertContains(page, "Report export")
+
+    def test_failures_are_retried_then_recorded(self):
+        calls = []
+
+        def flaky(task, progress):
+            calls.append(task.attempts)
+            if len(calls) < 2:
+                raise RuntimeError("database busy")
+            return {"ok": True}
+
+        self.register("flaky", flaky)
+        self.register("broken", lambda task, progress: 1 / 0)
+        flaky_task = tasks.enqueue("flaky")
+        broken_task = tasks.enqueue("broken", max_attempts=2)
+
+        with self.assertLogs("app.tasks", "ERROR"):
+            self.assertEqual(tasks.run_pending(), 4)
+        flaky_task.refresh_from_db()
+        self.assertEqual((flaky_task.status, flaky_task.attempts, flaky_task.result), (Task.SUCCEEDED, 2, {"ok": True}))
+        broken_task.refresh_from_db()
+        self.assertEqual((broken_task.status, broken_task.attempts), (Task.FAILED, 2))
+        self.assertIn("ZeroDivisionError", broken_task.error)
+
+    def test_invalid_params_are_not_retried(self):
+        task = tasks.enqueue("export", {"type": "range"})
+        with self.assertLogs("app.tasks", "ERROR"):
+            self.assertEqual(tasks.run_pending(), 1)
+        task.refresh_from_db()
+        self.assertEqual((task.status, task.attempts), (Task.FAILED, 1))
+        # the status page shows the last line, the admin the whole traceback
+        data = self.client.get(reverse("task_status_data", args=[task.pk])).json()
+        self.assertNotIn("Traceback", data["error"])
+        response = self.client.get(reverse("admin:app_task_change", args=[task.pk]))
+        self.assertContains(response, "Traceback (most recent call last)")
+
+    def test_claims_are_exclusive_and_stale_tasks_requeued(self):
+        task = tasks.enqueue("rebuild_rollups")
+        self.assertEqual(tasks.claim("one").pk, task.pk)
+        self.assertIsNone(tasks.claim("two"))
+
+        Task.objects.filter(pk=task.pk).update(heartbeat_at=timezone.now() - timedelta(hours=1))
+        self.assertEqual(tasks.requeue_stale(), 1)
+        self.assertEqual(tasks.claim("two").attempts, 2)
+
+    def test_late_finish_of_a_requeued_run_is_dropped(self):
+        self.register("slow", lambda task, progress: {"run": task.worker})
+        tasks.enqueue("slow")
+        first = tasks.claim("one")
+        Task.objects.filter(pk=first.pk).update(heartbeat_at=timezone.now() - timedelta(hours=1))
+        tasks.requeue_stale()
+        second = tasks.claim("two")
+
+        with self.assertLogs("app.tasks", "WARNING"):
+            tasks.run(first)
+        self.assertEqual((first.status, first.worker), (Task.RUNNING, "two"))
+        tasks.run(second)
+        second.refresh_from_db()
+        self.assertEqual((second.status, second.result), (Task.SUCCEEDED, {"run": "two"}))
+
+    def test_rebuild_rollups_view(self):
+        self.assertEqual(self.client.get(reverse("rebuild_rollups_task")).status_code, 405)
+        response = self.client.post(reverse("rebuild_rollups_task"))
+        task = Task.objects.get(kind="rebuild_rollups")
+        self.assertRedirects(response, reverse("task_status", args=[task.pk]))
+        AttendanceRollup.objects.update(present=0)
+        gone = Program.objects.create(name="Closed")
+        CohortDailyRollup.objects.create(program=gone, batch=self.batch, date=self.today, present=1, total=1)
+        tasks.run_pending()
+        task.refresh_from_db()
+        # one progress step per cohort
+        self.assertEqual((task.status, task.done, task.total), (Task.SUCCEEDED, 1, 1))
+        self.assertEqual(AttendanceRollup.objects.aggregate(n=Sum("present"))["n"], self.days // 2)
+        self.assertFalse(CohortDailyRollup.objects.filter(program=gone).exists())
+
+
+class StudentViewCacheTests(AttendanceTestMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.user)
+
+    def test_repeat_requests_skip_the_attendance_queries(self):
+        self.client.get(reverse("dashboard_data"))
+        # session + user + student
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse("dashboard_data"))
+        self.assertEqual(response.json()["total_attendance"], self.days)
+
+        self.client.get(reverse("monthly_summary"))
+        with self.assertNumQueries(3):
+            self.client.get(reverse("monthly_summary"))
+
+        self.client.get(reverse("attendance_history"), {"status": "present"})
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse("attendance_history"), {"status": "present"})
+        self.assertEqual(response.context["summary"]["total"], self.days // 2)
+        # another filter combination is a separate entry
+        response = self.client.get(reverse("attendance_history"), {"status": "absent"})
+        self.assertEqual(response.context["summary"]["total"], self.days // 2)
+
+    def test_attendance_change_drops_that_students_entries(self):
+        self.client.get(reverse("dashboard_data"))
+        self.client.get(reverse("monthly_summary"))
+
+        record = Attendance.objects.get(student=self.student, date=self.today)
+        record.is_present = False
+        record.save()
+        response = self.client.get(reverse("dashboard_data"))
+        self.assertEqual(response.json()["present_days"], self.days // 2 - 1)
+        grid = self.client.get(reverse("monthly_summary")).context["calendar_grid"]
+        self.assertIs(next(c for week in grid for c in week if c and c["day"] == self.today.day)["is_present"], False)
+
+        record.delete()
+        response = self.client.get(reverse("dashboard_data"))
+        self.assertEqual(response.json()["total_attendance"], self.days - 1)
+
+    def test_closed_month_is_rendered_once(self):
+        last_month = self.today.replace(day=1) - timedelta(days=1)
+        params = {"month": last_month.month, "year": last_month.year}
+        first = self.client.get(reverse("monthly_summary"), params)
+        self.assertIn("monthly_summary_month.html", [t.name for t in first.templates])
+
+        # marking today does not touch the closed month
+        record = Attendance.objects.get(student=self.student, date=self.today)
+        record.is_present = not record.is_present
+        record.save()
+        with self.assertNumQueries(3):
+            second = self.client.get(reverse("monthly_summary"), params)
+        self.assertNotIn("monthly_summary_month.html", [t.name for t in second.templates])
+        self.assertEqual(first.content, second.content)
+
+        # a correction to it does
+        record = Attendance.objects.get(student=self.student, date=last_month)
+        record.is_present = not record.is_present
+        record.save()
+        third = self.client.get(reverse("monthly_summary"), params)
+        self.assertIn("monthly_summary_month.html", [t.name for t in third.templates])
+        self.assertNotEqual(first.content, third.content)
+
+    def test_bulk_import_drops_entries(self):
+        self.client.get(reverse("attendance_history"))
+        import_attendance([f"STU001,{self.today + timedelta(days=1)},present\n"])
+        response = self.client.get(reverse("attendance_history"))
+        self.assertEqual(response.context["summary"]["total"], self.days + 1)
+
+    def test_other_students_entries_survive(self):
+        other_user = User.objects.create_user(username="jane", password="student123")
+        other = Student.objects.create(
+            user=other_user, student_id="STU002", full_name="Jane Roe",
+            email="jane@example.com", program=self.program, batch=self.batch,
+        )
+        self.client.get(reverse("dashboard_data"))
+        Attendance.objects.create(student=other, date=self.today, is_present=True)
+        with self.assertNumQueries(3):
+            self.client.get(reverse("dashboard_data"))
+
+
+class CohortChoicesTests(AttendanceTestMixin, TestCase):
+
+    def test_forms_cost_no_queries_once_cached(self):
+        AttendanceMarkForm()
+        with self.assertNumQueries(0):
+            AttendanceMarkForm()
+            DailyReportForm()
+            form = MonthlyReportForm()
+        self.assertEqual(form.fields["program"].choices, [(self.program.pk, "Computer Science")])
+
+    def test_cleaned_cohort_is_an_instance_without_a_query(self):
+        choices.cohort_choices()
+        with self.assertNumQueries(0):
+            form = DailyReportForm({"date": self.today, "program": self.program.pk, "batch": self.batch.pk})
+            self.assertTrue(form.is_valid())
+        self.assertEqual(form.cleaned_data["program"], self.program)
+        self.assertEqual(str(form.cleaned_data["batch"]), "2024")
+
+    def test_lookup_changes_refresh_choices(self):
+        self.assertEqual(choices.cohort_choices()[1], [(self.batch.pk, "2024")])
+        math = Program.objects.create(name="Mathematics")
+        self.assertEqual([name for _, name in choices.cohort_choices()[0]], ["Computer Science", "Mathematics"])
+
+        math.name = "Maths"
+        math.save()
+        self.assertEqual([name for _, name in choices.cohort_choices()[0]], ["Computer Science", "Maths"])
+
+        math.delete()
+        self.assertEqual(choices.cohort_choices()[0], [(self.program.pk, "Computer Science")])
+
+        choices.lookup_ids(Batch, ["2024", "2025"])
+        self.assertEqual([name for _, name in choices.cohort_choices()[1]], ["2024", "2025"])
+
+
+class AsyncStudentViewTests(AttendanceTestMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.enterContext(student_views(True))
+
+    async def get(self, name, **params):
+        await self.async_client.aforce_login(self.user)
+        return await self.async_client.get(reverse(name), params)
+
+    @sync_to_async
+    def sync_get(self, name, **params):
+        """The same request to the sync view, recomputed rather than read from the async view's cache entries"""
+        cache.clear()
+        with student_views(False):
+            self.client.force_login(self.user)
+            return self.client.get(reverse(name), params)
+
+    def test_urls_route_to_async_views(self):
+        for name in ("student_dashboard", "dashboard_data", "attendance_history", "monthly_summary"):
+            self.assertTrue(iscoroutinefunction(resolve(reverse(name)).func), name)
+
+    async def test_history_matches_sync_view(self):
+        params = {"per_page": 25, "status": "present"}
+        response = await self.get("attendance_history", **params)
+        expected = await self.sync_get("attendance_history", **params)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context["summary"], expected.context["summary"])
+        self.assertEqual(response.context["attendance_records"], expected.context["attendance_records"])
+        self.assertEqual(response.context["page"]["next"], expected.context["page"]["next"])
+
+    async def test_full_history_streams_every_row(self):
+        response = await self.get("attendance_history", full=1)
+        html = b"".join([chunk async for chunk in response.streaming_content]).decode()
+        self.assertEqual(html.count("<tr>"), self.days + 1)
+        self.assertIn("</html>", html)
+
+    async def test_monthly_summary_matches_sync_view(self):
+        last_month = self.today.replace(day=1) - timedelta(days=1)
+        for day in (self.today, last_month):
+            params = {"month": day.month, "year": day.year}
+            response = await self.get("monthly_summary", **params)
+            expected = await self.sync_get("monthly_summary", **params)
+            self.assertEqual(response.context["month_html"], expected.context["month_html"])
+
+    async def test_dashboard_data_and_etag(self):
+        response = await self.get("dashboard_data")
+        expected = await self.sync_get("dashboard_data")
+        self.assertEqual(response.json(), expected.json())
+        self.assertEqual(response["ETag"], expected["ETag"])
+        again = await self.async_client.get(reverse("dashboard_data"), headers={"if-none-match": response["ETag"]})
+        self.assertEqual(again.status_code, 304)
+
+    async def test_user_without_student_record(self):
+        user = await User.objects.acreate_user(username="staff_only", password="pass12345")
+        await self.async_client.aforce_login(user)
+        response = await self.async_client.get(reverse("monthly_summary"))
+        self.assertTrue(response.context["no_student_record"])
+
+
+class ProgramBatchMigrationTests(TransactionTestCase):
+    """0008 moves program/batch to lookup tables; it must also reverse over existing rows"""
+
+    before, after = ("app", "0007_student_name_search_index"), ("app", "0008_program_batch")
+
+    def migrate(self, target):
+        executor = MigrationExecutor(connection)
+        executor.migrate([target])
+        return executor.loader.project_state(target).apps
+
+    def tearDown(self):
+        self.migrate(MigrationExecutor(connection).loader.graph.leaf_nodes("app")[0])
+        super().tearDown()
+
+    def test_reverses_with_cohort_rollups(self):
+        apps = self.migrate(self.after)
+        Program, Batch = apps.get_model("app", "Program"), apps.get_model("app", "Batch")
+        CohortDailyRollup = apps.get_model("app", "CohortDailyRollup")
+        programs = [Program.objects.create(name=name) for name in ("Computer Science", "Mathematics")]
+        batch = Batch.objects.create(name="2024")
+        day = date(2024, 9, 2)
+        for program in programs:
+            CohortDailyRollup.objects.create(program=program, batch=batch, date=day, present=1, total=1)
+
+        apps = self.migrate(self.before)
+        rows = apps.get_model("app", "CohortDailyRollup").objects.order_by("program")
+        self.assertEqual(
+            list(rows.values_list("program", "batch", "date")),
+            [("Computer Science", "2024", day), ("Mathematics", "2024", day)],
+        )
+
+        apps = self.migrate(self.after)
+        rows = apps.get_model("app", "CohortDailyRollup").objects.order_by("program__name")
+        self.assertEqual(list(rows.values_list("program__name", flat=True)), ["Computer Science", "Mathematics"])
+
+    def test_merges_names_differing_in_spacing_or_case(self):
+        apps = self.migrate(self.before)
+        Student, CohortDailyRollup = apps.get_model("app", "Student"), apps.get_model("app", "CohortDailyRollup")
+        for i, program in enumerate(("CS", "CS ", "cs", "CS", "Mathematics")):
+            Student.objects.create(student_id=f"STU{i}", full_name=f"Student {i}", email=f"s{i}@example.com",
+                                   program=program, batch=" 2024")
+        day = date(2024, 9, 2)
+        CohortDailyRollup.objects.create(program="CS", batch="2024", date=day, present=2, absent=1, total=3)
+        CohortDailyRollup.objects.create(program="cs ", batch="2024", date=day, present=1, total=1)
+
+        apps = self.migrate(self.after)
+        Program, Batch = apps.get_model("app", "Program"), apps.get_model("app", "Batch")
+        self.assertEqual(list(Program.objects.values_list("name", flat=True)), ["CS", "Mathematics"])
+        self.assertEqual(list(Batch.objects.values_list("name", flat=True)), ["2024"])
+        students = apps.get_model("app", "Student").objects
+        self.assertEqual(students.filter(program__name="CS", batch__name="2024").count(), 4)
+        rows = apps.get_model("app", "CohortDailyRollup").objects
+        self.assertEqual(list(rows.values_list("program__name", "batch__name", "date", "present", "absent", "total")),
+                         [("CS", "2024", day, 3, 1, 4)])
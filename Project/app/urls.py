@@ -1,11 +1,17 @@
+from django.conf import settings
 from django.urls import path
 from .views import signup_view, login_view, logout_view,home_view, about_view, profile_view
 from .admin_views import (admin_dashboard,student_list,student_add,student_edit,student_delete,mark_attendance,attendance_report)
 from .views import (
     login_view, logout_view, home_view, about_view, profile_view,
-    student_dashboard, attendance_history, monthly_summary
+    student_dashboard, dashboard_data, attendance_history, monthly_summary,
+    attendance_heatmap, attendance_heatmap_data
 )
-from .admin_views import (admin_dashboard,student_list,student_add,student_edit,student_delete,mark_attendance,attendance_report)
+from .admin_views import (admin_dashboard,student_list,student_add,student_import,student_edit,student_delete,mark_attendance,attendance_report,attendance_export,all_cohorts_report,
+                          rebuild_rollups_task,task_status,task_status_data,task_download)
+
+if settings.ASYNC_STUDENT_VIEWS:
+    from .async_views import student_dashboard, dashboard_data, attendance_history, monthly_summary
 
 
 
@@ -22,19 +28,31 @@ urlpatterns = [
 
     # Student Views (Person 3)
     path("dashboard/", student_dashboard, name="student_dashboard"),
+    path("dashboard/data/", dashboard_data, name="dashboard_data"),
     path("attendance/history/", attendance_history, name="attendance_history"),
     path("attendance/monthly/", monthly_summary, name="monthly_summary"),
+    path("attendance/year/", attendance_heatmap, name="attendance_heatmap"),
+    path("attendance/year/data/", attendance_heatmap_data, name="attendance_heatmap_data"),
 
     # Admin dashboard + Student CRUD
     path("admin-dashboard/", admin_dashboard, name="admin_dashboard"),
     path("admin-students/", student_list, name="student_list"),
     path("admin-students-add/", student_add, name="student_add"),
+    path("admin-students-import/", student_import, name="student_import"),
     path("admin-students-edit/<int:pk>/", student_edit, name="student_edit"),
     path("admin-students-delete/<int:pk>/", student_delete, name="student_delete"),
 
     # Admin Attendance Management
     path("mark/", mark_attendance, name="attendance_mark"),
     path("report/", attendance_report, name="attendance_report"),
+    path("report/export/", attendance_export, name="attendance_export"),
+    path("report/cohorts/", all_cohorts_report, name="all_cohorts_report"),
+
+    # Background tasks
+    path("tasks/rebuild-rollups/", rebuild_rollups_task, name="rebuild_rollups_task"),
+    path("tasks/<int:pk>/", task_status, name="task_status"),
+    path("tasks/<int:pk>/data/", task_status_data, name="task_status_data"),
+    path("tasks/<int:pk>/download/", task_download, name="task_download"),
 
 ]
 
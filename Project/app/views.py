@@ -4,11 +4,22 @@ from .forms import SignUpForm, LoginForm, ProfileForm
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.forms import PasswordChangeForm
 from django.contrib.auth import update_session_auth_hash
-from .models import Student, Attendance
-from django.db.models import Count, Q
+from .models import Student, Attendance, AttendanceRollup
+from .stats import student_attendance_stats, attendance_status
+from django.db.models import Count, Max, Q, Sum
+from django.conf import settings
+from django.http import JsonResponse, StreamingHttpResponse
+from django.template.loader import render_to_string
 from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.safestring import mark_safe
+from .pagination import keyset_page, page_size
+from .caching import cached_for_student, cached_month
+from .calendars import WEEKDAYS, month_grid
+from .heatmap import STATUS_DIGITS, heatmap_rows, year_bits, year_summary
 import calendar
-from datetime import datetime, timedelta
+import hashlib
+from datetime import date, datetime
 
 # Create your views here.
 def signup_view(request):
@@ -100,153 +111,179 @@ def profile_view(request):
         "form": form,
         "base_template": base_template
     })
+def _int_param(request, name, low, high):
+    """Integer query parameter within [low, high], or None"""
+    try:
+        value = int(request.GET.get(name, ''))
+    except ValueError:
+        return None
+    return value if low <= value <= high else None
+
+
+def _date_param(request, name):
+    """ISO date query parameter, or None"""
+    try:
+        return date.fromisoformat(request.GET.get(name, ''))
+    except ValueError:
+        return None
+
+
+def _history_frame(request, context):
+    """The history page split around where the streamed rows go"""
+    marker = '<!--attendance-rows-->'
+    page = render_to_string(
+        "attendence_history.html", {**context, 'stream_marker': mark_safe(marker)}, request=request
+    )
+    return page.split(marker, 1)
+
+
+def _stream_history(request, context, records, chunk_size=500):
+    """
+    Stream the attendance history page: the page is rendered once around a
+    placeholder, then the rows are fetched with .iterator() and rendered a
+    chunk at a time into the gap, so no full list is ever materialized.
+    """
+    head, tail = _history_frame(request, context)
+
+    def rows():
+        yield head
+        chunk = []
+        for record in records.iterator(chunk_size=chunk_size):
+            chunk.append(record)
+            if len(chunk) == chunk_size:
+                yield render_to_string("attendance_history_rows.html", {'records': chunk})
+                chunk = []
+        if chunk:
+            yield render_to_string("attendance_history_rows.html", {'records': chunk})
+        yield tail
+
+    return StreamingHttpResponse(rows(), content_type='text/html; charset=utf-8')
+
+
 # ================= STUDENT VIEWS (Person 3) =================
 
-@login_required
 @login_required
 def student_dashboard(request):
-    """Student dashboard with comprehensive attendance analytics"""
+    """Student dashboard; the analytics are loaded from dashboard_data"""
     try:
         # Get the student record linked to this user
-        student = Student.objects.get(user=request.user)
+        student = Student.objects.select_related("program", "batch").get(user=request.user)
     except Student.DoesNotExist:
         # If no student record exists, show a message
         return render(request, "student_dashboard.html", {
             "no_student_record": True,
             "message": "No student record found. Please contact admin."
         })
-    
+
+    return render(request, "student_dashboard.html", {'student': student})
+
+
+def _dashboard_etag(student, today):
+    """
+    Strong ETag for a student's dashboard data. Every write to a student's
+    attendance moves their latest updated_at or their row count, and the
+    date moves the week/month windows.
+    """
+    last_change = student.last_change.isoformat() if student.last_change else ""
+    key = f"{student.pk}:{student.record_count}:{last_change}:{today.isoformat()}"
+    return '"%s"' % hashlib.md5(key.encode()).hexdigest()
+
+
+def _dashboard_json(stats):
+    last = stats['last_attendance_date']
+    return {
+        **{key: value for key, value in stats.items() if key not in ('recent_attendance', 'last_attendance_date')},
+        **attendance_status(stats['attendance_percentage']),
+        'last_attendance_date': last.isoformat() if last else None,
+        'last_attendance_label': last.strftime("%b %d, %Y") if last else None,
+        'recent_attendance': [
+            {'date': r.date.isoformat(), 'label': r.date.strftime("%b %d"), 'weekday': r.date.strftime("%A"),
+             'is_present': r.is_present}
+            for r in stats['recent_attendance']
+        ],
+    }
+
+
+@login_required
+def dashboard_data(request):
+    """
+    The dashboard statistics and trend as JSON. A conditional GET whose
+    If-None-Match still matches is answered with 304 after one query
+    (the student row plus their latest change and row count, served by
+    the (student, updated_at) index).
+    """
+    student = get_object_or_404(
+        Student.objects.filter(user=request.user).annotate(
+            last_change=Max('attendance__updated_at'), record_count=Count('attendance'),
+        )
+    )
     today = timezone.localdate()
+    etag = _dashboard_etag(student, today)
+
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        # All windows (overall / month / week / trend / recent / last) in two
+        # queries, cached per student until their attendance changes
+        stats = cached_for_student(
+            student.pk, "dashboard", (today,), lambda: student_attendance_stats(student, today)
+        )
+        response = JsonResponse(_dashboard_json(stats))
+    response['ETag'] = etag
+    # let the browser keep the data but revalidate it on every load
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+HISTORY_SUMMARY_AGGREGATES = {'present': Sum('present'), 'absent': Sum('absent')}
+
+
+def _history_filters(request, student):
+    """
+    (month, year, status, records, rollups) for the history filters in
+    ?month=&year=&status=: the student's matching attendance records and
+    the monthly rollups that count them.
+    """
+    month = _int_param(request, 'month', 1, 12)
+    year = _int_param(request, 'year', 1900, 9999)
+    status = request.GET.get('status')  # 'present', 'absent', or 'all'
     
-    # ========== OVERALL STATISTICS ==========
-    total_attendance = Attendance.objects.filter(student=student).count()
-    present_days = Attendance.objects.filter(student=student, is_present=True).count()
-    absent_days = total_attendance - present_days
-    
-    # Calculate attendance percentage
-    attendance_percentage = round((present_days / total_attendance) * 100, 2) if total_attendance > 0 else 0
-    
-    # Get recent attendance (last 10 records)
-    recent_attendance = Attendance.objects.filter(student=student).order_by('-date')[:10]
-    
-    # ========== THIS MONTH'S ATTENDANCE ==========
-    start_of_month = today.replace(day=1)
-    this_month_total = Attendance.objects.filter(
-        student=student, 
-        date__gte=start_of_month,
-        date__lte=today
-    ).count()
-    this_month_present = Attendance.objects.filter(
-        student=student, 
-        date__gte=start_of_month,
-        date__lte=today,
-        is_present=True
-    ).count()
-    this_month_absent = this_month_total - this_month_present
-    this_month_percentage = round((this_month_present / this_month_total) * 100, 2) if this_month_total > 0 else 0
-    
-    # ========== LAST 7 DAYS ATTENDANCE ==========
-    week_ago = today - timedelta(days=7)
-    week_total = Attendance.objects.filter(
-        student=student,
-        date__gte=week_ago,
-        date__lte=today
-    ).count()
-    week_present = Attendance.objects.filter(
-        student=student,
-        date__gte=week_ago,
-        date__lte=today,
-        is_present=True
-    ).count()
-    week_absent = week_total - week_present
-    week_percentage = round((week_present / week_total) * 100, 2) if week_total > 0 else 0
-    
-    # ========== ATTENDANCE TREND (Last 30 days day-by-day) ==========
-    thirty_days_ago = today - timedelta(days=30)
-    last_30_days_records = Attendance.objects.filter(
-        student=student,
-        date__gte=thirty_days_ago,
-        date__lte=today
-    ).order_by('date')
-    
-    # Create arrays for chart.js
-    trend_dates = []
-    trend_status = []  # 1 for present, 0 for absent
-    
-    for record in last_30_days_records:
-        trend_dates.append(record.date.strftime('%b %d'))
-        trend_status.append(1 if record.is_present else 0)
-    
-    # ========== ATTENDANCE STATUS DETERMINATION ==========
-    status_message = ""
-    status_class = ""
-    status_icon = ""
-    
-    if attendance_percentage >= 90:
-        status_message = "Excellent! Keep up the great work!"
-        status_class = "success"
-        status_icon = "bi-trophy-fill"
-    elif attendance_percentage >= 75:
-        status_message = "Good attendance. You're on track!"
-        status_class = "success"
-        status_icon = "bi-check-circle-fill"
-    elif attendance_percentage >= 60:
-        status_message = "Average attendance. Try to improve!"
-        status_class = "warning"
-        status_icon = "bi-exclamation-triangle-fill"
-    elif attendance_percentage >= 50:
-        status_message = "Below average. Need improvement!"
-        status_class = "warning"
-        status_icon = "bi-exclamation-circle-fill"
-    else:
-        status_message = "Critical! Attend classes regularly!"
-        status_class = "danger"
-        status_icon = "bi-x-circle-fill"
-    
-    # ========== LAST ATTENDANCE DATE ==========
-    last_attendance = Attendance.objects.filter(student=student).order_by('-date').first()
-    last_attendance_date = last_attendance.date if last_attendance else None
-    last_attendance_status = last_attendance.is_present if last_attendance else None
+    # Month/year become a plain date range so the (student, date) index serves it
+    start_date = end_date = None
+    if month and year:
+        start_date = datetime(year, month, 1).date()
+        end_date = datetime(year, month, calendar.monthrange(year, month)[1]).date()
+    elif year:
+        start_date, end_date = datetime(year, 1, 1).date(), datetime(year, 12, 31).date()
+
+    # Base queryset
+    attendance_records = Attendance.objects.filter(student=student).select_related('marked_by')
+    rollups = AttendanceRollup.objects.filter(student=student)
+    if start_date:
+        attendance_records = attendance_records.filter(date__range=(start_date, end_date))
+        rollups = rollups.filter(year=year, **({'month': month} if month else {}))
     
-    context = {
-        'student': student,
-        
-        # Overall stats
-        'total_attendance': total_attendance,
-        'present_days': present_days,
-        'absent_days': absent_days,
-        'attendance_percentage': attendance_percentage,
-        
-        # Recent records
-        'recent_attendance': recent_attendance,
-        
-        # This month
-        'this_month_total': this_month_total,
-        'this_month_present': this_month_present,
-        'this_month_absent': this_month_absent,
-        'this_month_percentage': this_month_percentage,
-        
-        # Last 7 days
-        'week_total': week_total,
-        'week_present': week_present,
-        'week_absent': week_absent,
-        'week_percentage': week_percentage,
-        
-        # Trend data for charts
-        'trend_dates': trend_dates,
-        'trend_status': trend_status,
-        
-        # Status
-        'status_message': status_message,
-        'status_class': status_class,
-        'status_icon': status_icon,
-        
-        # Last attendance
-        'last_attendance_date': last_attendance_date,
-        'last_attendance_status': last_attendance_status,
+    if status == 'present':
+        attendance_records = attendance_records.filter(is_present=True)
+    elif status == 'absent':
+        attendance_records = attendance_records.filter(is_present=False)
+    return month, year, status, attendance_records, rollups
+
+
+def _history_summary(counts, status):
+    summary = {
+        'present': 0 if status == 'absent' else counts['present'] or 0,
+        'absent': 0 if status == 'present' else counts['absent'] or 0,
     }
-    
-    return render(request, "student_dashboard.html", context)
+    summary['total'] = summary['present'] + summary['absent']
+    return summary
+
+
+def _filter_choices():
+    """(years, months) for the year and month selects: the last three years"""
+    current_year = timezone.localdate().year
+    years = list(range(current_year - 2, current_year + 1))
+    months = [(i, calendar.month_name[i]) for i in range(1, 13)]
+    return years, months
+
 
 @login_required
 def attendance_history(request):
@@ -259,49 +296,92 @@ def attendance_history(request):
             "message": "No student record found. Please contact admin."
         })
     
-    # Get filter parameters
-    month = request.GET.get('month')
-    year = request.GET.get('year')
-    status = request.GET.get('status')  # 'present', 'absent', or 'all'
-    
-    # Base queryset
-    attendance_records = Attendance.objects.filter(student=student).order_by('-date')
-    
-    # Apply filters
-    if month and year:
-        attendance_records = attendance_records.filter(
-            date__month=int(month),
-            date__year=int(year)
-        )
-    elif year:
-        attendance_records = attendance_records.filter(date__year=int(year))
-    
-    if status == 'present':
-        attendance_records = attendance_records.filter(is_present=True)
-    elif status == 'absent':
-        attendance_records = attendance_records.filter(is_present=False)
-    
-    # Pagination could be added here if needed
-    attendance_records = attendance_records[:100]  # Limit to 100 records for performance
+    month, year, status, attendance_records, rollups = _history_filters(request, student)
+
+    # Summary counts for the whole filtered range come from the monthly rollups
+    def compute_summary():
+        counts = rollups.aggregate(**HISTORY_SUMMARY_AGGREGATES)
+        return _history_summary(counts, status)
+
+    summary = cached_for_student(student.pk, "history_summary", (month, year, status), compute_summary)
     
     # Generate year and month choices for filters
-    current_year = timezone.localdate().year
-    years = list(range(current_year - 2, current_year + 1))
-    months = [(i, calendar.month_name[i]) for i in range(1, 13)]
+    years, months = _filter_choices()
     
     context = {
         'student': student,
-        'attendance_records': attendance_records,
         'years': years,
         'months': months,
-        'selected_month': int(month) if month else None,
-        'selected_year': int(year) if year else None,
+        'selected_month': month,
+        'selected_year': year,
         'selected_status': status,
+        'summary': summary,
     }
+
+    # Full-history mode: stream every matching row instead of one page
+    if request.GET.get('full'):
+        context['has_records'] = summary['total'] > 0
+        return _stream_history(request, context, attendance_records.order_by('-date'))
+
+    # Keyset pagination on date (newest first): "load older" passes ?after=<date>
+    size = page_size(request, settings.ATTENDANCE_HISTORY_PAGE_SIZE, settings.ATTENDANCE_HISTORY_MAX_PAGE_SIZE)
+    after, before = _date_param(request, 'after'), _date_param(request, 'before')
+    page = cached_for_student(
+        student.pk, "history_page", (month, year, status, size, after, before),
+        lambda: keyset_page(attendance_records, 'date', size=size, after=after, before=before, descending=True),
+    )
+    context.update({
+        'attendance_records': page['items'],
+        'has_records': bool(page['items']),
+        'page': page,
+    })
     
     return render(request, "attendence_history.html", context)
 
 
+def _month_queries(student, year, month):
+    """(the month's attendance records, its AttendanceRollup) for one student"""
+    last_day = calendar.monthrange(year, month)[1]
+    start_date = date(year, month, 1)
+    end_date = date(year, month, last_day)
+
+    records = (
+        Attendance.objects.filter(student=student, date__range=(start_date, end_date))
+        .select_related('marked_by')
+        .order_by('date')
+    )
+    rollup = AttendanceRollup.objects.filter(student=student, year=year, month=month)
+    return records, rollup
+
+
+def _month_context(student, year, month):
+    """Context for monthly_summary_month.html: one month's counts, calendar and records"""
+    records, rollup = _month_queries(student, year, month)
+    return _month_result(year, month, list(records), rollup.first())
+
+
+def _month_result(year, month, monthly_records, rollup):
+    # Calculate statistics from the materialized monthly rollup
+    total_days = rollup.total if rollup else 0
+    present_days = rollup.present if rollup else 0
+
+    return {
+        'selected_year': year,
+        'month_name': calendar.month_name[month],
+        'total_days': total_days,
+        'present_days': present_days,
+        'absent_days': total_days - present_days,
+        'attendance_percentage': round((present_days / total_days) * 100, 2) if total_days > 0 else 0,
+        'monthly_records': monthly_records,
+        'calendar_grid': month_grid(year, month, {record.date.day: record.is_present for record in monthly_records}),
+        'weekdays': WEEKDAYS,
+    }
+
+
+def _render_month(context):
+    return render_to_string("monthly_summary_month.html", context)
+
+
 @login_required
 def monthly_summary(request):
     """View monthly attendance summary"""
@@ -315,53 +395,80 @@ def monthly_summary(request):
     
     # Get selected month and year, default to current month
     today = timezone.localdate()
-    selected_month = int(request.GET.get('month', today.month))
-    selected_year = int(request.GET.get('year', today.year))
-    
-    # Calculate date range for the selected month
-    last_day = calendar.monthrange(selected_year, selected_month)[1]
-    start_date = datetime(selected_year, selected_month, 1).date()
-    end_date = datetime(selected_year, selected_month, last_day).date()
-    
-    # Get attendance records for the month
-    monthly_records = Attendance.objects.filter(
-        student=student,
-        date__range=(start_date, end_date)
-    ).order_by('date')
-    
-    # Calculate statistics
-    total_days = monthly_records.count()
-    present_days = monthly_records.filter(is_present=True).count()
-    absent_days = total_days - present_days
-    attendance_percentage = round((present_days / total_days) * 100, 2) if total_days > 0 else 0
-    
-    # Generate calendar data for visualization
-    cal = calendar.monthcalendar(selected_year, selected_month)
-    attendance_map = {record.date.day: record.is_present for record in monthly_records}
+    selected_month = _int_param(request, 'month', 1, 12) or today.month
+    selected_year = _int_param(request, 'year', 1900, 9999) or today.year
+
+    if (selected_year, selected_month) < (today.year, today.month):
+        # A closed month cannot gain new days: render it once and keep the
+        # HTML until a correction to that month replaces its cache token
+        month_html = cached_month(
+            student.pk, selected_year, selected_month,
+            lambda: _render_month(_month_context(student, selected_year, selected_month)),
+        )
+    else:
+        month_context = cached_for_student(
+            student.pk, "monthly_summary", (selected_year, selected_month),
+            lambda: _month_context(student, selected_year, selected_month),
+        )
+        month_html = _render_month(month_context)
     
     # Generate year and month choices
-    current_year = timezone.localdate().year
-    years = list(range(current_year - 2, current_year + 1))
-    months = [(i, calendar.month_name[i]) for i in range(1, 13)]
+    years, months = _filter_choices()
     
     context = {
         'student': student,
         'selected_month': selected_month,
         'selected_year': selected_year,
-        'month_name': calendar.month_name[selected_month],
-        'total_days': total_days,
-        'present_days': present_days,
-        'absent_days': absent_days,
-        'attendance_percentage': attendance_percentage,
-        'monthly_records': monthly_records,
-        'calendar_weeks': cal,
-        'attendance_map': attendance_map,
+        'month_html': month_html,
         'years': years,
         'months': months,
     }
     
     return render(request, "monthly_summary.html", context)
 
+def _year_summary(request, student):
+    """(year, heatmap summary) for ?year=, cached per student until their attendance changes"""
+    year = _int_param(request, 'year', 1900, 9999) or timezone.localdate().year
+    summary = cached_for_student(
+        student.pk, "heatmap", (year,), lambda: year_summary(*year_bits(student, year), year)
+    )
+    return year, summary
+
+
+@login_required
+def attendance_heatmap(request):
+    """A year of attendance at a glance, with streaks and per-weekday rates"""
+    try:
+        student = Student.objects.get(user=request.user)
+    except Student.DoesNotExist:
+        return render(request, "attendance_heatmap.html", {
+            "no_student_record": True,
+            "message": "No student record found. Please contact admin."
+        })
+
+    year, summary = _year_summary(request, student)
+    current_year = timezone.localdate().year
+    context = {
+        'student': student,
+        'selected_year': year,
+        'years': list(range(current_year - 2, current_year + 1)),
+        'heatmap_rows': zip(WEEKDAYS, heatmap_rows(year, summary['status'])),
+        **summary,
+    }
+    return render(request, "attendance_heatmap.html", context)
+
+
+@login_required
+def attendance_heatmap_data(request):
+    """JSON for the heatmap: status per day as a "0"/"1"/"2" string (unmarked/absent/present)"""
+    student = get_object_or_404(Student, user=request.user)
+    year, summary = _year_summary(request, student)
+    return JsonResponse({
+        'year': year,
+        **summary,
+        'status': summary['status'].translate(STATUS_DIGITS).decode(),
+    })
+
 # @login_required
 # def profile_view(request):
 #     return render(request, "profile.html")